@@ -0,0 +1,68 @@
+"""Per-turn cost of `DynamicMessages.value` as the history grows.
+
+Each turn appends a user and an assistant message and reads `value` after each, which is what
+`AnthropicClient.stream_generate` does once per request. The edit column also edits, before each
+turn, the last answer of the history (as when a reply is cut to what was spoken) and a message
+of another DynamicMessages (as a RAG refresh or another session does); both must keep the cost
+flat. The full-rebuild column re-merges and re-adapts the whole history the way `value` used to.
+
+Usage: python benchmarks/bench_dynamic_messages.py
+"""
+
+import time
+
+from echoflow.llm.base_messages import Message, StaticMessages
+from echoflow.services.anthropic.messages import AnthropicAdapter, AnthropicDynamicMessages
+
+SIZES = (10, 100, 1_000, 10_000)
+TURNS = 200
+
+
+def build(size: int) -> AnthropicDynamicMessages:
+    messages = AnthropicDynamicMessages()
+    for i in range(size):
+        role = "user" if i % 2 == 0 else "assistant"
+        messages.add_message(Message(role=role, content=[f"{role} message {i}"]))
+    messages.value
+    return messages
+
+
+def full_rebuild(messages: AnthropicDynamicMessages) -> list:
+    res = StaticMessages(AnthropicAdapter())
+    for m in messages:
+        res.add_message(m)
+    return res.value
+
+
+def per_turn(messages: AnthropicDynamicMessages, render, edit: bool = False) -> float:
+    other = build(10)
+    start = time.perf_counter()
+    for i in range(TURNS):
+        if edit:
+            messages[-1].content[0] = f"cut answer {i}"
+            other[0].content[0] = f"retrieved {i}"
+        messages.add_message(Message(role="user", content=[f"question {i}"]))
+        render(messages)
+        messages.add_message(Message(role="assistant", content=[f"answer {i}"]))
+        render(messages)
+    return (time.perf_counter() - start) / TURNS
+
+
+def main():
+    print(
+        f"{'messages':>10} {'incremental us/turn':>20} {'with edits us/turn':>19}"
+        f" {'full rebuild us/turn':>22}"
+    )
+    for size in SIZES:
+        incremental = per_turn(build(size), lambda m: m.value)
+        edited = per_turn(build(size), lambda m: m.value, edit=True)
+        row = f"{size:>10} {incremental * 1e6:>20.1f} {edited * 1e6:>19.1f}"
+        if size > 1_000:  # takes minutes
+            print(f"{row} {'-':>22}")
+            continue
+        rebuild = per_turn(build(size), full_rebuild)
+        print(f"{row} {rebuild * 1e6:>22.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Cold import time of the public modules, measured with `python -X importtime`.
+
+Each module is imported in fresh interpreters and the median cumulative time is reported, along
+with whether the import pulled in a provider SDK. Results are tracked in benchmarks/baseline.json
+under "import <module>" with the same --save/--tolerance handling as benchmarks/suite.py.
+
+Usage:
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --save
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from suite import BASELINE, regressions
+
+MODULES = [
+    "echoflow.llm.base_client",
+    "echoflow.services",
+    "echoflow.services.anthropic.messages",
+    "echoflow.services.anthropic.client",
+]
+SDKS = ("anthropic", "httpx", "pydantic", "loguru")
+RUNS = 7
+
+_PROBE = "import sys, {module}; print(','.join(m for m in {sdks} if m in sys.modules))"
+
+
+def import_time(module: str) -> tuple[int, str]:
+    """Cumulative microseconds to import `module` in a fresh interpreter, and the SDKs it loaded."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, sdks=SDKS)],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    for line in reversed(result.stderr.splitlines()):
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]), result.stdout.strip()
+    raise RuntimeError(f"no import time reported for {module}")
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--save", action="store_true", help="store results as the baseline")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown, 0.5=50%%")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {}
+    print(f"{'module':<40} {'ms':>8} {'baseline':>9}  SDKs loaded")
+    for module in MODULES:
+        runs = [import_time(module) for _ in range(RUNS)]
+        us = statistics.median(t for t, _ in runs)
+        name = f"import {module}"
+        results[name] = {"ns_per_op": int(us * 1000), "alloc_bytes": 0}
+        old = baseline.get(name, {}).get("ns_per_op")
+        old = f"{old / 1e6:.1f}" if old else "-"
+        print(f"{module:<40} {us / 1000:>8.1f} {old:>9}  {runs[0][1] or '-'}")
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({**baseline, **results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"saved {args.baseline}")
+        return 0
+
+    failed = regressions(results, baseline, args.tolerance)
+    for line in failed:
+        print(f"REGRESSION {line}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Memory held by one session's history, in bytes per session, measured with tracemalloc.
+
+Every session is a 200-turn voice conversation: a user utterance, an assistant reply that calls
+a tool, the tool result and the spoken answer. Messages are decoded from stored records, as
+when a session is restored, so no string is shared between sessions except interned ones. The
+history is built with each Messages implementation and its `value` is read once, as a request
+does. Results are tracked in benchmarks/baseline.json under "memory <history>", with the same
+--save/--tolerance handling as benchmarks/suite.py.
+
+Usage:
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --save
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from typing import Callable
+
+from suite import BASELINE, regressions
+
+from echoflow.llm.store import decode_message
+from echoflow.services.anthropic.messages import (
+    AnthropicDynamicMessages,
+    AnthropicStaticMessages,
+    AnthropicWindowedMessages,
+)
+
+TURNS = 200
+SESSIONS = 50
+
+HISTORIES: dict[str, Callable[[], list]] = {
+    "list": list,  # the messages alone
+    "static": AnthropicStaticMessages,
+    "static lazy": lambda: AnthropicStaticMessages(lazy=True),
+    "windowed": AnthropicWindowedMessages,
+    "windowed lazy": lambda: AnthropicWindowedMessages(lazy=True),
+    "dynamic": AnthropicDynamicMessages,
+}
+
+
+def records(session: int) -> list[str]:
+    """Stored records of a session, as JSON lines."""
+    lines = []
+    for i in range(TURNS):
+        call = f"toolu_{session:04d}{i:04d}"
+        for role, content in (
+            ("user", [f"Could you tell me what the weather will be like in city {i} tomorrow?"]),
+            (
+                "assistant",
+                [
+                    "Sure, let me look that up for you.",
+                    {"t": "call", "id": call, "name": "get_weather", "input": {"city": f"c{i}"}},
+                ],
+            ),
+            (
+                "tool",
+                [{"t": "result", "id": call, "content": '{"sky": "sunny", "c": 21}', "error": 0}],
+            ),
+            ("assistant", [f"Tomorrow it will be sunny in city {i}, with highs of 21 degrees."]),
+        ):
+            lines.append(json.dumps({"s": 0, "r": role, "c": content}))
+    return lines
+
+
+def bytes_per_session(history: Callable[[], list]) -> int:
+    stored = [records(s) for s in range(SESSIONS)]
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    sessions = []
+    for lines in stored:
+        messages = history()
+        add = getattr(messages, "add_message", messages.append)
+        for line in lines:
+            add(decode_message(json.loads(line)))
+        getattr(messages, "value", None)
+        sessions.append(messages)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return size // SESSIONS
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--save", action="store_true", help="store results as the baseline")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed growth, 0.1=10%%")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {}
+    print(f"{'history':<14} {'bytes/session':>14} {'baseline':>10}")
+    for name, history in HISTORIES.items():
+        key = f"memory {name}"
+        size = bytes_per_session(history)
+        results[key] = {"ns_per_op": 0, "alloc_bytes": size}
+        old = baseline.get(key, {}).get("alloc_bytes", "-")
+        print(f"{name:<14} {size:>14} {old:>10}")
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({**baseline, **results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"saved {args.baseline}")
+        return 0
+
+    failed = regressions(results, baseline, args.tolerance)
+    for line in failed:
+        print(f"REGRESSION {line}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
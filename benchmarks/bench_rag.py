@@ -0,0 +1,101 @@
+"""Latency of one retrieval from an in-process VectorIndex, in milliseconds per query.
+
+The index holds random unit vectors, stored as float32 and as int8, exhaustively searched and
+partitioned, and is searched for the top 4 of one query at a time, as a turn does; the embedding
+itself is not measured. Every query is a stored vector plus noise, and recall is the share of
+queries whose top hit is that vector. Latencies are tracked in benchmarks/baseline.json under
+"rag <storage> <chunks>", with the same --save/--tolerance handling as benchmarks/suite.py.
+
+Usage:
+    python benchmarks/bench_rag.py                     # 1M chunks of 256 dimensions
+    python benchmarks/bench_rag.py --chunks 100000 --dim 384
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from suite import BASELINE, regressions
+
+from echoflow.llm.rag import VectorIndex
+
+QUERIES = 50
+
+
+def vectors(chunks: int, dim: int) -> np.ndarray:
+    return np.random.default_rng(0).standard_normal((chunks, dim), dtype=np.float32)
+
+
+def build(data: np.ndarray, quantized: bool, partitioned: bool) -> VectorIndex:
+    index = VectorIndex(data.shape[1], quantized=quantized, capacity=len(data))
+    for start in range(0, len(data), 100_000):
+        batch = data[start : start + 100_000]
+        index.add(batch, [""] * len(batch))
+    if partitioned:
+        index.partition()
+    return index
+
+
+def measure(index: VectorIndex, data: np.ndarray) -> tuple[int, float]:
+    """Nanoseconds per query and recall of the top hit."""
+    rng = np.random.default_rng(1)
+    targets = rng.choice(len(data), size=QUERIES, replace=False)
+    queries = data[targets] + rng.standard_normal(data[targets].shape, dtype=np.float32) * 0.5
+    index.search(queries[:1])  # warm up
+    best, found = float("inf"), 0
+    for _ in range(3):
+        start = time.perf_counter_ns()
+        hits = [index.search(query)[0] for query in queries]
+        best = min(best, (time.perf_counter_ns() - start) / QUERIES)
+        found = sum(h[0].id == t for h, t in zip(hits, targets))
+    return int(best), found / QUERIES
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--save", action="store_true", help="store results as the baseline")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown, 0.5=50%%")
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=256)
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    data = vectors(args.chunks, args.dim)
+    results = {}
+    print(f"{'storage':<20} {'ms/query':>10} {'recall':>8} {'baseline':>10}")
+    for storage, quantized, partitioned in (
+        ("float32", False, False),
+        ("int8", True, False),
+        ("float32 partitioned", False, True),
+        ("int8 partitioned", True, True),
+    ):
+        key = f"rag {storage} {args.chunks}"
+        ns, recall = measure(build(data, quantized, partitioned), data)
+        results[key] = {"ns_per_op": ns, "alloc_bytes": 0}
+        old = baseline.get(key, {}).get("ns_per_op")
+        old = f"{old / 1e6:.2f}" if old else "-"
+        print(f"{storage:<20} {ns / 1e6:>10.2f} {recall:>8.2f} {old:>10}")
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({**baseline, **results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"saved {args.baseline}")
+        return 0
+
+    failed = regressions(results, baseline, args.tolerance)
+    for line in failed:
+        print(f"REGRESSION {line}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Time-to-first-segment and per-delta overhead of SpeakableClient over replayed streams.
+
+Streams are replayed with simulated arrival times (a fixed time to first token, then a fixed
+gap per delta) so the time-to-first-segment column does not depend on the machine; the overhead
+column is measured wall-clock time spent in the segmenter per delta.
+
+Usage: python benchmarks/bench_speakable.py
+"""
+
+import re
+import time
+
+from echoflow.llm.speakable import Segmenter, SegmentPolicy
+
+TTFT_MS = 300.0
+DELTA_MS = 25.0
+
+REPLIES = {
+    "en": (
+        "Sure, I can help with that. Tomorrow in Berlin it will be mostly sunny with a high of "
+        "21 degrees and a light breeze from the west. In the evening clouds move in, and there is "
+        "a small chance of rain after midnight, so you may want to take an umbrella if you are "
+        "planning to stay out late. Is there anything else you would like to know?"
+    ),
+    "zh": (
+        "好的，我来帮你查一下。明天北京以晴为主，最高气温二十一度，西风二到三级。傍晚开始云量增多，"
+        "午夜以后有小概率降雨，如果你打算晚归的话，建议带一把伞。还有什么我可以帮你的吗？"
+    ),
+}
+
+POLICIES = {
+    "default": SegmentPolicy(),
+    "long first": SegmentPolicy(first_min_chars=40, first_max_chars=80),
+}
+
+_SENTENCE_END = re.compile(r"[。！？]|[.!?](?=\s)")
+
+
+class SentenceSplitter:
+    """Baseline: accumulate the reply and cut after every sentence end."""
+
+    def __init__(self, policy=None):
+        self.buffer = ""
+
+    def feed(self, text: str) -> list[str]:
+        self.buffer += text
+        segments = []
+        while match := _SENTENCE_END.search(self.buffer):
+            segments.append(self.buffer[: match.end()])
+            self.buffer = self.buffer[match.end() :]
+        return segments
+
+    def flush(self):
+        text, self.buffer = self.buffer, ""
+        return text or None
+
+
+def deltas(text: str, size: int) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def replay(segmenter, stream: list[str]) -> tuple[float, int, float]:
+    """Simulated ms to the first segment, number of segments, and ns spent per delta."""
+    first, count = None, 0
+    start = time.perf_counter_ns()
+    for i, delta in enumerate(stream):
+        segments = segmenter.feed(delta)
+        if segments and first is None:
+            first = TTFT_MS + i * DELTA_MS
+        count += len(segments)
+    if segmenter.flush():
+        count += 1
+        first = first if first is not None else TTFT_MS + len(stream) * DELTA_MS
+    return first, count, (time.perf_counter_ns() - start) / len(stream)
+
+
+def main():
+    print(f"{'reply':>6} {'policy':>14} {'first segment ms':>17} {'segments':>9} {'ns/delta':>9}")
+    for language, text in REPLIES.items():
+        stream = deltas(text, 4 if language == "en" else 2)
+        candidates = {name: lambda p=policy: Segmenter(p) for name, policy in POLICIES.items()}
+        candidates["sentence"] = SentenceSplitter
+        for name, make in candidates.items():
+            replay(make(), stream)  # warm up
+            first, count, overhead = replay(make(), stream)
+            print(f"{language:>6} {name:>14} {first:>17.0f} {count:>9} {overhead:>9.0f}")
+        whole = TTFT_MS + (len(stream) - 1) * DELTA_MS
+        print(f"{language:>6} {'whole reply':>14} {whole:>17.0f} {1:>9} {'-':>9}")
+
+
+if __name__ == "__main__":
+    main()
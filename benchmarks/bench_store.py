@@ -0,0 +1,84 @@
+"""Save and load time of FileStore against the old one-flush-per-message JSON lines store.
+
+The load column decodes the stored messages; rebuild also adds them to a fresh history.
+
+Usage: python benchmarks/bench_store.py
+"""
+
+import json
+import os
+import tempfile
+import time
+from dataclasses import asdict
+
+from echoflow.llm.base_messages import Message, ToolCall, ToolResult
+from echoflow.llm.store import FileStore
+from echoflow.services.anthropic.messages import AnthropicStaticMessages
+
+SIZES = [100, 1000, 10000]
+
+
+class JSONLinesStore:
+    """Baseline: the FileStore this module replaces, one line and one flush per message."""
+
+    def __init__(self, file_path: str, fsync: bool = False):
+        self.file = open(file_path, "a+", encoding="utf-8")
+        self.fsync = fsync
+
+    def save(self, message: Message):
+        self.file.write(json.dumps(asdict(message)) + "\n")
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def load(self) -> list[Message]:
+        self.file.seek(0)
+        return [Message(**json.loads(line.strip())) for line in self.file.readlines()]
+
+    def close(self):
+        self.file.close()
+
+
+def conversation(n: int) -> list[Message]:
+    messages = []
+    for i in range(n // 4):
+        messages += [
+            Message(role="user", content=[f"What is the weather in city number {i}?"]),
+            Message(role="assistant", content=[ToolCall(id=f"t{i}", name="w", input={"c": i})]),
+            Message(role="tool", content=[ToolResult(id=f"t{i}", content="sunny, 21 degrees")]),
+            Message(role="assistant", content=[f"It is sunny and 21 degrees in city {i}."]),
+        ]
+    return messages
+
+
+def ms(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    print(f"{'messages':>9} {'store':>16} {'save ms':>9} {'load ms':>8} {'rebuild ms':>11}")
+    for n in SIZES:
+        messages = conversation(n)
+        for fsync in (False, True):
+            with tempfile.TemporaryDirectory() as tmp:
+                baseline = JSONLinesStore(f"{tmp}/baseline.jsonl", fsync)
+                save = ms(lambda: [baseline.save(m) for m in messages])
+                load = ms(baseline.load)
+                baseline.close()
+                name = "jsonl" + (" fsync" if fsync else "")
+                print(f"{n:>9} {name:>16} {save:>9.1f} {load:>8.1f} {'-':>11}")
+
+                store = FileStore(tmp, commit_interval=None, fsync=fsync)
+                save = ms(lambda: [store.save("s", m) for m in messages] and store.commit())
+                store.close()
+                reader = FileStore(tmp, commit_interval=None)
+                load = ms(lambda: reader.load("s"))
+                rebuild = ms(lambda: reader.restore("s", AnthropicStaticMessages()))
+                name = "FileStore" + (" fsync" if fsync else "")
+                print(f"{n:>9} {name:>16} {save:>9.1f} {load:>8.1f} {rebuild:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
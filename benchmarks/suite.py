@@ -0,0 +1,282 @@
+"""Micro-benchmarks of the hot paths, compared against a stored baseline.
+
+Every case reports the time per operation and the peak memory allocated during one operation,
+measured with tracemalloc. Stream cases replay the raw Anthropic events recorded in
+benchmarks/fixtures through `AnthropicClient._process_stream`; nothing touches the network.
+
+A case regresses when it is slower than its baseline by more than the tolerance, or allocates
+more by more than the tolerance plus 1 KiB; the run then exits with status 1. Timings depend
+on the machine, so save a baseline on the machine that compares against it.
+
+Usage:
+    python benchmarks/suite.py                 # compare with benchmarks/baseline.json
+    python benchmarks/suite.py --save          # store the current results as the baseline
+    python benchmarks/suite.py -k stream       # only cases whose name contains "stream"
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Union
+
+from anthropic.types import RawMessageStreamEvent
+from pydantic import TypeAdapter
+
+from echoflow.llm.base_messages import Message, StaticMessages, ToolCall, ToolResult
+from echoflow.llm.json_schema import Field, Model
+from echoflow.logger import LocalLogger, init_logger
+from echoflow.services.anthropic.client import AnthropicClient
+from echoflow.services.anthropic.messages import AnthropicDynamicMessages, AnthropicStaticMessages
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, "fixtures")
+BASELINE = os.path.join(HERE, "baseline.json")
+ALLOCATION_SLACK = 1024
+
+CASES: dict[str, Callable[[], Callable[[], object]]] = {}
+"""Case name -> setup returning the operation to measure."""
+
+
+def case(name: str):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+
+    return register
+
+
+def load_fixture(name: str) -> list:
+    adapter = TypeAdapter(RawMessageStreamEvent)
+    with open(os.path.join(FIXTURES, f"{name}.jsonl"), encoding="utf-8") as f:
+        return [adapter.validate_python(json.loads(line)) for line in f]
+
+
+def conversation(turns: int) -> list[Message]:
+    messages = []
+    for i in range(turns):
+        messages += [
+            Message(role="user", content=[f"What is the weather in city number {i}?"]),
+            Message(role="assistant", content=["Let me check.", ToolCall(f"t{i}", "w", {"c": i})]),
+            Message(role="tool", content=[ToolResult(id=f"t{i}", content="sunny, 21 degrees")]),
+            Message(role="assistant", content=[f"It is sunny and 21 degrees in city {i}."]),
+        ]
+    return messages
+
+
+@case("merged.add_message x100")
+def merged_add_message():
+    messages = conversation(25)
+
+    def op():
+        merged = StaticMessages()
+        for message in messages:
+            merged.add_message(message)
+
+    return op
+
+
+@case("static.adapt x100")
+def static_adapt():
+    messages = conversation(25)
+
+    def op():
+        static = AnthropicStaticMessages()
+        for message in messages:
+            static.add_message(message)
+
+    return op
+
+
+@case("dynamic.value append+read")
+def dynamic_value():
+    dynamic = AnthropicDynamicMessages()
+    for message in conversation(100):
+        dynamic.add_message(message)
+    dynamic.value
+    question = Message(role="user", content=["one more question"])
+    answer = Message(role="assistant", content=["one more answer"])
+
+    # the history keeps growing while this runs; a render costs the same at any length
+    def op():
+        dynamic.append(question)
+        dynamic.value
+        dynamic.append(answer)
+        dynamic.value
+
+    return op
+
+
+@case("dynamic.value rebuild @400")
+def dynamic_rebuild():
+    messages = conversation(100)
+
+    def op():
+        dynamic = AnthropicDynamicMessages()
+        for message in messages:
+            dynamic.add_message(message)
+        dynamic.value
+
+    return op
+
+
+class Place(Model):
+    city: str = Field(description="city name")
+    country: str = Field(description="ISO country code", pattern="^[A-Z]{2}$")
+
+
+class Forecast(Model):
+    places: list[Union[Place, str]] = Field(max_items=3, description="where to look")
+    days: int = Field(description="number of days")
+    units: str = Field(description="metric or imperial")
+    step: int = Field(description="hours between two forecasts")
+
+
+@case("schema.json_schema cached")
+def schema_cached():
+    Forecast.json_schema()
+    return Forecast.json_schema
+
+
+@case("schema.json_schema compile")
+def schema_compile():
+    return Forecast._compile_schema
+
+
+FORECAST_INPUT = {
+    "places": [{"city": "Paris", "country": "FR"}, {"city": "Lyon", "country": "FR"}, "Nice"],
+    "days": 3,
+    "units": "metric",
+    "step": 6,
+}
+
+
+@case("schema.decode Forecast")
+def schema_decode():
+    return lambda: Forecast.decode(FORECAST_INPUT)
+
+
+try:
+    import jsonschema
+except ImportError:  # the comparison is optional
+    jsonschema = None
+
+if jsonschema is not None:
+
+    @case("schema.jsonschema validate Forecast")
+    def schema_jsonschema():
+        validator = jsonschema.Draft202012Validator(Forecast.json_schema({"key_any_of": "oneOf"}))
+        return lambda: validator.validate(FORECAST_INPUT)
+
+
+def stream_case(fixture: str):
+    def setup():
+        events = load_fixture(fixture)
+        client = AnthropicClient(api_key="benchmark")
+        loop = asyncio.new_event_loop()
+
+        async def replay():
+            for event in events:
+                yield event
+
+        async def drain():
+            async for _ in client._process_stream(replay()):
+                pass
+
+        return lambda: loop.run_until_complete(drain())
+
+    return setup
+
+
+for _fixture in ("hello", "tool_use", "long_text"):
+    case(f"stream.process {_fixture}")(stream_case(_fixture))
+
+
+def measure(op: Callable[[], object], budget: float = 0.3, repeats: int = 7) -> dict:
+    op()  # warm up caches
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget / repeats:
+            break
+        number *= 2
+
+    best = elapsed / number
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        best = min(best, (time.perf_counter() - start) / number)
+
+    peak = None
+    for _ in range(3):
+        gc.collect()
+        gc.disable()
+        tracemalloc.start()
+        op()
+        size = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        gc.enable()
+        peak = size if peak is None else min(peak, size)
+    return {"ns_per_op": round(best * 1e9), "alloc_bytes": peak}
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    failed = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        if result["ns_per_op"] > old["ns_per_op"] * (1 + tolerance):
+            failed.append(f"{name}: {old['ns_per_op']} -> {result['ns_per_op']} ns/op")
+        if result["alloc_bytes"] > old["alloc_bytes"] * (1 + tolerance) + ALLOCATION_SLACK:
+            failed.append(f"{name}: {old['alloc_bytes']} -> {result['alloc_bytes']} B/op")
+    return failed
+
+
+def main(argv: list[str] = None) -> int:
+    init_logger(LocalLogger(level="INFO"))  # as in production
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--save", action="store_true", help="store results as the baseline")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown, 0.5=50%%")
+    parser.add_argument("-k", dest="filter", default="", help="only run matching cases")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {}
+    print(f"{'case':<34} {'ns/op':>12} {'baseline':>12} {'alloc B/op':>11}")
+    for name, setup in CASES.items():
+        if args.filter not in name:
+            continue
+        result = results[name] = measure(setup())
+        old = baseline.get(name, {}).get("ns_per_op", "-")
+        print(f"{name:<34} {result['ns_per_op']:>12} {old:>12} {result['alloc_bytes']:>11}")
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({**baseline, **results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"saved {args.baseline}")
+        return 0
+
+    failed = regressions(results, baseline, args.tolerance)
+    for line in failed:
+        print(f"REGRESSION {line}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
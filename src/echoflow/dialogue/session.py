@@ -0,0 +1,259 @@
+import asyncio
+import json
+import math
+import os
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, Optional
+from urllib.parse import quote, unquote
+
+from echoflow.dialogue.timing_wheel import TimingWheel
+from echoflow.llm.base_context import LLMContext
+from echoflow.llm.base_messages import Message
+from echoflow.llm.store import decode_message, encode_message
+from echoflow.logger import get_logger
+
+logger = get_logger()
+
+_SUFFIX = ".session"
+
+
+class TurnGaps:
+    """Moving mean and variance of the seconds between the turns of a session."""
+
+    __slots__ = ("mean", "var", "count")
+
+    def __init__(self, mean: float = 0.0, var: float = 0.0, count: int = 0):
+        self.mean = mean
+        self.var = var
+        self.count = count
+
+    def observe(self, gap: float, weight: float):
+        if not self.count:
+            self.mean = gap
+        else:
+            diff = gap - self.mean
+            self.mean += weight * diff
+            self.var = (1 - weight) * (self.var + weight * diff * diff)
+        self.count += 1
+
+
+class _Live:
+    __slots__ = ("ctx", "touched", "gaps")
+
+    def __init__(self, ctx: LLMContext, touched: float, gaps: TurnGaps):
+        self.ctx = ctx
+        self.touched = touched
+        self.gaps = gaps
+
+
+class SessionManager:
+    """Holds the LLMContext of live sessions and moves idle ones to disk.
+
+    `get` returns the context of a session, creating it with `factory` on first use. Each call
+    counts as a turn: the gaps between turns give every session a predicted idle timeout of
+    `mean + deviations * stddev` of its recent gaps, clamped to [min_timeout, max_timeout], or
+    `default_timeout` before `min_turns` gaps are known. A session idle past its timeout, or the
+    least recently used one once more than `max_live` are live, is spilled: its history is written
+    to `directory` as compressed JSON and dropped from memory. Getting a spilled session rebuilds
+    it from `factory` and the stored history; a spilled session not touched for `retention`
+    seconds is deleted.
+
+    `release`, e.g. `client.release`, is called with the context of every session that is spilled
+    or removed while live, so that clients drop the state they keep for it too.
+
+    Timers live in a TimingWheel driven by one task (`start`) or by calling `advance`, rather
+    than costing a task per session. Spill files are written on the event loop; they are small,
+    but size `tick` so that a tick's worth of spills stays short.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], LLMContext],
+        directory: str,
+        max_live: int = 10_000,
+        default_timeout: float = 120.0,
+        min_timeout: float = 20.0,
+        max_timeout: float = 900.0,
+        deviations: float = 3.0,
+        min_turns: int = 3,
+        weight: float = 0.2,
+        retention: float = 86400.0,
+        tick: float = 1.0,
+        clock: Callable[[], float] = time.time,
+        release: Callable[[LLMContext], None] = None,
+    ):
+        self.factory = factory
+        self.directory = directory
+        self.max_live = max_live
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.deviations = deviations
+        self.min_turns = min_turns
+        self.weight = weight
+        self.retention = retention
+        self.clock = clock
+        self.release = release
+        os.makedirs(directory, exist_ok=True)
+
+        self._live: OrderedDict[str, _Live] = OrderedDict()
+        self._wheel = TimingWheel(tick=tick, now=clock())
+        self._task: Optional[asyncio.Task] = None
+        self.spills = 0
+        self.rehydrations = 0
+        self._schedule_spilled()
+
+    @property
+    def live(self) -> int:
+        return len(self._live)
+
+    @property
+    def spilled(self) -> int:
+        return len(self._wheel) - len(self._live)
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, quote(str(session_id), safe="") + _SUFFIX)
+
+    def _schedule_spilled(self):
+        """Schedule the deletion of sessions spilled by an earlier process."""
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(_SUFFIX):
+                    session_id = unquote(entry.name[: -len(_SUFFIX)])
+                    self._wheel.schedule(session_id, entry.stat().st_mtime + self.retention)
+
+    def timeout(self, gaps: TurnGaps) -> float:
+        """Predicted seconds after which a session with these turn gaps is idle."""
+        if gaps.count < self.min_turns:
+            return self.default_timeout
+        timeout = gaps.mean + self.deviations * math.sqrt(gaps.var)
+        return min(max(timeout, self.min_timeout), self.max_timeout)
+
+    def get(self, session_id: str) -> LLMContext:
+        """The context of `session_id`, rehydrated or created if it is not live; counts a turn."""
+        now = self.clock()
+        session = self._live.get(session_id)
+        if session is None:
+            session = self._load(session_id, now)
+            self._live[session_id] = session
+            while len(self._live) > self.max_live:
+                oldest = next(iter(self._live))
+                try:
+                    self._spill(oldest, now)
+                except OSError as e:  # stays live; `advance` retries when it times out
+                    logger.error("could not spill session {}: {!r}", oldest, e)
+                    break
+        else:
+            session.gaps.observe(now - session.touched, self.weight)
+            session.touched = now
+            self._live.move_to_end(session_id)
+        self._wheel.schedule(session_id, now + self.timeout(session.gaps))
+        return session.ctx
+
+    def remove(self, session_id: str):
+        """Forget `session_id`, in memory and on disk."""
+        session = self._live.pop(session_id, None)
+        if session is not None:
+            self._released(session.ctx)
+        self._wheel.cancel(session_id)
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def _load(self, session_id: str, now: float) -> _Live:
+        ctx = self.factory(session_id)
+        if ctx.session_id is None:
+            ctx.session_id = session_id
+        path = self._path(session_id)
+        try:
+            with open(path, "rb") as f:
+                record = json.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            return _Live(ctx, now, TurnGaps())
+        except Exception as e:
+            logger.warn("dropping unreadable spilled session {}: {!r}", path, e)
+            os.remove(path)
+            return _Live(ctx, now, TurnGaps())
+
+        os.remove(path)
+        gaps = TurnGaps(*record["gaps"])
+        gaps.observe(now - record["touched"], self.weight)
+        if ctx.history is not None:
+            for item in record["messages"]:
+                message = decode_message(item)
+                if message.role != "tool":
+                    ctx.history.add_message(message)
+                    continue
+                # a spilled history holds merged blocks; tool messages are added one result each
+                for result in message.content:
+                    ctx.history.add_message(Message(role="tool", content=[result]))
+        self.rehydrations += 1
+        return _Live(ctx, now, gaps)
+
+    def _spill(self, session_id: str, now: float):
+        session = self._live[session_id]
+        history = session.ctx.history
+        gaps = session.gaps
+        record = {
+            "touched": session.touched,
+            "gaps": [gaps.mean, gaps.var, gaps.count],
+            "messages": [encode_message(m, i) for i, m in enumerate(history or ())],
+        }
+        data = zlib.compress(json.dumps(record, ensure_ascii=False).encode())
+        path = self._path(session_id)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        del self._live[session_id]
+        self._wheel.schedule(session_id, now + self.retention)
+        self.spills += 1
+        self._released(session.ctx)
+
+    def _released(self, ctx: LLMContext):
+        if self.release is None:
+            return
+        try:
+            self.release(ctx)
+        except Exception as e:
+            logger.error("releasing session {} failed: {!r}", ctx.session_id, e)
+
+    def advance(self, now: float = None):
+        """Spill the sessions that went idle and delete the expired spilled ones, up to `now`."""
+        now = self.clock() if now is None else now
+        for session_id in self._wheel.advance(now):
+            if session_id in self._live:
+                try:
+                    self._spill(session_id, now)
+                except OSError as e:
+                    logger.error("could not spill session {}: {!r}", session_id, e)
+                    self._wheel.schedule(session_id, now + self.min_timeout)
+            else:
+                self.remove(session_id)
+
+    def start(self):
+        """Run `advance` every tick in a task of the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._wheel.tick)
+            try:
+                self.advance()
+            except Exception as e:
+                logger.error("SessionManager.advance failed: {!r}", e)
+
+    async def close(self, spill: bool = True):
+        """Stop the timer task and, with `spill`, write every live session to disk."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if spill:
+            now = self.clock()
+            for session_id in list(self._live):
+                self._spill(session_id, now)
@@ -0,0 +1,104 @@
+import math
+from typing import Hashable
+
+
+class TimingWheel:
+    """Hierarchical timing wheel: timers keyed by any hashable, driven by `advance`.
+
+    Level 0 has `size` slots of one `tick` each, and every further level has `size` slots each
+    spanning a whole revolution of the level below. A timer goes into the lowest level whose
+    range covers it, and moves down a level when the clock reaches its slot, so scheduling and
+    cancelling are O(1) and every timer is moved at most `levels` times before it expires.
+    Deadlines past the range of the top level are parked in it and rescheduled when reached.
+    """
+
+    def __init__(self, tick: float = 1.0, size: int = 64, levels: int = 4, now: float = 0.0):
+        self.tick = tick
+        self.size = size
+        self._spans = [size**level for level in range(levels)]
+        """Ticks covered by one slot of every level."""
+        self._slots: list[list[dict[Hashable, int]]] = [
+            [{} for _ in range(size)] for _ in range(levels)
+        ]
+        self._timers: dict[Hashable, tuple[int, int]] = {}
+        """Key -> (level, slot) of its timer."""
+        self._current = math.floor(now / tick)
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def schedule(self, key: Hashable, deadline: float):
+        """Expire `key` at `deadline`, replacing its timer if it has one."""
+        self.cancel(key)
+        self._insert(key, max(math.ceil(deadline / self.tick), self._current + 1))
+
+    def cancel(self, key: Hashable) -> bool:
+        where = self._timers.pop(key, None)
+        if where is None:
+            return False
+        level, slot = where
+        del self._slots[level][slot][key]
+        return True
+
+    def _insert(self, key: Hashable, due: int):
+        delta = due - self._current
+        top = len(self._spans) - 1
+        level = 0
+        while level < top and delta >= self._spans[level] * self.size:
+            level += 1
+        # beyond the top level: park in the last slot it covers
+        at = min(due, self._current + self._spans[top] * self.size - 1)
+        slot = at // self._spans[level] % self.size
+        self._slots[level][slot][key] = due
+        self._timers[key] = (level, slot)
+
+    def advance(self, now: float) -> list[Hashable]:
+        """Move the clock to `now` and return the keys whose deadline has passed, in order."""
+        target = math.floor(now / self.tick)
+        if target - self._current >= self._spans[-1] * self.size:
+            return self._jump(target)
+
+        expired = []
+        while self._current < target:
+            if not self._timers:
+                self._current = target
+                break
+            self._current += 1
+            current = self._current
+            for level in range(len(self._spans) - 1, 0, -1):
+                span = self._spans[level]
+                if current % span == 0:
+                    timers = self._slots[level][current // span % self.size]
+                    for key, due in list(timers.items()):
+                        del timers[key]
+                        self._insert(key, due)
+
+            timers = self._slots[0][current % self.size]
+            if timers:
+                expired += timers
+                for key in timers:
+                    del self._timers[key]
+                timers.clear()
+        return expired
+
+    def _jump(self, target: int) -> list[Hashable]:
+        """Advance past more than a revolution of the top level by sorting all timers once."""
+        timers = []
+        for slots in self._slots:
+            for slot in slots:
+                timers += ((due, key) for key, due in slot.items())
+                slot.clear()
+        self._timers.clear()
+        self._current = target
+
+        timers.sort(key=lambda timer: timer[0])
+        expired = []
+        for due, key in timers:
+            if due <= target:
+                expired.append(key)
+            else:
+                self._insert(key, due)
+        return expired
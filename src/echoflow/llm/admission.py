@@ -0,0 +1,283 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import AsyncGenerator, Callable, Optional
+
+from echoflow.llm.base_client import Client, StreamEvent, StreamEventType
+from echoflow.llm.base_context import LLMContext
+from echoflow.llm.metrics import Histogram
+from echoflow.llm.tokens import estimate_request_tokens, estimate_tokens
+from echoflow.logger import get_logger
+
+logger = get_logger()
+
+
+class TokenBucket:
+    """A budget of `per_minute` units, refilled continuously and starting full.
+
+    `take` may drive the level below zero, e.g. when the actual token usage of a request turns out
+    higher than its reservation; later requests then wait until the debt is paid off.
+    """
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken; amounts over the capacity need a full bucket."""
+        self._refill()
+        return max((min(amount, self.capacity) - self.level) / self.rate, 0.0)
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+
+class Priority(IntEnum):
+    interactive = 0
+    """A user is waiting on the reply, e.g. a voice turn."""
+    follow_up = 1
+    """Work a user will see soon, e.g. a tool-driven follow-up request."""
+    background = 2
+    """Summaries, evaluations and other work nobody is waiting on."""
+
+
+@dataclass
+class RateLimits:
+    """Per-minute budgets of one credential; None for no limit."""
+
+    requests_per_minute: Optional[float] = None
+    input_tokens_per_minute: Optional[float] = None
+    output_tokens_per_minute: Optional[float] = None
+
+
+class Shed(Exception):
+    """The request was not admitted before its deadline."""
+
+
+class _Waiter:
+    __slots__ = ("priority", "input_tokens", "output_tokens", "deadline", "enqueued", "future")
+
+    def __init__(self, priority, input_tokens, output_tokens, deadline, enqueued, future):
+        self.priority = priority
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.deadline = deadline
+        self.enqueued = enqueued
+        self.future = future
+
+
+class AdmissionController:
+    """Admits requests of one credential within its rate limits, most urgent priority first.
+
+    Every request takes one request, its estimated input tokens and its `max_tokens` of output
+    from the buckets of `limits` before it is sent, and its tokens are settled with the usage
+    the provider reports. Requests that have to wait are queued per priority and admitted
+    strictly by priority, then in arrival order, as the buckets refill.
+
+    A request waits until its deadline at most: `max_queue_time[priority]` seconds after it
+    arrived, unless the request passes its own. Once the head of the queue has to wait for
+    budget, every waiting request whose deadline comes before that is shed right away with
+    `Shed`, since requests behind it cannot be admitted sooner; with the defaults this sheds
+    background work first and never sheds interactive turns.
+
+    Queue times are kept in `queue_time`, and shed requests counted in `shed`, per priority.
+    Share one controller between all clients that use the same credential.
+    """
+
+    def __init__(
+        self,
+        limits: RateLimits,
+        max_queue_time: dict[Priority, Optional[float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limits = limits
+        self.max_queue_time = {
+            Priority.interactive: None,
+            Priority.follow_up: 10.0,
+            Priority.background: 60.0,
+            **(max_queue_time or {}),
+        }
+        self.clock = clock
+        self.requests = self._bucket(limits.requests_per_minute)
+        self.input_tokens = self._bucket(limits.input_tokens_per_minute)
+        self.output_tokens = self._bucket(limits.output_tokens_per_minute)
+        self.queue_time = {p: Histogram() for p in Priority}
+        """Seconds requests waited for admission."""
+        self.shed = {p: 0 for p in Priority}
+        self._queues: dict[Priority, deque[_Waiter]] = {p: deque() for p in Priority}
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _bucket(self, per_minute: Optional[float]) -> Optional[TokenBucket]:
+        return TokenBucket(per_minute, self.clock) if per_minute else None
+
+    def _wait_time(self, waiter: _Waiter) -> float:
+        wait = 0.0
+        for bucket, amount in (
+            (self.requests, 1),
+            (self.input_tokens, waiter.input_tokens),
+            (self.output_tokens, waiter.output_tokens),
+        ):
+            if bucket is not None:
+                wait = max(wait, bucket.wait_time(amount))
+        return wait
+
+    def _take(self, waiter: _Waiter):
+        for bucket, amount in (
+            (self.requests, 1),
+            (self.input_tokens, waiter.input_tokens),
+            (self.output_tokens, waiter.output_tokens),
+        ):
+            if bucket is not None:
+                bucket.take(amount)
+
+    async def acquire(
+        self,
+        priority: Priority,
+        input_tokens: int,
+        output_tokens: int,
+        deadline: Optional[float] = None,
+    ):
+        """Wait until the request may be sent and take its budget.
+
+        Args:
+            priority: Priority class of the request.
+            input_tokens: Estimated input tokens.
+            output_tokens: Output tokens to reserve, usually `max_tokens`.
+            deadline: Seconds the request may wait, instead of the priority's `max_queue_time`.
+
+        Raises:
+            Shed: The request could not be admitted in time.
+        """
+        now = self.clock()
+        if deadline is None:
+            deadline = self.max_queue_time.get(priority)
+        waiter = _Waiter(
+            priority,
+            input_tokens,
+            output_tokens,
+            now + deadline if deadline is not None else None,
+            now,
+            asyncio.get_running_loop().create_future(),
+        )
+        self._queues[priority].append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and waiter.future.exception() is None:
+                self._refund(waiter)  # admitted, but the caller gave up
+            else:
+                self._queues[priority].remove(waiter)
+            raise
+
+    def _refund(self, waiter: _Waiter):
+        self.settle(waiter.input_tokens, waiter.output_tokens, 0, 0, request=False)
+
+    def settle(
+        self,
+        reserved_input: int,
+        reserved_output: int,
+        input_tokens: int,
+        output_tokens: int,
+        request: bool = True,
+    ):
+        """Replace the reservation of an admitted request with its actual token usage."""
+        if not request and self.requests is not None:
+            self.requests.take(-1)
+        if self.input_tokens is not None:
+            self.input_tokens.take(input_tokens - reserved_input)
+        if self.output_tokens is not None:
+            self.output_tokens.take(output_tokens - reserved_output)
+        self._dispatch()
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        now = self.clock()
+        for priority in Priority:
+            queue = self._queues[priority]
+            while queue:
+                waiter = queue[0]
+                if waiter.deadline is not None and waiter.deadline <= now:
+                    self._shed(queue.popleft())
+                    continue
+                wait = self._wait_time(waiter)
+                if wait > 0:
+                    self._shed_before(now + wait)
+                    loop = asyncio.get_running_loop()
+                    self._timer = loop.call_later(wait, self._dispatch)
+                    return
+                queue.popleft()
+                self._take(waiter)
+                self.queue_time[priority].observe(now - waiter.enqueued)
+                waiter.future.set_result(None)
+
+    def _shed_before(self, admission: float):
+        """Shed the waiters whose deadline comes before the earliest next admission."""
+        for priority, queue in self._queues.items():
+            kept = [w for w in queue if w.deadline is None or w.deadline >= admission]
+            if len(kept) < len(queue):
+                for waiter in queue:
+                    if waiter.deadline is not None and waiter.deadline < admission:
+                        self._shed(waiter)
+                queue.clear()
+                queue.extend(kept)
+
+    def _shed(self, waiter: _Waiter):
+        self.shed[waiter.priority] += 1
+        logger.debug("shed {} request", waiter.priority.name)
+        self.queue_time[waiter.priority].observe(self.clock() - waiter.enqueued)
+        if not waiter.future.done():
+            waiter.future.set_exception(Shed(f"{waiter.priority.name} request shed"))
+
+
+class AdmittedClient(Client):
+    """Sends the requests of `client` through an AdmissionController.
+
+    Pass `priority=Priority.background` (default: interactive) and optionally `deadline=` seconds
+    to `stream_generate`. Input tokens are settled as the uncached input plus cache writes, since
+    cache reads do not count against input token limits; when a stream ends without usage, the
+    input reservation is kept and output is estimated from the streamed text.
+    """
+
+    def __init__(self, client: Client, controller: AdmissionController):
+        self.client = client
+        self.controller = controller
+
+    def release(self, ctx: LLMContext):
+        self.client.release(ctx)
+
+    async def stream_generate(self, ctx: LLMContext, **kwargs) -> AsyncGenerator[StreamEvent, None]:
+        priority = kwargs.pop("priority", Priority.interactive)
+        deadline = kwargs.pop("deadline", None)
+        controller = self.controller
+        input_tokens = estimate_request_tokens(ctx) if controller.input_tokens else 0
+        output_tokens = ctx.params.max_tokens if ctx.params else 0
+        await controller.acquire(priority, input_tokens, output_tokens, deadline)
+
+        used_input, used_output, streamed = input_tokens, None, 0
+        try:
+            async for event in self.client.stream_generate(ctx, **kwargs):
+                if event.type == StreamEventType.text_delta:
+                    streamed += estimate_tokens(event.data["text_delta"])
+                elif event.type == StreamEventType.metadata:
+                    meta = event.data["metadata"]
+                    used_input = (meta.input_text_tokens or 0) + (meta.cache_write_tokens or 0)
+                    used_output = meta.output_text_tokens or 0
+                yield event
+        finally:
+            used_output = streamed if used_output is None else used_output
+            controller.settle(input_tokens, output_tokens, used_input, used_output)
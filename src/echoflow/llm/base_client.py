@@ -1,10 +1,12 @@
+import asyncio
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from enum import Enum, auto
 from typing import AsyncGenerator, Optional
 
 from echoflow.llm.base_context import LLMContext
-from echoflow.llm.base_messages import ToolCall
+from echoflow.llm.base_messages import Message, Messages, ToolCall
+from echoflow.llm.tokens import estimate_tokens, serialize
 
 
 class StreamEventType(Enum):
@@ -15,9 +17,11 @@ class StreamEventType(Enum):
     error = auto()
     metadata = auto()
     stop = auto()
+    tool_argument = auto()
+    segment = auto()
 
 
-@dataclass
+@dataclass(slots=True)
 class StreamEvent:
     type: StreamEventType
     data: dict = field(default_factory=dict)
@@ -38,6 +42,110 @@ class LLMResult:
     metadata: Optional[Metadata] = None
 
 
+_END = object()
+
+
+class Generation:
+    """A streaming reply that can be cancelled while it streams, e.g. when the user barges in.
+
+    Iterate over it like over `stream_generate`. The provider stream is read by a task of its
+    own, so `cancel` can be called from any task: it closes the provider stream at once, which
+    stops generation and releases its connection, and ends the iteration with a metadata event
+    marked "cancelled" whose output tokens are estimated from what was generated so far. Input
+    tokens come from the metadata of the start event, when the provider reports it there.
+    """
+
+    def __init__(self, stream: AsyncGenerator[StreamEvent, None]):
+        self.text = ""
+        """Text delivered to the consumer so far."""
+        self.tool_calls: list[ToolCall] = []
+        """Complete tool calls delivered to the consumer so far."""
+        self.metadata: Optional[Metadata] = None
+        self.cancelled = False
+        self._usage: Optional[Metadata] = None
+        self._output_tokens = 0
+        self._done = False
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._pump(stream))
+
+    async def _pump(self, stream: AsyncGenerator[StreamEvent, None]):
+        try:
+            async for event in stream:
+                if event.type == StreamEventType.start:
+                    self._usage = event.data.get("metadata")
+                elif event.type == StreamEventType.text_delta:
+                    self._output_tokens += estimate_tokens(event.data["text_delta"])
+                elif event.type == StreamEventType.tool:
+                    self._output_tokens += estimate_tokens(serialize(event.data["tool"].input))
+                self._queue.put_nowait(event)
+            self._queue.put_nowait(_END)
+        except Exception as e:
+            self._queue.put_nowait(e)
+        finally:
+            await stream.aclose()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> StreamEvent:
+        if self._done:
+            raise StopAsyncIteration
+        item = await self._queue.get()
+        if item is _END:
+            self._done = True
+            raise StopAsyncIteration
+        if isinstance(item, Exception):
+            self._done = True
+            raise item
+
+        if item.type == StreamEventType.text_delta:
+            self.text += item.data["text_delta"]
+        elif item.type == StreamEventType.tool:
+            self.tool_calls.append(item.data["tool"])
+        elif item.type == StreamEventType.metadata:
+            self.metadata = item.data["metadata"]
+        return item
+
+    async def cancel(self) -> Optional[Metadata]:
+        """Stop the generation; returns the token usage, final or estimated so far."""
+        if self._done or self.cancelled:
+            return self.metadata
+        self.cancelled = True
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+        # events generated after the interruption are not delivered
+        usage = None
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if isinstance(item, StreamEvent) and item.type == StreamEventType.metadata:
+                usage = item.data["metadata"]
+        if usage is None:
+            usage = replace(self._usage) if self._usage else Metadata()
+            usage.output_text_tokens = self._output_tokens
+        self.metadata = usage
+        self._queue.put_nowait(
+            StreamEvent(StreamEventType.metadata, {"metadata": usage, "cancelled": True})
+        )
+        self._queue.put_nowait(_END)
+        return usage
+
+    def commit(self, history: Messages, spoken: str = None):
+        """Add the reply to `history` as the assistant's message.
+
+        Args:
+            history: The history the request was made from.
+            spoken: The part of the text the user actually heard, when playback stopped before
+                the delivered text ended; defaults to all text delivered so far.
+        """
+        text = self.text if spoken is None else spoken
+        content = [text] if text else []
+        if not self.cancelled:
+            content += self.tool_calls  # a cancelled tool call will never get its result
+        if content:
+            history.add_message(Message(role="assistant", content=content))
+
+
 class Client:
     @abstractmethod
     async def stream_generate(self, ctx: LLMContext, **kwargs) -> AsyncGenerator[StreamEvent, None]:
@@ -49,7 +157,7 @@ class Client:
         metadata: Optional[Metadata] = None
         async for event in self.stream_generate(ctx, **kwargs):
             if event.type == StreamEventType.text_delta:
-                text += event.data["text"]
+                text += event.data["text_delta"]
 
             elif event.type == StreamEventType.tool:
                 tool_call = event.data["tool"]
@@ -58,3 +166,13 @@ class Client:
                 metadata = event.data["metadata"]
 
         return LLMResult(text=text, tool_call=tool_call, metadata=metadata)
+
+    def release(self, ctx: LLMContext):
+        """Drop what the client keeps in memory for the session of `ctx`, e.g. once it is spilled.
+
+        A later request of the session still works; it only starts without that state.
+        """
+
+    def start(self, ctx: LLMContext, **kwargs) -> Generation:
+        """Start streaming a reply for `ctx` as a Generation, which can be cancelled."""
+        return Generation(self.stream_generate(ctx, **kwargs))
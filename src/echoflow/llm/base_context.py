@@ -1,3 +1,4 @@
+import uuid
 from dataclasses import dataclass, field
 
 from echoflow.llm.base_messages import Messages
@@ -9,6 +10,8 @@ class CacheStrategy:
     cache_system: bool = False
     cache_history: bool = False
     cache_tool: bool = False
+    max_breakpoints: int = 4
+    min_cacheable_tokens: int = None  # None: the model's own minimum
 
 
 @dataclass
@@ -26,3 +29,11 @@ class LLMContext:
     history: Messages = None
     rag: Messages = None  # 路由问题？交给上层
     tools: list[Tool] = field(default_factory=list)  # 路由问题？交给上层
+    session_id: str = None
+    dynamic: dict[str, str] = field(default_factory=dict)  # per-turn text: time, user state...
+
+    def ensure_session_id(self) -> str:
+        """`session_id`, set to a random id on first use when the caller left it unset."""
+        if self.session_id is None:
+            self.session_id = uuid.uuid4().hex
+        return self.session_id
@@ -1,63 +1,36 @@
-import json
+import weakref
 from abc import ABC, abstractmethod
-from dataclasses import asdict, dataclass
-from typing import Any, List, Literal, Union
+from dataclasses import dataclass, field
+from typing import Any, List, Literal, Optional, Union
 
 Text = str
 
 
-@dataclass
+# sessions hold thousands of these, so they are slotted: no per-instance __dict__
+@dataclass(slots=True)
 class ToolCall:
     id: str
     name: str
     input: dict
+    parsed: Any = field(default=None, compare=False, repr=False)
+    """The input decoded by the tool's input_schema, when the client validated it."""
 
 
-@dataclass
+@dataclass(slots=True)
 class ToolResult:
     id: str
     content: str
+    is_error: bool = False
+    blob: Optional[str] = None
+    """Digest of the full content in the BlobStore when `content` is a condensed form of it."""
 
 
-@dataclass
+@dataclass(slots=True)
 class Message:
     role: Literal["system", "user", "assistant", "tool"]
     content: List[Union[Text, ToolCall, ToolResult]]
 
 
-# class Store(ABC):
-#
-#     @abstractmethod
-#     def save(self, message: "Message"):
-#         pass
-#
-#     @abstractmethod
-#     def load(self) -> List["Message"]:
-#         pass
-#
-#     def close(self):
-#         pass
-#
-#
-# class FileStore(Store):
-#
-#     def __init__(self, file_path: str):
-#         self.file_path = file_path
-#         self.file = open(self.file_path, "a+", encoding="utf-8")  # 打开文件用于追加
-#
-#     def save(self, message: "Message"):
-#         self.file.write(json.dumps(asdict(message)) + "\n")
-#         self.file.flush()
-#
-#     def load(self) -> List["Message"]:
-#         self.file.seek(0)
-#         lines = self.file.readlines()
-#         return [Message(**json.loads(line.strip())) for line in lines]
-#
-#     def close(self):
-#         self.file.close()
-
-
 class MessageAdapter(ABC):
     @abstractmethod
     def adapt(self, message: Message) -> Any:
@@ -127,40 +100,344 @@ class _MergedMessages(Messages):
                 raise ValueError(f"role {message.role} is not supported")
 
 
+class _Rendered(list):
+    __slots__ = ("__weakref__", "start")
+
+
 class StaticMessages(_MergedMessages):
-    def __init__(self, adapter: MessageAdapter = None):
+    """Merged messages, with their adapted values kept up to date as messages are added.
+
+    With `lazy`, the adapted values are not kept alongside the messages: `value` adapts the
+    history when it is read, and the list it returns is only kept up to date while the caller
+    holds on to it. This halves the memory of an idle session at the cost of adapting the whole
+    history again on the first read of every turn.
+    """
+
+    def __init__(self, adapter: MessageAdapter = None, lazy: bool = False):
         super().__init__()
         self.adapter = adapter
+        self.lazy = lazy and adapter is not None
         self._static = []
+        self._rendered = None
 
     def _alternate_role(self, role: Literal["user", "assistant", "tool"]) -> bool:
         alternated = super()._alternate_role(role)
-        if alternated:
-            self._static.append(Message(role=role, content=[]))
+        if alternated and not self.lazy:
+            self._static.append(None)
         return alternated
 
+    def _adapt(self, message: Message):
+        return self.adapter.adapt(message) if self.adapter else message
+
     def add_message(self, message: Message):
         super().add_message(message)
-        self._static[-1] = self.adapter.adapt(self[-1]) if self.adapter else self[-1]
+        if self:
+            self._adapted(self._adapt(self[-1]))
+
+    def _adapted(self, value):
+        """Store `value`, the adapted form of the last merged message."""
+        if not self.lazy:
+            self._static[-1] = value
+            return
+        rendered = self._rendered and self._rendered()
+        if rendered is not None:
+            rendered[len(self) - 1 - rendered.start :] = [value]
+
+    def _first(self) -> int:
+        """Index of the first merged message that `value` renders."""
+        return 0
 
     @property
     def value(self) -> list:
-        return self._static
+        if not self.lazy:
+            return self._static
+        start = self._first()
+        rendered = self._rendered and self._rendered()
+        if rendered is None or rendered.start != start:
+            rendered = _Rendered(self._adapt(message) for message in self[start:])
+            rendered.start = start
+            self._rendered = weakref.ref(rendered)
+        return rendered
+
+
+class _TrackedContent(list):
+    """Content list of a message held by DynamicMessages, reporting its in-place edits to it.
+
+    It pickles and copies as a plain list, without its owner.
+    """
+
+    __slots__ = ("owner", "key")
+
+    def __init__(self, items, owner: "DynamicMessages", key: int):
+        super().__init__(items)
+        self.owner = owner
+        self.key = key
+        """id() of the message the list is the content of."""
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+    def _edited(self):
+        self.owner._content_edited(self.key)
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._edited()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._edited()
+
+    def __iadd__(self, items):
+        super().__iadd__(items)
+        self._edited()
+        return self
+
+    def __imul__(self, n):
+        super().__imul__(n)
+        self._edited()
+        return self
+
+    def append(self, item):
+        super().append(item)
+        self._edited()
+
+    def extend(self, items):
+        super().extend(items)
+        self._edited()
+
+    def insert(self, index, item):
+        super().insert(index, item)
+        self._edited()
+
+    def pop(self, index=-1):
+        item = super().pop(index)
+        self._edited()
+        return item
+
+    def remove(self, item):
+        super().remove(item)
+        self._edited()
+
+    def clear(self):
+        super().clear()
+        self._edited()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._edited()
+
+    def reverse(self):
+        super().reverse()
+        self._edited()
+
+
+class _Blocks(_MergedMessages):
+    """Merged blocks of a DynamicMessages, remembering which message opened each block."""
+
+    def __init__(self):
+        super().__init__()
+        self.openers = []
+        self.current = 0
+
+    def _alternate_role(self, role: Literal["user", "assistant", "tool"]) -> bool:
+        alternated = super()._alternate_role(role)
+        if alternated:
+            self.openers.append(self.current)
+        return alternated
+
+    @property
+    def value(self) -> list:
+        return self
 
 
 class DynamicMessages(Messages):
+    """Messages whose content may still be edited after they are added.
+
+    `value` is rendered incrementally: merged blocks and their adapted values are cached, and
+    only the blocks touched since the last read are merged and adapted again. Edits made through
+    `message.content` (item assignment, append, ...) are picked up automatically: the content
+    list of an added message is swapped for a list subclass that marks the message stale in its
+    DynamicMessages, and otherwise behaves, pickles and copies as a list. Edits are reported to
+    the DynamicMessages a message was last added to; replacing `message.content` or mutating a
+    ToolCall/ToolResult in place needs an explicit `invalidate`.
+    """
+
     def __init__(self, adapter: MessageAdapter = None):
         super().__init__()
         self.adapter = adapter
+        self._blocks = _Blocks()
+        self._values = []
+        self._marks = []  # (block count, tail block size) before each message was merged
+        self._rendered = 0
+        self._positions = {}
+        self._stale = set()
 
     def add_message(self, message: Message):
         self.append(message)
 
-    @property
-    def value(self) -> list:
-        res = StaticMessages(self.adapter)
+    def _track(self, message: Message):
+        content = message.content
+        if type(content) is not _TrackedContent:
+            message.content = _TrackedContent(content, self, id(message))
+        else:
+            content.owner, content.key = self, id(message)
+
+    def _content_edited(self, key: int):
+        index = self._positions.get(key)
+        if index is not None and index < self._rendered:
+            self._stale.add(key)
+            self._rendered = index
+
+    def invalidate(self, message: Message = None):
+        """Mark `message`, or every message when omitted, as changed since the last render."""
+        if message is None:
+            self._blocks = _Blocks()
+            self._values = []
+            self._marks = []
+            self._rendered = 0
+            self._stale.clear()
+            return
 
-        for i, m in enumerate(self):
-            res.add_message(m)
+        index = self._positions.get(id(message))
+        if index is None or self[index] is not message:
+            return
+        self._track(message)
+        self._stale.add(id(message))
+        self._rendered = min(self._rendered, index)
+
+    def append(self, message: Message):
+        self._track(message)
+        self._positions.setdefault(id(message), len(self))
+        super().append(message)
+
+    def insert(self, index, message: Message):
+        self._track(message)
+        super().insert(index, message)
+        self._restructured()
+
+    def __setitem__(self, index, message):
+        if isinstance(index, slice):
+            message = list(message)
+            for m in message:
+                self._track(m)
+        else:
+            self._track(message)
+        super().__setitem__(index, message)
+        self._restructured()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._restructured()
+
+    def __imul__(self, n):
+        super().__imul__(n)
+        self._restructured()
+        return self
+
+    def pop(self, index=-1) -> Message:
+        message = super().pop(index)
+        self._restructured()
+        return message
+
+    def remove(self, message: Message):
+        super().remove(message)
+        self._restructured()
+
+    def clear(self):
+        super().clear()
+        self._restructured()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._restructured()
+
+    def reverse(self):
+        super().reverse()
+        self._restructured()
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    def __iadd__(self, messages):
+        self.extend(messages)
+        return self
+
+    def _restructured(self):
+        self._positions = {}
+        for i, message in enumerate(self):
+            self._positions.setdefault(id(message), i)
+        self._rendered = 0
+
+    def _rewind(self, start: int) -> tuple[int, bool, list]:
+        """Drop merged state from message `start` on.
+
+        Returns the number of blocks kept, whether the last kept block was cut short, and the
+        dropped (block, value) pairs so that unchanged blocks can reuse their adapted value.
+        """
+        blocks = self._blocks
+        if start < len(self._marks):
+            count, size = self._marks[start]
+            del self._marks[start:]
+        else:
+            count, size = len(blocks), len(blocks[-1].content) if blocks else 0
+
+        dropped = list(zip(blocks[count:], self._values[count:]))
+        del blocks[count:]
+        del blocks.openers[count:]
+        del self._values[count:]
+
+        truncated = bool(count) and size < len(blocks[-1].content)
+        if truncated:
+            del blocks[-1].content[size:]
+        return count, truncated, dropped
+
+    def _touched(self, k: int) -> bool:
+        if not self._stale:
+            return False
+        openers = self._blocks.openers
+        last = openers[k + 1] if k + 1 < len(openers) else len(self) - 1
+        return any(id(self[i]) in self._stale for i in range(openers[k], last + 1))
+
+    def _adapt(self, block: Message):
+        if self.adapter:
+            return self.adapter.adapt(block)
+        return Message(role=block.role, content=list(block.content))
 
-        return res.value
+    @property
+    def value(self) -> list:
+        start = self._rendered
+        if start == len(self) == len(self._marks) and not self._stale:
+            return self._values
+
+        blocks, values = self._blocks, self._values
+        count, truncated, dropped = self._rewind(start)
+        tail_size = len(blocks[-1].content) if blocks else 0
+        for i in range(start, len(self)):
+            self._marks.append((len(blocks), len(blocks[-1].content) if blocks else 0))
+            blocks.current = i
+            blocks.add_message(self[i])
+
+        if count:
+            tail = blocks[count - 1]
+            if truncated or len(tail.content) != tail_size or self._touched(count - 1):
+                values[count - 1] = self._adapt(tail)
+
+        for k in range(count, len(blocks)):
+            block = blocks[k]
+            j = k - count
+            if j < len(dropped) and not self._touched(k):
+                old, cached = dropped[j]
+                if (
+                    old.role == block.role
+                    and len(old.content) == len(block.content)
+                    and all(a is b for a, b in zip(old.content, block.content))
+                ):
+                    values.append(cached)
+                    continue
+            values.append(self._adapt(block))
+
+        self._rendered = len(self)
+        self._stale.clear()
+        return values
@@ -14,13 +14,15 @@ class Tool:
     """A description of the tool, explaining its functionality and purpose."""
     input_schema: Type[Model]
     """The schema defining the structure of the input data required by the tool."""
+    idempotent: bool = False
+    """Whether the tool may safely run before the model has finished its turn."""
 
     @abstractmethod
     def marshal(self):
         pass
 
     def clone(self) -> "Tool":
-        return Tool(self.name, self.description, self.input_schema)
+        return Tool(self.name, self.description, self.input_schema, self.idempotent)
 
     @abstractmethod
     async def async_call(self, tool_call: ToolCall) -> ToolResult:
@@ -0,0 +1,284 @@
+import asyncio
+import heapq
+import json
+import os
+import random
+from dataclasses import asdict, dataclass
+from typing import AsyncGenerator, Callable, Hashable, Iterable, Mapping, Optional, Union
+
+from echoflow.llm.admission import TokenBucket
+from echoflow.llm.base_client import Client, LLMResult, Metadata
+from echoflow.llm.base_context import LLMContext
+from echoflow.llm.base_messages import ToolCall
+from echoflow.llm.tokens import estimate_request_tokens
+from echoflow.logger import get_logger
+
+logger = get_logger()
+
+
+def is_overloaded(error: BaseException) -> bool:
+    """Whether `error` is a rate-limit or overload response: HTTP 429, 503 or 529."""
+    return getattr(error, "status_code", None) in (429, 503, 529)
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class BatchResult:
+    key: Hashable
+    """Index of the context in the input, or its key when the input is a mapping."""
+    result: Optional[LLMResult] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    resumed: bool = False
+    """Whether the result was read from the checkpoint of an earlier run."""
+
+
+def _encode_result(result: BatchResult) -> str:
+    record = {"key": result.key, "error": result.error, "attempts": result.attempts}
+    if result.result is not None:
+        r = result.result
+        record["text"] = r.text
+        record["tool_call"] = asdict(r.tool_call) if r.tool_call else None
+        record["metadata"] = asdict(r.metadata) if r.metadata else None
+    return json.dumps(record, ensure_ascii=False)
+
+
+def _decode_result(line: str) -> BatchResult:
+    record = json.loads(line)
+    result = None
+    if "text" in record:
+        tool_call, metadata = record["tool_call"], record["metadata"]
+        result = LLMResult(
+            text=record["text"],
+            tool_call=ToolCall(**tool_call) if tool_call else None,
+            metadata=Metadata(**metadata) if metadata else None,
+        )
+    return BatchResult(record["key"], result, record["error"], record["attempts"], resumed=True)
+
+
+class _Request:
+    __slots__ = ("key", "ctx", "attempts", "reserved", "started")
+
+    def __init__(self, key: Hashable, ctx: LLMContext):
+        self.key = key
+        self.ctx = ctx
+        self.attempts = 0
+        self.reserved = 0
+        self.started = 0.0
+
+
+class BatchRunner:
+    """Runs `Client.generate` over many contexts, yielding results as they complete.
+
+    At most `concurrency` requests are in flight. The limit grows by one per round of successful
+    requests up to `max_concurrency`, and halves, down to `min_concurrency`, when a request is
+    rejected as overloaded (see `is_overloaded`); the rejected request is retried after its
+    Retry-After or an exponential backoff, up to `max_retries` times. Other errors are not
+    retried but reported in the result.
+
+    With `requests_per_minute` or `tokens_per_minute`, requests also wait for budget. A request
+    reserves its estimated input tokens plus `max_tokens`, and the reservation is settled with the
+    usage in its Metadata once it completes.
+
+    With `checkpoint`, every result is appended to that JSON lines file. A later run with the same
+    checkpoint and inputs yields the stored results, marked `resumed`, and only requests the
+    others, failed ones included; keys must then be JSON values, such as indexes or strings.
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        initial_concurrency: int = None,
+        requests_per_minute: float = None,
+        tokens_per_minute: float = None,
+        max_retries: int = 8,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        checkpoint: str = None,
+        overloaded: Callable[[BaseException], bool] = is_overloaded,
+    ):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency = float(initial_concurrency or max_concurrency)
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.checkpoint = checkpoint
+        self.overloaded = overloaded
+        self.overloads = 0
+        """Requests rejected as overloaded."""
+        self._decreased = 0.0
+
+    def _completed(self) -> dict[Hashable, BatchResult]:
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return {}
+        completed = {}
+        with open(self.checkpoint, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = _decode_result(line)
+                except (ValueError, KeyError):
+                    continue  # torn last line of an interrupted run
+                if result.error is None:
+                    completed[result.key] = result
+        return completed
+
+    def _reservation(self, ctx: LLMContext) -> int:
+        if self.tokens is None:
+            return 0
+        max_tokens = ctx.params.max_tokens if ctx.params else 0
+        return estimate_request_tokens(ctx) + max_tokens
+
+    def _admit(self, request: _Request) -> float:
+        """Take the budget of `request`, or return the seconds to wait for it."""
+        if request.attempts == 0 and self.tokens is not None:
+            request.reserved = self._reservation(request.ctx)
+        wait = 0.0
+        if self.requests is not None:
+            wait = self.requests.wait_time(1)
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(request.reserved))
+        if wait > 0:
+            return wait
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(request.reserved)
+        return 0.0
+
+    def _settle(self, request: _Request, metadata: Optional[Metadata]):
+        if self.tokens is None:
+            return
+        used = 0
+        if metadata is not None:
+            used = sum(
+                n or 0
+                for n in (
+                    metadata.input_text_tokens,
+                    metadata.cache_read_tokens,
+                    metadata.cache_write_tokens,
+                    metadata.output_text_tokens,
+                )
+            )
+        self.tokens.take(used - request.reserved)
+
+    async def run(
+        self, contexts: Union[Iterable[LLMContext], Mapping[Hashable, LLMContext]]
+    ) -> AsyncGenerator[BatchResult, None]:
+        loop = asyncio.get_running_loop()
+        completed = self._completed()
+        pending = iter(contexts.items() if isinstance(contexts, Mapping) else enumerate(contexts))
+        retries: list[tuple[float, int, _Request]] = []
+        held: Optional[_Request] = None
+        running: dict[asyncio.Task, _Request] = {}
+        sequence = 0
+
+        checkpoint = open(self.checkpoint, "a", encoding="utf-8") if self.checkpoint else None
+        try:
+            while True:
+                timeout = None
+                while len(running) < int(self.concurrency):
+                    request, held = held, None
+                    now = loop.time()
+                    if request is None and retries and retries[0][0] <= now:
+                        request = heapq.heappop(retries)[2]
+                    while request is None:
+                        item = next(pending, None)
+                        if item is None:
+                            break
+                        if item[0] in completed:
+                            yield completed.pop(item[0])
+                            continue
+                        request = _Request(*item)
+                    if request is None:
+                        if retries:
+                            timeout = retries[0][0] - now
+                        break
+
+                    wait = self._admit(request)
+                    if wait > 0:
+                        held, timeout = request, wait
+                        break
+                    request.attempts += 1
+                    request.started = now
+                    running[asyncio.create_task(self.client.generate(request.ctx))] = request
+
+                if not running:
+                    if held is None and not retries:
+                        return
+                    await asyncio.sleep(timeout)
+                    continue
+
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    request = running.pop(task)
+                    result = self._finish(request, task, loop.time())
+                    if result is None:
+                        sequence += 1
+                        ready = loop.time() + self._delay(request, task.exception())
+                        heapq.heappush(retries, (ready, sequence, request))
+                        continue
+                    if checkpoint:
+                        checkpoint.write(_encode_result(result) + "\n")
+                        checkpoint.flush()
+                    yield result
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            if checkpoint:
+                checkpoint.close()
+
+    def _finish(self, request: _Request, task: asyncio.Task, now: float) -> Optional[BatchResult]:
+        """The result of a finished request, or None when it is to be retried."""
+        error = task.exception()
+        if error is None:
+            result = task.result()
+            self._settle(request, result.metadata)
+            self.concurrency = min(self.concurrency + 1 / self.concurrency, self.max_concurrency)
+            return BatchResult(request.key, result, attempts=request.attempts)
+
+        self._settle(request, None)
+        if self.overloaded(error):
+            self.overloads += 1
+            # requests sent before the last decrease report the same overload
+            if request.started >= self._decreased:
+                self.concurrency = max(self.concurrency / 2, self.min_concurrency)
+                self._decreased = now
+                logger.warn("overloaded, concurrency down to {}", int(self.concurrency))
+            if request.attempts <= self.max_retries:
+                return None
+        return BatchResult(
+            request.key, error=f"{type(error).__name__}: {error}", attempts=request.attempts
+        )
+
+    def _delay(self, request: _Request, error: BaseException) -> float:
+        delay = _retry_after(error)
+        if delay is None:
+            delay = min(self.backoff * 2 ** (request.attempts - 1), self.max_backoff)
+            delay *= random.uniform(0.5, 1.0)
+        return delay
+
+
+def generate_many(
+    client: Client,
+    contexts: Union[Iterable[LLMContext], Mapping[Hashable, LLMContext]],
+    **kwargs,
+) -> AsyncGenerator[BatchResult, None]:
+    """Shorthand for `BatchRunner(client, **kwargs).run(contexts)`."""
+    return BatchRunner(client, **kwargs).run(contexts)
@@ -0,0 +1,196 @@
+import asyncio
+import contextlib
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from echoflow.llm.base_messages import ToolResult
+from echoflow.logger import get_logger
+
+logger = get_logger()
+
+_blob_store = None
+
+
+class BlobStore:
+    """Content-addressed store of large strings, such as tool outputs, shared by all sessions.
+
+    A blob is keyed by the digest of its content, so identical outputs are stored once however
+    many sessions hold them. Blobs are kept in memory up to `max_memory` bytes, least recently
+    used first out; with `directory` they are then spilled to disk and read back on demand,
+    without it they are dropped, and histories keep only their previews. Spilled blobs are
+    deleted in the same order once they take more than `max_disk` bytes.
+
+    `put`, `get` and a spill do file I/O; on an event loop, read with `async_get`, which only
+    leaves the loop for blobs that are not in memory.
+    """
+
+    def __init__(self, directory: str = None, max_memory: int = 64 << 20, max_disk: int = 1 << 30):
+        self.directory = directory
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+        self.memory = 0
+        """Bytes of the blobs held in memory."""
+        self.disk = 0
+        """Bytes of the blobs spilled to disk."""
+        self._blobs: OrderedDict[str, str] = OrderedDict()
+        self._spilled: OrderedDict[str, int] = OrderedDict()
+        """Digest -> size of the spilled blobs, least recently used first."""
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._scan()
+
+    def _scan(self):
+        """Account for the blobs spilled by earlier runs, oldest first."""
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith(".blob")]
+        for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+            size = entry.stat().st_size
+            self._spilled[entry.name[: -len(".blob")]] = size
+            self.disk += size
+
+    @staticmethod
+    def digest(content: str) -> str:
+        return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.blob")
+
+    def __contains__(self, digest: str) -> bool:
+        with self._lock:
+            if digest in self._blobs:
+                return True
+        return bool(self.directory) and os.path.exists(self._path(digest))
+
+    def put(self, content: str) -> str:
+        """Store `content` unless it is already stored, and return its digest."""
+        digest = self.digest(content)
+        with self._lock:
+            if digest in self._blobs:
+                self._blobs.move_to_end(digest)
+                return digest
+            self._blobs[digest] = content
+            self.memory += len(content.encode())
+            # spilled under the lock, so that a blob is always in memory or on disk
+            self._spill(self._evict())
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        """The content stored under `digest`, or None when it is unknown or was dropped."""
+        with self._lock:
+            content = self._blobs.get(digest)
+            if content is not None:
+                self._blobs.move_to_end(digest)
+                return content
+        if not self.directory:
+            return None
+        return self._read(digest)
+
+    async def async_get(self, digest: str) -> Optional[str]:
+        """`get` for event loops: a blob that was spilled is read in a worker thread."""
+        with self._lock:
+            content = self._blobs.get(digest)
+            if content is not None:
+                self._blobs.move_to_end(digest)
+                return content
+        if not self.directory:
+            return None
+        return await asyncio.to_thread(self._read, digest)
+
+    def _read(self, digest: str) -> Optional[str]:
+        try:
+            with open(self._path(digest), encoding="utf-8") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if digest in self._spilled:
+                self._spilled.move_to_end(digest)
+        return content
+
+    def _evict(self) -> list[tuple[str, str]]:
+        evicted = []
+        while self.memory > self.max_memory and len(self._blobs) > 1:
+            digest, content = self._blobs.popitem(last=False)
+            self.memory -= len(content.encode())
+            evicted.append((digest, content))
+        return evicted
+
+    def _spill(self, evicted: list[tuple[str, str]]):
+        if not self.directory:
+            if evicted:
+                logger.debug("dropped {} blobs from memory", len(evicted))
+            return
+        for digest, content in evicted:
+            path = self._path(digest)
+            if os.path.exists(path):
+                continue
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp, path)
+            self._spilled[digest] = size = len(content.encode())
+            self.disk += size
+
+        deleted = 0
+        while self.disk > self.max_disk and len(self._spilled) > 1:
+            digest, size = self._spilled.popitem(last=False)
+            self.disk -= size
+            deleted += 1
+            with contextlib.suppress(FileNotFoundError):  # deleted by another worker
+                os.remove(self._path(digest))
+        if deleted:
+            logger.debug("deleted {} spilled blobs", deleted)
+
+
+class ResultCondenser:
+    """Moves tool results longer than `threshold` characters out of line, into a BlobStore.
+
+    The condensed result keeps the first `preview` characters, or the output of `summarize` when
+    given, cut to as many characters, and the digest of the full content in `ToolResult.blob`;
+    the history then holds only the condensed form, and clients send the full content while it
+    is still fresh.
+    """
+
+    def __init__(
+        self,
+        store: BlobStore = None,
+        threshold: int = 8192,
+        preview: int = 1024,
+        summarize: Callable[[str], str] = None,
+    ):
+        self.store = store or get_blob_store()
+        self.threshold = threshold
+        self.preview = preview
+        self.summarize = summarize
+
+    def __call__(self, result: ToolResult) -> ToolResult:
+        content = result.content
+        if (
+            result.blob is not None
+            or not isinstance(content, str)
+            or len(content) <= self.threshold
+        ):
+            return result
+        digest = self.store.put(content)
+        if self.summarize is not None:
+            condensed = self.summarize(content)[: self.preview]
+        else:
+            condensed = (
+                f"{content[: self.preview]}\n[... {len(content) - self.preview} more characters]"
+            )
+        return ToolResult(result.id, condensed, result.is_error, blob=digest)
+
+
+def get_blob_store() -> BlobStore:
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = BlobStore()
+    return _blob_store
+
+
+def init_blob_store(store: BlobStore):
+    global _blob_store
+    _blob_store = store
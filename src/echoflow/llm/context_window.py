@@ -0,0 +1,95 @@
+from typing import Literal
+
+from echoflow.llm.base_messages import MessageAdapter, StaticMessages
+from echoflow.llm.tokens import estimate_tokens, serialize
+
+
+class WindowedMessages(StaticMessages):
+    """History whose `value` is a window of the most recent messages that fits a token budget.
+
+    Every merged message keeps a running token estimate, the same estimate the cache planner makes
+    of its rendered form. Only the message a new message is merged into is estimated again, so the
+    window size is known without serializing the history every turn. The estimates are scaled by a
+    factor calibrated against the input tokens the provider reports (see `calibrate`).
+
+    When the window outgrows `budget`, its start moves forward in one step until the window holds
+    at most `low_water * budget` tokens, so the window, and with it the cached prompt prefix,
+    then stays the same for many turns rather than shifting every turn. The window always starts
+    at a user message: a ToolResult is never separated from the ToolCall it answers. All messages
+    stay in the list itself; only `value` is windowed, and with `lazy` only the window is adapted.
+    """
+
+    def __init__(
+        self,
+        adapter: MessageAdapter = None,
+        budget: int = 8000,
+        low_water: float = 0.6,
+        lazy: bool = False,
+    ):
+        super().__init__(adapter, lazy)
+        self.budget = budget
+        self.low_water = low_water
+        self.scale = 1.0
+        """Actual tokens per estimated token, calibrated from provider usage."""
+        self.start = 0
+        """Index of the first merged message in the window."""
+        self._tokens: list[int] = []
+        self._window_tokens = 0
+
+    @property
+    def tokens(self) -> int:
+        """Calibrated token estimate of the window."""
+        return round(self._window_tokens * self.scale)
+
+    def _alternate_role(self, role: Literal["user", "assistant", "tool"]) -> bool:
+        alternated = super()._alternate_role(role)
+        if alternated:
+            self._tokens.append(0)
+        return alternated
+
+    def _adapted(self, value):
+        super()._adapted(value)
+        tokens = estimate_tokens(serialize(value))
+        self._window_tokens += tokens - self._tokens[-1]
+        self._tokens[-1] = tokens
+        self._trim()
+
+    def calibrate(self, estimated: int, actual: int, weight: float = 0.3):
+        """Move `scale` toward `actual / estimated` for a request whose tokens were estimated.
+
+        Args:
+            estimated: Estimated input tokens of the whole request, e.g.
+                `CachePlan.expected_tokens`.
+            actual: Input tokens the provider reported for it, cached ones included.
+            weight: Weight of this observation in the moving average.
+        """
+        if estimated <= 0 or actual <= 0:
+            return
+        self.scale += weight * (actual / estimated - self.scale)
+        self._trim()
+
+    def _trim(self):
+        if self._window_tokens * self.scale <= self.budget:
+            return
+
+        # the first user message that brings the window under the low water mark, or the last one
+        target = self.low_water * self.budget / self.scale
+        remaining = self._window_tokens
+        start = None
+        for i in range(self.start, len(self) - 1):
+            remaining -= self._tokens[i]
+            if self[i + 1].role == "user":
+                start = (i + 1, remaining)
+                if remaining <= target:
+                    break
+        if start is not None:
+            self.start, self._window_tokens = start
+
+    def _first(self) -> int:
+        return self.start
+
+    @property
+    def value(self) -> list:
+        if self.lazy:
+            return super().value  # renders the window only, kept while the caller holds it
+        return self._static[self.start :] if self.start else self._static
@@ -0,0 +1,165 @@
+import asyncio
+from collections import deque
+from typing import AsyncGenerator, Optional
+
+from echoflow.llm.base_client import Client, StreamEvent, StreamEventType
+from echoflow.llm.base_context import LLMContext
+from echoflow.logger import get_logger
+
+logger = get_logger()
+
+_END = object()
+
+
+class _Attempt:
+    """One backend request, pumped into the shared queue of its HedgedClient request."""
+
+    def __init__(self, index: int, stream: AsyncGenerator[StreamEvent, None], queue: asyncio.Queue):
+        self.index = index
+        self.started = asyncio.get_running_loop().time()
+        self.queue = queue
+        self.task = asyncio.create_task(self._pump(stream))
+
+    async def _pump(self, stream: AsyncGenerator[StreamEvent, None]):
+        try:
+            async for event in stream:
+                self.queue.put_nowait((self, event))
+            self.queue.put_nowait((self, _END))
+        except Exception as e:
+            self.queue.put_nowait((self, e))
+        finally:
+            await stream.aclose()
+
+    async def cancel(self):
+        if not self.task.done():
+            self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+
+
+class HedgedClient(Client):
+    """Streams from the first of several backends to answer.
+
+    The request starts on the first backend. If no event has arrived once the hedge delay has
+    passed, the same request is also started on the next backend, up to `max_hedges` times, and
+    whichever backend sends the first event is streamed; the others are cancelled. The delay is
+    the `quantile` of the recent time-to-first-event of the winning requests, so that only the
+    slowest few percent of requests are hedged, or `hedge_after` seconds when set.
+
+    A backend that fails before the streamed output went beyond `start` events is replaced by the
+    next backend (failover); a failure after that is raised, since the output of another backend
+    could not continue it.
+    """
+
+    def __init__(
+        self,
+        backends: list[Client],
+        hedge_after: Optional[float] = None,
+        quantile: float = 0.95,
+        window: int = 200,
+        min_samples: int = 20,
+        initial_hedge_after: float = 1.0,
+        min_hedge_after: float = 0.05,
+        max_hedge_after: float = 5.0,
+        max_hedges: int = 1,
+    ):
+        if not backends:
+            raise ValueError("HedgedClient needs at least one backend")
+        self.backends = backends
+        self.hedge_after = hedge_after
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.initial_hedge_after = initial_hedge_after
+        self.min_hedge_after = min_hedge_after
+        self.max_hedge_after = max_hedge_after
+        self.max_hedges = max_hedges
+        self.first_event_latencies: deque[float] = deque(maxlen=window)
+        self.hedges = 0
+        """Requests started because an earlier one was slow."""
+        self.failovers = 0
+        """Requests started because an earlier one failed."""
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the first event before hedging."""
+        if self.hedge_after is not None:
+            return self.hedge_after
+        latencies = self.first_event_latencies
+        if len(latencies) < self.min_samples:
+            return self.initial_hedge_after
+        delay = sorted(latencies)[int(self.quantile * (len(latencies) - 1))]
+        return min(max(delay, self.min_hedge_after), self.max_hedge_after)
+
+    def release(self, ctx: LLMContext):
+        for backend in self.backends:
+            backend.release(ctx)
+
+    async def stream_generate(self, ctx: LLMContext, **kwargs) -> AsyncGenerator[StreamEvent, None]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        live: list[_Attempt] = []
+        next_backend = 0
+
+        def start():
+            nonlocal next_backend
+            stream = self.backends[next_backend].stream_generate(ctx, **kwargs)
+            live.append(_Attempt(next_backend, stream, queue))
+            next_backend += 1
+
+        winner: Optional[_Attempt] = None
+        hedges, started, content = 0, False, False
+        try:
+            start()
+            deadline = loop.time() + self.hedge_delay()
+            while True:
+                timeout = None
+                if (
+                    winner is None
+                    and hedges < self.max_hedges
+                    and next_backend < len(self.backends)
+                ):
+                    timeout = max(deadline - loop.time(), 0)
+                try:
+                    attempt, item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    logger.warn("no event after {:.3f}s, hedging", self.hedge_delay())
+                    hedges += 1
+                    self.hedges += 1
+                    start()
+                    deadline = loop.time() + self.hedge_delay()
+                    continue
+
+                if attempt not in live:
+                    continue  # left over from a cancelled attempt
+
+                if isinstance(item, Exception):
+                    live.remove(attempt)
+                    if content or (not live and next_backend == len(self.backends)):
+                        raise item
+                    logger.warn("backend {} failed: {!r}", attempt.index, item)
+                    if attempt is winner:
+                        winner = None
+                    if not live:
+                        self.failovers += 1
+                        start()
+                        deadline = loop.time() + self.hedge_delay()
+                    continue
+
+                if winner is None:
+                    winner = attempt
+                    self.first_event_latencies.append(loop.time() - attempt.started)
+                    for other in live:
+                        if other is not attempt:
+                            await other.cancel()
+                    live[:] = [attempt]
+
+                if item is _END:
+                    return
+                if item.type == StreamEventType.start:
+                    if started:
+                        continue  # a failed-over backend starting again
+                    started = True
+                else:
+                    content = True
+                yield item
+        finally:
+            for attempt in live:
+                await attempt.cancel()
@@ -1 +1 @@
-from .schema import Field, Model
+from .schema import Field, FrozenDict, FrozenList, Model, ValidationError, freeze
@@ -1,5 +1,64 @@
+import copy
+import re
 from dataclasses import dataclass
-from typing import Union, get_args, get_origin
+from typing import Callable, Union, get_args, get_origin
+
+DIALECTS = (None, {"key_any_of": "oneOf"}, {"additionalProperties": False})
+"""`extra` dialects whose schemas are compiled when a Model class is created."""
+
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError(f"{type(self).__name__} is read-only, copy it before modifying")
+
+
+class FrozenDict(dict):
+    """Read-only dict shared between requests; `dict(d)` or `copy.deepcopy(d)` to modify."""
+
+    __slots__ = ()
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+    def __deepcopy__(self, memo):
+        return {k: copy.deepcopy(v, memo) for k, v in self.items()}
+
+
+class FrozenList(list):
+    """Read-only list shared between requests; `list(l)` or `copy.deepcopy(l)` to modify."""
+
+    __slots__ = ()
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __reduce__(self):
+        return FrozenList, (list(self),)
+
+    def __deepcopy__(self, memo):
+        return [copy.deepcopy(v, memo) for v in self]
+
+
+def freeze(value):
+    """Recursively turn dicts and lists into their read-only counterparts."""
+    if isinstance(value, (FrozenDict, FrozenList)):
+        return value
+    if isinstance(value, dict):
+        return FrozenDict({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return FrozenList(freeze(v) for v in value)
+    return value
+
+
+def _dialect(extra: dict):
+    if not extra:
+        return ()
+    try:
+        key = tuple(sorted(extra.items()))
+        hash(key)
+    except TypeError:
+        return None
+    return key
 
 
 class ModelMeta(type):
@@ -14,7 +73,19 @@ class ModelMeta(type):
             else:
                 fields[key] = Field(_type=value)
         namespace["_fields"] = fields
-        return super().__new__(cls, name, bases, namespace)
+        namespace["_schemas"] = {}
+        model = super().__new__(cls, name, bases, namespace)
+
+        for extra in DIALECTS:
+            try:
+                model.json_schema(extra)
+            except (ValueError, TypeError, AssertionError):
+                break  # unsupported field, raised again when the schema is requested
+        try:
+            model._decode = staticmethod(_model_decoder(model))
+        except (ValueError, TypeError) as e:
+            model._decode = staticmethod(_unsupported(e))
+        return model
 
 
 @dataclass
@@ -76,7 +147,10 @@ class Field:
             key_any_of = "anyOf"
             if extra and "key_any_of" in extra:
                 key_any_of = extra.get("key_any_of")
-            res["items"] = {key_any_of: items, "type": "object"}
+            res["items"] = {key_any_of: items}
+            # typing the items as objects would reject the scalar alternatives the decoder accepts
+            if all(_is_model(t) for t in get_args(element_type)):
+                res["items"]["type"] = "object"
 
         elif issubclass(element_type, Model):
             res["items"] = element_type.json_schema()
@@ -111,7 +185,209 @@ class Field:
         return res
 
 
+class ValidationError(ValueError):
+    """Input not matching a Model; `path` locates the offending value, e.g. "where[1].city"."""
+
+    def __init__(self, message: str, path: str = ""):
+        super().__init__(message)
+        self.message = message
+        self.path = path
+
+    def within(self, key: Union[str, int]) -> "ValidationError":
+        """Prefix `path` with the property name or item index the value was found under."""
+        segment = f"[{key}]" if isinstance(key, int) else key
+        if self.path and not self.path.startswith("["):
+            segment += "."
+        self.path = segment + self.path
+        return self
+
+    def __str__(self):
+        return f"{self.path}: {self.message}" if self.path else self.message
+
+
+def _kind(value) -> str:
+    return "null" if value is None else type(value).__name__
+
+
+def _unsupported(error: Exception) -> Callable:
+    def decode(value):
+        raise error
+
+    return decode
+
+
+# Decoders are closures specialized when a Model class is created: every check a field does not
+# need is left out, patterns and enums are compiled once, and a value is only inspected by the
+# union alternatives that accept its JSON type.
+
+
+def _string_decoder(field: "Field") -> Callable:
+    enum = frozenset(field.enum) if field.enum is not None else None
+    search = re.compile(field.pattern).search if field.pattern is not None else None
+
+    if enum is None and search is None:
+
+        def decode_string(value):
+            if type(value) is not str:
+                raise ValidationError(f"expected a string, got {_kind(value)}")
+            return value
+
+        return decode_string
+
+    def decode_checked_string(value):
+        if type(value) is not str:
+            raise ValidationError(f"expected a string, got {_kind(value)}")
+        if enum is not None and value not in enum:
+            raise ValidationError(f"{value!r} is not one of {field.enum}")
+        if search is not None and search(value) is None:
+            raise ValidationError(f"{value!r} does not match {field.pattern!r}")
+        return value
+
+    return decode_checked_string
+
+
+def _decode_int(value):
+    if type(value) is int:
+        return value
+    if type(value) is float and value.is_integer():
+        return int(value)
+    raise ValidationError(f"expected an integer, got {_kind(value)}")
+
+
+def _decode_float(value):
+    if type(value) is float:
+        return value
+    if type(value) is int:
+        return float(value)
+    raise ValidationError(f"expected a number, got {_kind(value)}")
+
+
+_JSON_TYPES = {str: (str,), int: (int, float), float: (int, float)}
+"""Python types of the JSON values a scalar field type may decode."""
+
+
+def _is_model(t) -> bool:
+    return isinstance(t, type) and issubclass(t, Model)
+
+
+def _item_decoder(element_type) -> Callable:
+    if get_origin(element_type) != Union:
+        if _is_model(element_type):
+            return element_type._decode
+        return _field_decoder(Field(_type=element_type))
+
+    candidates: dict[type, list[Callable]] = {}
+    for alternative in get_args(element_type):
+        if _is_model(alternative):
+            candidates.setdefault(dict, []).append(alternative._decode)
+            continue
+        if alternative not in _JSON_TYPES:
+            raise ValueError(f"{alternative} not supported in a union")
+        decode = _field_decoder(Field(_type=alternative))
+        for json_type in _JSON_TYPES[alternative]:
+            candidates.setdefault(json_type, []).append(decode)
+    names = ", ".join(getattr(t, "__name__", str(t)) for t in get_args(element_type))
+
+    def decode_union(value):
+        error = None
+        for decode in candidates.get(type(value), ()):
+            try:
+                return decode(value)
+            except ValidationError as e:
+                error = error or e
+        if error is not None:
+            raise error
+        raise ValidationError(f"expected one of {names}, got {_kind(value)}")
+
+    return decode_union
+
+
+def _array_decoder(field: "Field") -> Callable:
+    decode_item = _item_decoder(get_args(field._type)[0])
+    min_items, max_items = field.min_items, field.max_items
+
+    def decode_array(value):
+        if type(value) is not list:
+            raise ValidationError(f"expected an array, got {_kind(value)}")
+        if max_items is not None and len(value) > max_items:
+            raise ValidationError(f"expected at most {max_items} items, got {len(value)}")
+        if min_items is not None and len(value) < min_items:
+            raise ValidationError(f"expected at least {min_items} items, got {len(value)}")
+        try:
+            return [decode_item(item) for item in value]
+        except ValidationError:
+            for i, item in enumerate(value):
+                try:
+                    decode_item(item)
+                except ValidationError as e:
+                    raise e.within(i) from None
+            raise
+
+    return decode_array
+
+
+def _field_decoder(field: "Field") -> Callable:
+    if field._type == str:
+        return _string_decoder(field)
+    if field._type == int:
+        return _decode_int
+    if field._type == float:
+        return _decode_float
+    if get_origin(field._type) == list:
+        return _array_decoder(field)
+    raise ValueError(f"{field._type} not supported")
+
+
+def _model_decoder(model: type) -> Callable:
+    fields = [
+        (field.alias if field.alias is not None else name, name, _field_decoder(field))
+        for name, field in model._fields.items()
+    ]
+    new = object.__new__
+
+    def decode_model(value):
+        if type(value) is not dict:
+            raise ValidationError(f"expected an object, got {_kind(value)}")
+        instance = new(model)
+        values = instance.__dict__
+        for key, name, decode in fields:
+            try:
+                values[name] = decode(value[key])
+            except KeyError:
+                raise ValidationError("required property is missing").within(key) from None
+            except ValidationError as e:
+                raise e.within(key) from None
+        return instance
+
+    return decode_model
+
+
 class Model(metaclass=ModelMeta):
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other.__dict__ == self.__dict__
+
+    # instances are mutable, so equal instances could not keep equal hashes
+    __hash__ = None
+
+    def __repr__(self):
+        values = ", ".join(f"{k}={v!r}" for k, v in self.__dict__.items())
+        return f"{type(self).__name__}({values})"
+
+    @classmethod
+    def decode(cls, data) -> "Model":
+        """Validate `data`, such as the input of a tool call, and return it as an instance.
+
+        Properties are read under their alias and set under their field name; properties the
+        model does not declare are ignored.
+
+        Raises:
+            ValidationError: `data` does not match the model.
+        """
+        return cls._decode(data)
+
     @classmethod
     def json_schema(cls, extra: dict = None) -> dict:
         """Usage:
@@ -119,7 +395,19 @@ class Model(metaclass=ModelMeta):
         1. extra={"key_any_of": "oneOf"} for anthropic
         2. extra={"key_any_of": "oneOf"} for bedrock boto3
         3. extra={"additionalProperties": False} for openai
+
+        The schema is compiled once per dialect and returned as a shared FrozenDict.
         """
+        key = _dialect(extra)
+        schema = cls._schemas.get(key)
+        if schema is None:
+            schema = freeze(cls._compile_schema(extra))
+            if key is not None:
+                cls._schemas[key] = schema
+        return schema
+
+    @classmethod
+    def _compile_schema(cls, extra: dict = None) -> dict:
         properties = {}
         required = []
         for field_name, field in cls._fields.items():
@@ -0,0 +1,269 @@
+import math
+import os
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from echoflow.llm.base_client import Metadata
+from echoflow.logger import get_logger
+
+logger = get_logger()
+
+_metrics = None
+
+
+def _bounds(low: float, high: float, factor: float) -> list[float]:
+    bounds, value = [], low
+    while value < high:
+        bounds.append(float(f"{value:.6g}"))
+        value *= factor
+    return bounds
+
+
+DEFAULT_BOUNDS = _bounds(0.001, 120.0, 1.2)
+"""Histogram bucket upper bounds in seconds, 20% apart, so quantiles are within 10%."""
+
+
+@dataclass
+class RequestRecord:
+    provider: str
+    model: str
+    started_at: float = field(default_factory=time.time)
+    """Wall-clock start of the request."""
+    ttfb: Optional[float] = None
+    """Seconds from the request start to the first stream event."""
+    ttft: Optional[float] = None
+    """Seconds from the request start to the first text token."""
+    inter_token_gaps: list[float] = field(default_factory=list)
+    tool_durations: list[float] = field(default_factory=list)
+    """Seconds each tool_use block took to stream."""
+    total: Optional[float] = None
+    """Seconds from the request start to the end of the stream."""
+    stop_reason: Optional[str] = None
+    error: Optional[str] = None
+    cancelled: bool = False
+    """Whether the consumer stopped reading before the stream ended."""
+    metadata: Metadata = field(default_factory=Metadata)
+
+
+class RequestTimer:
+    """Collects the timings of one streaming request into a RequestRecord."""
+
+    def __init__(self, provider: str, model: str):
+        self.record = RequestRecord(provider=provider, model=model)
+        self._start = time.perf_counter()
+        self._last_text: Optional[float] = None
+        self._tool_start: Optional[float] = None
+
+    def _elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def event(self):
+        if self.record.ttfb is None:
+            self.record.ttfb = self._elapsed()
+
+    def text(self):
+        now = self._elapsed()
+        if self.record.ttft is None:
+            self.record.ttft = now
+        else:
+            self.record.inter_token_gaps.append(now - self._last_text)
+        self._last_text = now
+
+    def tool_start(self):
+        self._tool_start = self._elapsed()
+
+    def tool_end(self):
+        if self._tool_start is not None:
+            self.record.tool_durations.append(self._elapsed() - self._tool_start)
+            self._tool_start = None
+
+    def finish(
+        self, metadata: Metadata = None, stop_reason: str = None, error: str = None
+    ) -> RequestRecord:
+        self.record.total = self._elapsed()
+        if metadata is not None:
+            self.record.metadata = metadata
+        self.record.stop_reason = stop_reason
+        self.record.error = error
+        return self.record
+
+
+class Histogram:
+    def __init__(self, bounds: list[float] = None):
+        self.bounds = bounds or DEFAULT_BOUNDS
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate the q-quantile, interpolating linearly inside its bucket."""
+        if not self.count:
+            return math.nan
+
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = self.bounds[i - 1] if i else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return low + (high - low) * (rank - seen) / n
+            seen += n
+        return self.bounds[-1]
+
+
+_HISTOGRAMS = {
+    "ttfb": "Seconds from request start to the first stream event.",
+    "ttft": "Seconds from request start to the first text token.",
+    "inter_token": "Seconds between consecutive text tokens.",
+    "tool_block": "Seconds a tool_use block took to stream.",
+    "total": "Seconds from request start to the end of the stream.",
+}
+
+_TOKENS = {
+    "input": "input_text_tokens",
+    "output": "output_text_tokens",
+    "cache_read": "cache_read_tokens",
+    "cache_write": "cache_write_tokens",
+}
+
+
+class Metrics:
+    """In-process aggregation of RequestRecords per provider and model.
+
+    Keeps latency histograms and token counters, answers p50/p95/p99 style queries, hands every
+    record to subscribed callbacks and writes everything as a Prometheus text file, e.g. for the
+    node_exporter textfile collector; no network is involved.
+    """
+
+    def __init__(self, bounds: list[float] = None):
+        self.bounds = bounds or DEFAULT_BOUNDS
+        self.histograms: dict[tuple[str, str, str], Histogram] = {}
+        self.requests: dict[tuple[str, str], int] = {}
+        self.errors: dict[tuple[str, str], int] = {}
+        self.cancelled: dict[tuple[str, str], int] = {}
+        self.tokens: dict[tuple[str, str, str], int] = {}
+        self._callbacks: list[Callable[[RequestRecord], None]] = []
+
+    def subscribe(self, callback: Callable[[RequestRecord], None]):
+        self._callbacks.append(callback)
+
+    def unsubscribe(self, callback: Callable[[RequestRecord], None]):
+        self._callbacks.remove(callback)
+
+    def _histogram(self, provider: str, model: str, name: str) -> Histogram:
+        key = (provider, model, name)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(self.bounds)
+        return histogram
+
+    def observe(self, record: RequestRecord):
+        provider, model = record.provider, record.model
+        series = (provider, model)
+        self.requests[series] = self.requests.get(series, 0) + 1
+        if record.error:
+            self.errors[series] = self.errors.get(series, 0) + 1
+        if record.cancelled:
+            self.cancelled[series] = self.cancelled.get(series, 0) + 1
+
+        for name, value in (("ttfb", record.ttfb), ("ttft", record.ttft), ("total", record.total)):
+            if value is not None:
+                self._histogram(provider, model, name).observe(value)
+        if record.inter_token_gaps:
+            histogram = self._histogram(provider, model, "inter_token")
+            for gap in record.inter_token_gaps:
+                histogram.observe(gap)
+        if record.tool_durations:
+            histogram = self._histogram(provider, model, "tool_block")
+            for duration in record.tool_durations:
+                histogram.observe(duration)
+
+        for kind, attr in _TOKENS.items():
+            value = getattr(record.metadata, attr) or 0
+            key = (provider, model, kind)
+            self.tokens[key] = self.tokens.get(key, 0) + value
+
+        for callback in self._callbacks:
+            try:
+                callback(record)
+            except Exception as e:
+                logger.error("metrics callback {!r} failed: {!r}", callback, e)
+
+    def quantiles(
+        self, provider: str, model: str, name: str, qs: tuple[float, ...] = (0.5, 0.95, 0.99)
+    ) -> dict[float, float]:
+        histogram = self.histograms.get((provider, model, name))
+        return {q: histogram.quantile(q) if histogram else math.nan for q in qs}
+
+    def prometheus(self, prefix: str = "echoflow_llm") -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def labels(provider: str, model: str, **extra) -> str:
+            pairs = {"provider": provider, "model": model, **extra}
+            return ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs.items())
+
+        for name, help_text in _HISTOGRAMS.items():
+            series = [(k, h) for k, h in self.histograms.items() if k[2] == name]
+            if not series:
+                continue
+            metric = f"{prefix}_{name}_seconds"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+            for (provider, model, _), histogram in sorted(series, key=lambda s: s[0]):
+                cumulative = 0
+                for bound, n in zip(histogram.bounds, histogram.counts):
+                    cumulative += n
+                    le = labels(provider, model, le=f"{bound:g}")
+                    lines.append(f"{metric}_bucket{{{le}}} {cumulative}")
+                le = labels(provider, model, le="+Inf")
+                lines.append(f"{metric}_bucket{{{le}}} {histogram.count}")
+                lines.append(f"{metric}_sum{{{labels(provider, model)}}} {histogram.sum:.6f}")
+                lines.append(f"{metric}_count{{{labels(provider, model)}}} {histogram.count}")
+
+        for name, values, help_text in (
+            ("requests_total", self.requests, "Streaming requests."),
+            ("errors_total", self.errors, "Streaming requests that failed."),
+            ("cancelled_total", self.cancelled, "Streaming requests abandoned by the consumer."),
+        ):
+            if values:
+                lines += [f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} counter"]
+                for (provider, model), n in sorted(values.items()):
+                    lines.append(f"{prefix}_{name}{{{labels(provider, model)}}} {n}")
+
+        if self.tokens:
+            metric = f"{prefix}_tokens_total"
+            lines += [f"# HELP {metric} Tokens by kind.", f"# TYPE {metric} counter"]
+            for (provider, model, kind), n in sorted(self.tokens.items()):
+                lines.append(f"{metric}{{{labels(provider, model, kind=kind)}}} {n}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str, prefix: str = "echoflow_llm"):
+        """Atomically write `prometheus()` to `path`."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus(prefix))
+        os.replace(tmp, path)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def get_metrics() -> Metrics:
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
+
+
+def init_metrics(metrics: Metrics):
+    global _metrics
+    _metrics = metrics
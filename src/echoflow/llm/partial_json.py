@@ -0,0 +1,215 @@
+import json
+import re
+from typing import Any
+
+_WHITESPACE = " \t\n\r"
+_STRING_SPECIAL = re.compile(r'["\\]')
+_CONTAINER_SPECIAL = re.compile(r'["\\{}\[\]]')
+_SCALAR_END = re.compile(r"[,}\s]")
+
+# states
+_START = 0
+_KEY_OR_END = 1
+_KEY = 2
+_COLON = 3
+_VALUE = 4
+_STRING = 5
+_CONTAINER = 6
+_SCALAR = 7
+_COMMA_OR_END = 8
+_NEXT_KEY = 9
+_DONE = 10
+_ERROR = 11
+
+
+class PartialJSONParser:
+    """Incremental parser for a JSON object that arrives in fragments, such as tool input deltas.
+
+    Every fragment is scanned once. Top-level arguments are decoded as soon as their value is
+    complete, and `partial` exposes the arguments known so far, including the prefix of a string
+    argument that is still streaming.
+    """
+
+    def __init__(self):
+        self.arguments: dict[str, Any] = {}
+        """Top-level arguments whose value is complete."""
+        self.error: str = None
+        self._state = _START
+        self._parts: list[str] = []  # raw text of the key or value being scanned
+        self._key: str = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def done(self) -> bool:
+        return self._state == _DONE
+
+    @property
+    def partial(self) -> dict[str, Any]:
+        """Complete arguments plus the decoded prefix of a string argument still streaming."""
+        if self._state != _STRING:
+            return self.arguments
+
+        raw = "".join(self._parts)
+        for cut in range(len(raw), max(len(raw) - 6, 0), -1):
+            try:
+                return {**self.arguments, self._key: json.loads(raw[:cut] + '"')}
+            except ValueError:
+                continue
+        return self.arguments
+
+    def feed(self, fragment: str) -> list[tuple[str, Any]]:
+        """Consume `fragment` and return the (name, value) of the arguments it completed."""
+        completed = []
+        i, n = 0, len(fragment)
+        while i < n and self._state != _ERROR:
+            state = self._state
+
+            if state in (_STRING, _KEY):
+                i = self._scan_string(fragment, i)
+                if self._state == _COLON:
+                    self._key = self._decode()
+                elif self._state == _COMMA_OR_END:
+                    completed.append(self._complete())
+
+            elif state == _CONTAINER:
+                i = self._scan_container(fragment, i)
+                if self._state == _COMMA_OR_END:
+                    completed.append(self._complete())
+
+            elif state == _SCALAR:
+                match = _SCALAR_END.search(fragment, i)
+                end = match.start() if match else n
+                self._parts.append(fragment[i:end])
+                i = end
+                if match:
+                    self._state = _COMMA_OR_END
+                    completed.append(self._complete())
+
+            else:
+                c = fragment[i]
+                i += 1
+                if c in _WHITESPACE:
+                    continue
+                self._step(c)
+
+        return [c for c in completed if c is not None]
+
+    def _step(self, c: str):
+        state = self._state
+        if state == _START:
+            self._state = _KEY_OR_END if c == "{" else _ERROR
+        elif state in (_KEY_OR_END, _NEXT_KEY):
+            if c == '"':
+                self._parts = ['"']
+                self._state = _KEY
+            elif c == "}" and state == _KEY_OR_END:
+                self._state = _DONE
+            else:
+                self._state = _ERROR
+        elif state == _COLON:
+            self._state = _VALUE if c == ":" else _ERROR
+        elif state == _VALUE:
+            self._parts = [c]
+            if c == '"':
+                self._state = _STRING
+            elif c in "{[":
+                self._depth, self._in_string, self._escape = 1, False, False
+                self._state = _CONTAINER
+            else:
+                self._state = _SCALAR
+        elif state == _COMMA_OR_END:
+            if c == ",":
+                self._state = _NEXT_KEY
+            elif c == "}":
+                self._state = _DONE
+            else:
+                self._state = _ERROR
+        elif state == _DONE:
+            self._state = _ERROR
+
+        if self._state == _ERROR:
+            self.error = f"unexpected {c!r} in tool input"
+
+    def _scan_string(self, fragment: str, i: int) -> int:
+        """Scan the body of a key or string value; return the index after what was consumed."""
+        n = len(fragment)
+        while i < n:
+            if self._escape:
+                self._escape = False
+                self._parts.append(fragment[i])
+                i += 1
+                continue
+
+            match = _STRING_SPECIAL.search(fragment, i)
+            if match is None:
+                self._parts.append(fragment[i:])
+                return n
+
+            end = match.end()
+            self._parts.append(fragment[i:end])
+            i = end
+            if match.group() == "\\":
+                self._escape = True
+            else:
+                self._state = _COLON if self._state == _KEY else _COMMA_OR_END
+                return i
+        return i
+
+    def _scan_container(self, fragment: str, i: int) -> int:
+        n = len(fragment)
+        while i < n:
+            if self._escape:
+                self._escape = False
+                self._parts.append(fragment[i])
+                i += 1
+                continue
+
+            pattern = _STRING_SPECIAL if self._in_string else _CONTAINER_SPECIAL
+            match = pattern.search(fragment, i)
+            if match is None:
+                self._parts.append(fragment[i:])
+                return n
+
+            end = match.end()
+            self._parts.append(fragment[i:end])
+            i = end
+            c = match.group()
+            if c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._in_string = not self._in_string
+            elif c in "{[":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._state = _COMMA_OR_END
+                    return i
+        return i
+
+    def _decode(self):
+        raw = "".join(self._parts)
+        self._parts = []
+        try:
+            return json.loads(raw)
+        except ValueError as e:
+            self._state = _ERROR
+            self.error = f"invalid JSON {raw[:50]!r} in tool input: {e}"
+            return None
+
+    def _complete(self):
+        value = self._decode()
+        if self._state == _ERROR:
+            return None
+        self.arguments[self._key] = value
+        return self._key, value
+
+    def close(self) -> dict[str, Any]:
+        """Finish parsing and return the complete input; raises ValueError if it is not JSON."""
+        if self._state == _START:
+            return {}
+        if self._state != _DONE:
+            raise ValueError(self.error or "tool input is incomplete")
+        return self.arguments
@@ -0,0 +1,393 @@
+import asyncio
+import json
+import os
+import re
+import time
+import zlib
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+
+from echoflow.llm.base_context import LLMContext
+from echoflow.llm.base_messages import DynamicMessages, Message, Messages, Text
+from echoflow.logger import get_logger
+
+logger = get_logger()
+
+_WORD = re.compile(r"\w+")
+_BLOCK_ELEMENTS = 1 << 22
+"""Elements scored per block in `VectorIndex.search`, bounding its scratch memory to 16 MiB."""
+
+
+class Embedder(ABC):
+    dim: int
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embeddings of `texts`, as a (len(texts), dim) float32 array."""
+
+
+class HashingEmbedder(Embedder):
+    """Signed feature hashing of the words and word bigrams of a text.
+
+    It needs no model and is stable across processes, which makes it a fit for tests and for
+    keyword-like retrieval, but it knows nothing about meaning.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            for feature in (*words, *(f"{a} {b}" for a, b in zip(words, words[1:]))):
+                h = zlib.crc32(feature.encode())
+                vectors[row, h % self.dim] += -1.0 if h & 0x80000000 else 1.0
+        return vectors
+
+
+@dataclass(slots=True)
+class Hit:
+    id: int
+    """Position of the chunk in the index, in insertion order."""
+    score: float
+    """Cosine similarity to the query."""
+    text: str
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class VectorIndex:
+    """Chunks of text and their embeddings, searched by cosine similarity.
+
+    Vectors are normalized on insert and kept in one contiguous array that grows by doubling, so
+    a search is a few matrix products over blocks of it. With `quantized`, every vector is stored
+    as int8 with a per-vector scale: a quarter of the memory of float32, for scores within about
+    1% of the exact ones.
+
+    A search scans every chunk unless the index is partitioned: `partition` clusters the chunks
+    into lists around k-means centroids, and a search then scans only the `probes` lists whose
+    centroids are nearest to the query, plus the chunks added since. This trades a little recall
+    for a search cost that stays in the milliseconds at a million chunks; partition again once
+    many chunks have been added.
+
+    `save` writes the index as .npy files, and `load` maps them into memory read-only, so that
+    worker processes loading the same index share its pages. Chunks added to a loaded index are
+    kept in memory; the mapped part is then copied once.
+    """
+
+    def __init__(self, dim: int, quantized: bool = False, capacity: int = 1024, probes: int = 16):
+        self.dim = dim
+        self.quantized = quantized
+        self.probes = probes
+        self._count = 0
+        self._vectors = np.empty((capacity, dim), dtype=np.int8 if quantized else np.float32)
+        self._scales = np.empty(capacity, dtype=np.float32) if quantized else None
+        self._ids: Optional[np.ndarray] = None
+        """Chunk id at every position of a partitioned index, whose vectors are grouped by list."""
+        self._centroids: Optional[np.ndarray] = None
+        self._bounds: Optional[np.ndarray] = None
+        """Start position of every list, and the end of the last one."""
+        self._texts: list[str] = []
+        self._blob: Optional[np.ndarray] = None
+        """UTF-8 text of the first `_loaded` chunks, for a loaded index."""
+        self._offsets: Optional[np.ndarray] = None
+        self._loaded = 0
+        self.truncated = 0
+        """Searches that stopped at their deadline before scanning every chunk they meant to."""
+
+    def __len__(self) -> int:
+        return self._count
+
+    def text(self, id: int) -> str:
+        if id < self._loaded:
+            return bytes(self._blob[self._offsets[id] : self._offsets[id + 1]]).decode()
+        return self._texts[id - self._loaded]
+
+    def _reserve(self, count: int):
+        capacity = len(self._vectors)
+        if count <= capacity and self._vectors.flags.writeable:
+            return
+        while capacity < count:
+            capacity *= 2
+
+        def grow(array: np.ndarray) -> np.ndarray:
+            grown = np.empty((capacity, *array.shape[1:]), dtype=array.dtype)
+            grown[: self._count] = array[: self._count]
+            return grown
+
+        self._vectors = grow(self._vectors)
+        if self.quantized:
+            self._scales = grow(self._scales)
+        if self._ids is not None:
+            self._ids = grow(self._ids)
+
+    def add(self, vectors: np.ndarray, texts: Sequence[str]) -> range:
+        """Add chunks and their embeddings, returning their ids."""
+        vectors = _normalize(vectors)
+        if vectors.shape != (len(texts), self.dim):
+            raise ValueError(f"expected {len(texts)} vectors of {self.dim}, got {vectors.shape}")
+
+        start, stop = self._count, self._count + len(texts)
+        self._reserve(stop)
+        if self.quantized:
+            scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+            self._vectors[start:stop] = np.rint(vectors / scales[:, None])
+            self._scales[start:stop] = scales
+        else:
+            self._vectors[start:stop] = vectors
+        if self._ids is not None:
+            self._ids[start:stop] = np.arange(start, stop)
+        self._texts.extend(texts)
+        self._count = stop
+        return range(start, stop)
+
+    def _rows(self, start: int, stop: int) -> np.ndarray:
+        """Normalized float32 vectors at positions [start, stop)."""
+        vectors = self._vectors[start:stop]
+        if not self.quantized:
+            return vectors
+        return vectors.astype(np.float32) * self._scales[start:stop, None]
+
+    def partition(self, lists: int = None, iterations: int = 8, seed: int = 0):
+        """Cluster the chunks into `lists` lists, by default about the square root of their count.
+
+        Centroids are trained with spherical k-means on a sample of 64 chunks per list, then every
+        chunk is assigned to its nearest centroid and the vectors are reordered list by list.
+        """
+        count = self._count
+        lists = min(lists or max(int(np.sqrt(count)), 1), count)
+        if lists == 0:
+            return
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(count, size=min(64 * lists, count), replace=False)
+        sample.sort()
+        points = self._vectors[sample].astype(np.float32)
+        if self.quantized:
+            points *= self._scales[sample, None]
+
+        centroids = points[rng.choice(len(points), size=lists, replace=False)]
+        for _ in range(iterations):
+            nearest = np.argmax(points @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, points)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+
+        block = max(_BLOCK_ELEMENTS // lists, 1)
+        assignment = np.empty(count, dtype=np.int64)
+        for start in range(0, count, block):
+            stop = min(start + block, count)
+            assignment[start:stop] = np.argmax(self._rows(start, stop) @ centroids.T, axis=1)
+
+        order = np.argsort(assignment, kind="stable")
+        self._vectors = self._vectors[order]
+        if self.quantized:
+            self._scales = self._scales[order]
+        self._ids = order if self._ids is None else self._ids[order]
+        self._centroids = centroids
+        self._bounds = np.searchsorted(assignment[order], np.arange(lists + 1))
+
+    def _ranges(self, query: np.ndarray, probes: int) -> list[tuple[int, int]]:
+        """Position ranges to scan for `query`, most promising first."""
+        if self._centroids is None:
+            return [(0, self._count)]
+        partitioned = int(self._bounds[-1])
+        ranges = [(partitioned, self._count)] if partitioned < self._count else []
+        scores = self._centroids @ query
+        probes = min(probes, len(scores))
+        nearest = np.argpartition(-scores, probes - 1)[:probes]
+        for list_ in nearest[np.argsort(-scores[nearest])]:
+            ranges.append((int(self._bounds[list_]), int(self._bounds[list_ + 1])))
+        return ranges
+
+    def search(
+        self, queries: np.ndarray, k: int = 4, deadline: float = None, probes: int = None
+    ) -> list[list[Hit]]:
+        """The `k` chunks most similar to each query, best first.
+
+        An unpartitioned index scores all queries together, one block of vectors at a time. With
+        `deadline`, a `time.perf_counter()` value, the search stops after the block during which
+        it passed and returns the best chunks among those scanned; a partitioned index scans its
+        lists nearest first, so stopping early costs the least recall.
+        """
+        queries = _normalize(queries)
+        k = min(k, self._count)
+        if k == 0:
+            return [[] for _ in queries]
+
+        probes = probes or self.probes
+        if self._centroids is None:
+            found = [self._scan(queries, self._ranges(None, probes), k, deadline)]
+        else:
+            found = [self._scan(q[None, :], self._ranges(q, probes), k, deadline) for q in queries]
+        hits = []
+        for scores, positions in found:
+            # probed lists may hold fewer than k chunks, so rows are not stacked across queries
+            ids = self._ids[positions] if self._ids is not None else positions
+            for row_scores, row_ids in zip(scores, ids):
+                order = np.argsort(-row_scores)
+                hits.append(
+                    [
+                        Hit(int(i), float(s), self.text(int(i)))
+                        for i, s in zip(row_ids[order], row_scores[order])
+                    ]
+                )
+        return hits
+
+    def _scan(
+        self, queries: np.ndarray, ranges: list[tuple[int, int]], k: int, deadline: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Top `k` scores, and their positions, of `queries` over `ranges`."""
+        block = max(_BLOCK_ELEMENTS // self.dim, k)
+        spans = [
+            (start, min(start + block, stop))
+            for first, stop in ranges
+            for start in range(first, stop, block)
+        ]
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best = np.empty((len(queries), 0), dtype=np.int64)
+        for i, (start, stop) in enumerate(spans):
+            if self.quantized:
+                scores = queries @ self._vectors[start:stop].astype(np.float32).T
+                scores *= self._scales[start:stop]
+            else:
+                scores = queries @ self._vectors[start:stop].T
+
+            positions = np.broadcast_to(np.arange(start, stop), scores.shape)
+            scores = np.concatenate((best_scores, scores), axis=1)
+            positions = np.concatenate((best, positions), axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                positions = np.take_along_axis(positions, top, axis=1)
+            best_scores, best = scores, positions
+
+            if deadline is not None and i + 1 < len(spans) and time.perf_counter() >= deadline:
+                self.truncated += 1
+                logger.debug("search stopped after {} of {} blocks", i + 1, len(spans))
+                break
+        return best_scores, best
+
+    def save(self, directory: str):
+        """Write the index to `directory`, replacing any index there."""
+        os.makedirs(directory, exist_ok=True)
+        texts = [self.text(i).encode() for i in range(self._count)]
+        offsets = np.zeros(self._count + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in texts], out=offsets[1:])
+        arrays = {
+            "vectors": self._vectors[: self._count],
+            "texts": np.frombuffer(b"".join(texts), dtype=np.uint8),
+            "offsets": offsets,
+        }
+        if self.quantized:
+            arrays["scales"] = self._scales[: self._count]
+        if self._centroids is not None:
+            arrays["ids"] = self._ids[: self._count]
+            arrays["centroids"] = self._centroids
+            arrays["bounds"] = self._bounds
+
+        for name, array in arrays.items():
+            tmp = os.path.join(directory, f"{name}.tmp.npy")
+            np.save(tmp, array)
+            os.replace(tmp, os.path.join(directory, f"{name}.npy"))
+        meta = {
+            "dim": self.dim,
+            "quantized": self.quantized,
+            "partitioned": self._centroids is not None,
+            "count": self._count,
+        }
+        tmp = os.path.join(directory, "index.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(directory, "index.json"))
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True, probes: int = 16) -> "VectorIndex":
+        """Read an index written by `save`, mapping its arrays into memory with `mmap`."""
+        with open(os.path.join(directory, "index.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+
+        def array(name: str) -> np.ndarray:
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+
+        index = cls(meta["dim"], meta["quantized"], capacity=1, probes=probes)
+        index._vectors = array("vectors")
+        if index.quantized:
+            index._scales = array("scales")
+        if meta.get("partitioned"):
+            index._ids = array("ids")
+            index._centroids = np.load(os.path.join(directory, "centroids.npy"))
+            index._bounds = np.load(os.path.join(directory, "bounds.npy"))
+        index._blob = array("texts")
+        index._offsets = array("offsets")
+        index._count = index._loaded = meta["count"]
+        return index
+
+
+def _last_user_text(history: Optional[Messages]) -> str:
+    for message in reversed(history or []):
+        if message.role == "user":
+            return " ".join(c for c in message.content if isinstance(c, Text))
+    return ""
+
+
+class Retriever:
+    """Fills `ctx.rag` with the indexed chunks most similar to the user's last utterance.
+
+    `ctx.rag` must be DynamicMessages; its content is replaced on every call. Embedding and search
+    run in a worker thread, since NumPy releases the GIL, and the search stops scanning once
+    `budget` seconds have passed since the call, so that retrieval never holds up a turn for long.
+    """
+
+    def __init__(
+        self,
+        index: VectorIndex,
+        embedder: Embedder,
+        k: int = 4,
+        min_score: float = 0.0,
+        budget: float = 0.005,
+        template: str = "<context>\n{text}\n</context>",
+    ):
+        self.index = index
+        self.embedder = embedder
+        self.k = k
+        self.min_score = min_score
+        self.budget = budget
+        self.template = template
+
+    def add(self, texts: Sequence[str]) -> range:
+        """Embed and index `texts`."""
+        return self.index.add(self.embedder.embed(texts), texts)
+
+    def search(self, queries: Sequence[str], deadline: float = None) -> list[list[Hit]]:
+        if deadline is None:
+            deadline = time.perf_counter() + self.budget
+        hits = self.index.search(self.embedder.embed(queries), self.k, deadline)
+        return [[h for h in found if h.score >= self.min_score] for found in hits]
+
+    async def retrieve(self, ctx: LLMContext, query: str = None) -> list[Hit]:
+        """Search for `query`, by default the last user message of `ctx.history`, into `ctx.rag`."""
+        if not isinstance(ctx.rag, DynamicMessages):
+            raise TypeError(f"ctx.rag must be DynamicMessages, not {type(ctx.rag).__name__}")
+        if query is None:
+            query = _last_user_text(ctx.history)
+
+        hits = []
+        if query:
+            deadline = time.perf_counter() + self.budget
+            hits = (await asyncio.to_thread(self.search, [query], deadline))[0]
+        content = [self.template.format(text=h.text, id=h.id, score=h.score) for h in hits]
+        ctx.rag[:] = [Message(role="user", content=content)] if content else []
+        return hits
@@ -0,0 +1,253 @@
+import asyncio
+import copy
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, is_dataclass
+from typing import AsyncGenerator, Callable, Optional
+
+from echoflow.llm.base_client import Client, StreamEvent, StreamEventType
+from echoflow.llm.base_context import LLMContext
+from echoflow.llm.tokens import serialize
+from echoflow.logger import get_logger
+
+logger = get_logger()
+
+
+def request_key(ctx: LLMContext) -> str:
+    """Canonical hash of everything in `ctx` that the reply depends on."""
+    tools = [(t.name, t.description, t.input_schema.json_schema()) for t in ctx.tools]
+    request = {
+        "params": asdict(ctx.params) if is_dataclass(ctx.params) else ctx.params,
+        "system": ctx.system.value if ctx.system else None,
+        "history": ctx.history.value if ctx.history else None,
+        "rag": ctx.rag.value if ctx.rag else None,
+        "tools": tools,
+    }
+    if ctx.dynamic:
+        request["dynamic"] = ctx.dynamic
+    return hashlib.blake2b(serialize(request).encode(), digest_size=20).hexdigest()
+
+
+def _replayable(events: list[StreamEvent]) -> bool:
+    """Whether a recorded stream is a complete answer that can be replayed as is."""
+    for event in events:
+        if event.type == StreamEventType.error or "result" in event.data:
+            return False
+    return bool(events) and events[-1].type in (StreamEventType.metadata, StreamEventType.stop)
+
+
+_IMMUTABLE = (str, int, float, bool, type(None), bytes)
+
+
+def _copy(event: StreamEvent) -> StreamEvent:
+    """A copy of `event` that its consumer may mutate, such as its Metadata or ToolCall."""
+    data = {k: v if isinstance(v, _IMMUTABLE) else copy.deepcopy(v) for k, v in event.data.items()}
+    return StreamEvent(type=event.type, data=data)
+
+
+class _Flight:
+    """An upstream request in progress, whose events every identical request follows."""
+
+    def __init__(
+        self, stream: AsyncGenerator[StreamEvent, None], landed: Callable[["_Flight"], None]
+    ):
+        self.landed = landed
+        self.events: list[StreamEvent] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.abandoned = False
+        """Cancelled when its last subscriber left; identical requests start a new flight."""
+        self._changed = asyncio.Event()
+        self.task = asyncio.create_task(self._run(stream))
+
+    async def _run(self, stream: AsyncGenerator[StreamEvent, None]):
+        try:
+            async for event in stream:
+                self.events.append(event)
+                self._notify()
+        except BaseException as e:
+            self.error = e
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            await stream.aclose()
+            self.done = True
+            self.landed(self)
+            self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self) -> AsyncGenerator[StreamEvent, None]:
+        i = 0
+        while True:
+            while i < len(self.events):
+                yield _copy(self.events[i])
+                i += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class CachedClient(Client):
+    """Wraps a Client with an exact-match cache of complete replies.
+
+    Replies are keyed by `request_key`, kept in an LRU of `max_entries` for `ttl` seconds and,
+    when `directory` is given, also pickled to disk so that they outlive the process; the
+    directory must only be writable by trusted processes. Disk reads and writes run in worker
+    threads, so only memory hits are served without leaving the event loop. A cached reply is
+    replayed as a stream of copies of the recorded events, `pace` seconds apart per text delta if
+    set. Identical requests made while one is in flight share its upstream request (single
+    flight): every one of them streams its events as they arrive.
+
+    Requests with extra keyword arguments, such as a tool executor, bypass the cache, and only
+    complete replies without errors or running tool results are stored. Use `should_cache` to
+    restrict caching, e.g. to `temperature == 0`.
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        max_entries: int = 1024,
+        ttl: float = 3600.0,
+        directory: str = None,
+        pace: Optional[float] = None,
+        should_cache: Callable[[LLMContext], bool] = None,
+    ):
+        self.client = client
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.directory = directory
+        self.pace = pace
+        self.should_cache = should_cache
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._entries: OrderedDict[str, tuple[float, list[StreamEvent]]] = OrderedDict()
+        self._flights: dict[str, _Flight] = {}
+        self._writes: set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        """Requests that followed an identical request in flight."""
+
+    def release(self, ctx: LLMContext):
+        self.client.release(ctx)
+
+    async def stream_generate(self, ctx: LLMContext, **kwargs) -> AsyncGenerator[StreamEvent, None]:
+        if kwargs or (self.should_cache and not self.should_cache(ctx)):
+            async for event in self.client.stream_generate(ctx, **kwargs):
+                yield event
+            return
+
+        key = request_key(ctx)
+        events = await self.get(key)
+        if events is not None:
+            self.hits += 1
+            async for event in self._replay(events):
+                yield event
+            return
+
+        flight = self._flights.get(key)
+        if flight is None or flight.abandoned:
+            self.misses += 1
+            stream = self.client.stream_generate(ctx)
+            flight = self._flights[key] = _Flight(stream, lambda f: self._land(key, f))
+        else:
+            self.coalesced += 1
+
+        flight.subscribers += 1
+        try:
+            async for event in flight.follow():
+                yield event
+        finally:
+            flight.subscribers -= 1
+            if not flight.subscribers and not flight.done:
+                flight.abandoned = True
+                flight.task.cancel()
+
+    async def _replay(self, events: list[StreamEvent]) -> AsyncGenerator[StreamEvent, None]:
+        for event in events:
+            if self.pace and event.type == StreamEventType.text_delta:
+                await asyncio.sleep(self.pace)
+            event = _copy(event)
+            if event.type == StreamEventType.metadata:
+                event.data["cached"] = True  # no tokens were spent on this reply
+            yield event
+
+    def _land(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if flight.error is None and _replayable(flight.events):
+            task = asyncio.ensure_future(self.put(key, flight.events))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    async def get(self, key: str) -> Optional[list[StreamEvent]]:
+        """The recorded events under `key`, if not expired; disk reads run in a worker thread."""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+            del self._entries[key]
+
+        if not self.directory:
+            return None
+        entry = await asyncio.to_thread(self._read, key, now)
+        if entry is None:
+            return None
+        self._remember(key, *entry)
+        return entry[1]
+
+    async def put(self, key: str, events: list[StreamEvent]):
+        """Record `events` under `key`; the disk write runs in a worker thread."""
+        expiry = time.time() + self.ttl
+        self._remember(key, expiry, events)
+        if self.directory:
+            await asyncio.to_thread(self._write, key, expiry, events)
+
+    async def flush(self):
+        """Wait until the replies being stored are written to disk."""
+        while self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    def _read(self, key: str, now: float) -> Optional[tuple[float, list[StreamEvent]]]:
+        path = os.path.join(self.directory, key)
+        try:
+            with open(path, "rb") as f:
+                expiry, events = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warn("dropping unreadable cached reply {}: {!r}", path, e)
+            expiry = 0
+        if expiry <= now:
+            os.remove(path)
+            return None
+        return expiry, events
+
+    def _write(self, key: str, expiry: float, events: list[StreamEvent]):
+        path = os.path.join(self.directory, key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump((expiry, events), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.warn("could not store cached reply {}: {!r}", path, e)
+
+    def _remember(self, key: str, expiry: float, events: list[StreamEvent]):
+        self._entries[key] = (expiry, events)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,196 @@
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import AsyncGenerator, Optional
+
+from echoflow.llm.base_client import Client, StreamEvent, StreamEventType
+from echoflow.llm.base_context import LLMContext
+from echoflow.llm.tokens import estimate_request_tokens
+from echoflow.logger import get_logger
+
+logger = get_logger()
+
+
+@dataclass
+class Backend:
+    name: str
+    client: Client
+    model_id: Optional[str] = None
+    """Model to request, replacing `ctx.params.model_id`; None keeps the request's model."""
+    supports_tools: bool = True
+    context_tokens: Optional[int] = None
+    """Largest request the model accepts, in tokens; None for no limit."""
+
+
+@dataclass
+class Constraints:
+    """Requirements of one request, passed as `stream_generate(ctx, constraints=...)`."""
+
+    max_ttft: Optional[float] = None
+    """Seconds; backends measured slower to the first token are avoided."""
+    tools: Optional[bool] = None
+    """Whether tool support is needed; None: whenever the request has tools."""
+    context_tokens: Optional[int] = None
+    """Size of the request in tokens; None: estimated from the request."""
+    expected_output_tokens: int = 100
+    """Output length used to weigh time to first token against tokens per second."""
+
+
+class BackendStats:
+    """Rolling measurements of one backend, as exponentially weighted moving averages."""
+
+    def __init__(self, ttft: float, tokens_per_second: float, weight: float, half_life: float):
+        self.ttft = ttft
+        """Seconds from the request to the first content event."""
+        self.tokens_per_second = tokens_per_second
+        self.weight = weight
+        self.half_life = half_life
+        self.requests = 0
+        self._error_rate = 0.0
+        self._error_time = 0.0
+
+    @property
+    def error_rate(self) -> float:
+        """Weighted share of failed requests, halving every `half_life` seconds without requests.
+
+        The decay lets a backend that failed be tried again once its failures are old.
+        """
+        if not self._error_rate:
+            return 0.0
+        age = time.monotonic() - self._error_time
+        return self._error_rate * math.pow(0.5, age / self.half_life)
+
+    def observe(self, ttft: Optional[float], tokens_per_second: Optional[float], error: bool):
+        w = self.weight
+        self.requests += 1
+        if ttft is not None:
+            self.ttft += w * (ttft - self.ttft)
+        if tokens_per_second is not None:
+            self.tokens_per_second += w * (tokens_per_second - self.tokens_per_second)
+        self._error_rate = self.error_rate + w * (error - self.error_rate)
+        self._error_time = time.monotonic()
+
+    def expected_latency(self, output_tokens: int) -> float:
+        """Expected seconds to stream `output_tokens`, stretched by the retries failures cost."""
+        latency = self.ttft + output_tokens / max(self.tokens_per_second, 1e-3)
+        return latency / max(1.0 - self.error_rate, 0.05)
+
+
+class RouterClient(Client):
+    """Sends each request to the backend expected to answer it fastest.
+
+    A backend is a client, optionally pinned to a model, so backends can be different models of
+    one provider or different providers. Every request updates the backend's rolling time to
+    first token, tokens per second and error rate; a request goes to the backend with the
+    lowest expected latency among those that meet its `Constraints`. A backend without
+    measurements yet starts at `initial_ttft` and `initial_tokens_per_second`.
+
+    Requests of a session (`ctx.session_id`, set on first use when missing) keep going to the
+    backend that served the session before, so that its prompt cache stays warm, until that
+    backend no longer meets the constraints or is expected to be more than `switch_margin`
+    slower than the best one.
+
+    Failed requests are raised; wrap the backends in a HedgedClient to fail over.
+    """
+
+    def __init__(
+        self,
+        backends: list[Backend],
+        weight: float = 0.2,
+        initial_ttft: float = 0.5,
+        initial_tokens_per_second: float = 50.0,
+        error_half_life: float = 60.0,
+        switch_margin: float = 0.5,
+        max_sessions: int = 100_000,
+    ):
+        if not backends:
+            raise ValueError("RouterClient needs at least one backend")
+        self.backends = backends
+        self.stats = {
+            b.name: BackendStats(initial_ttft, initial_tokens_per_second, weight, error_half_life)
+            for b in backends
+        }
+        self.switch_margin = switch_margin
+        self.max_sessions = max_sessions
+        self._sessions: OrderedDict[str, str] = OrderedDict()
+
+    def route(self, ctx: LLMContext, constraints: Constraints = None) -> Backend:
+        """The backend for `ctx`.
+
+        Raises:
+            ValueError: No backend supports the request's tools or context size.
+        """
+        constraints = constraints or Constraints()
+        tools = constraints.tools if constraints.tools is not None else bool(ctx.tools)
+        candidates = [b for b in self.backends if b.supports_tools or not tools]
+        if any(b.context_tokens is not None for b in candidates):
+            size = constraints.context_tokens
+            if size is None:
+                size = estimate_request_tokens(ctx)
+            candidates = [
+                b for b in candidates if b.context_tokens is None or size <= b.context_tokens
+            ]
+        if not candidates:
+            raise ValueError("no backend supports the tools and context size of the request")
+
+        if constraints.max_ttft is not None:
+            fast = [b for b in candidates if self.stats[b.name].ttft <= constraints.max_ttft]
+            candidates = fast or [min(candidates, key=lambda b: self.stats[b.name].ttft)]
+
+        output = constraints.expected_output_tokens
+        latency = {b.name: self.stats[b.name].expected_latency(output) for b in candidates}
+        best = min(candidates, key=lambda b: latency[b.name])
+
+        session = ctx.session_id
+        if session is None:
+            return best
+        sticky = self._sessions.get(session)
+        if sticky in latency and latency[sticky] <= latency[best.name] * (1 + self.switch_margin):
+            best = next(b for b in candidates if b.name == sticky)
+        elif sticky is not None:
+            logger.info("session {} moves from backend {} to {}", session, sticky, best.name)
+        self._sessions[session] = best.name
+        self._sessions.move_to_end(session)
+        if len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return best
+
+    def release(self, ctx: LLMContext):
+        # the session keeps its backend, whose prompt cache may still hold its prefix
+        for backend in self.backends:
+            backend.client.release(ctx)
+
+    async def stream_generate(self, ctx: LLMContext, **kwargs) -> AsyncGenerator[StreamEvent, None]:
+        # the copy below keeps the session, and with it the backend's prompt-cache planning
+        ctx.ensure_session_id()
+        backend = self.route(ctx, kwargs.pop("constraints", None))
+        if backend.model_id is not None and ctx.params is not None:
+            ctx = replace(ctx, params=replace(ctx.params, model_id=backend.model_id))
+
+        start = time.perf_counter()
+        ttft = first = None
+        output_tokens = 0
+        failed = completed = False
+        try:
+            async for event in backend.client.stream_generate(ctx, **kwargs):
+                if event.type == StreamEventType.error:
+                    # invalid tool input is the model's output, not the backend's health
+                    failed = failed or "tool" not in event.data
+                elif event.type == StreamEventType.metadata:
+                    output_tokens = event.data["metadata"].output_text_tokens or 0
+                elif event.type != StreamEventType.start and ttft is None:
+                    first = time.perf_counter()
+                    ttft = first - start
+                yield event
+            completed = True
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # a request the consumer abandoned early says nothing about the backend
+            if failed or ttft is not None:
+                tokens_per_second = None
+                if completed and not failed and output_tokens:
+                    tokens_per_second = output_tokens / max(time.perf_counter() - first, 1e-3)
+                self.stats[backend.name].observe(ttft, tokens_per_second, failed)
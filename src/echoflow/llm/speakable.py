@@ -0,0 +1,133 @@
+import re
+from dataclasses import dataclass
+from typing import AsyncGenerator, Optional
+
+from echoflow.llm.base_client import Client, StreamEvent, StreamEventType
+from echoflow.llm.base_context import LLMContext
+
+# Latin punctuation only ends a segment once followed by whitespace ("3.14", "e.g." and "1,000"
+# stay whole); CJK punctuation ends it right away.
+_CLOSERS = "\"'”’)）」』】》"
+_STRONG = re.compile(rf"(?:[。！？…\n]+|[.!?]+(?=[{_CLOSERS}]*\s))[{_CLOSERS}]*")
+_CLAUSE = re.compile(
+    rf"(?:[。！？…\n，、；：]+|[.!?,;:]+(?=[{_CLOSERS}]*\s)|\s[-–—]+(?=\s))[{_CLOSERS}]*"
+)
+_SOFT = frozenset(" \t\n，、；：,;:")
+_LOOKBACK = 8
+
+
+@dataclass
+class SegmentPolicy:
+    first_min_chars: int = 2
+    """The first segment ends at the first clause punctuation after this many characters."""
+    first_max_chars: int = 24
+    """...or is cut at this many characters when no punctuation shows up."""
+    growth: float = 2.0
+    """Each later segment may grow this much longer than the previous one."""
+    max_chars: int = 200
+    """Upper bound of any segment."""
+
+
+class Segmenter:
+    """Splits streamed text into speakable segments.
+
+    The first segment is emitted as early as possible, at the first clause punctuation. Later
+    segments end at sentence punctuation and are allowed to grow, segment k ending somewhere
+    between first_max_chars * growth ** (k - 1) and first_max_chars * growth ** k characters,
+    which gives TTS longer units with better prosody once playback has started. Concatenating the
+    segments gives back the text exactly.
+    """
+
+    def __init__(self, policy: SegmentPolicy = None):
+        self.policy = policy or SegmentPolicy()
+        self.buffer = ""
+        self.count = 0
+
+    def _limit(self, k: int) -> int:
+        if k < 0:
+            return self.policy.first_min_chars
+        limit = int(self.policy.first_max_chars * self.policy.growth**k)
+        return min(limit, self.policy.max_chars)
+
+    def feed(self, text: str) -> list[str]:
+        """Add a text delta; return the segments it completed."""
+        start = max(len(self.buffer) - _LOOKBACK, 0)
+        self.buffer += text
+        segments = []
+        while self.buffer:
+            end = self._boundary(start)
+            if end is None:
+                break
+            segments.append(self.buffer[:end])
+            self.buffer = self.buffer[end:]
+            self.count += 1
+            start = 0
+        return segments
+
+    def flush(self) -> Optional[str]:
+        """Return whatever text is left, ending the current segment."""
+        text, self.buffer = self.buffer, ""
+        if not text:
+            return None
+        self.count += 1
+        return text
+
+    def _boundary(self, start: int) -> Optional[int]:
+        buffer = self.buffer
+        low, high = self._limit(self.count - 1), self._limit(self.count)
+        if len(buffer) < low:
+            return None
+        first = self.count == 0
+
+        end = None
+        for match in (_CLAUSE if first else _STRONG).finditer(buffer, start):
+            if match.end() < low:
+                continue
+            if end is None or match.end() <= high:
+                end = match.end()
+            if first or end > high:
+                break
+        if end is not None:
+            return end
+
+        if len(buffer) < high:
+            return None
+        for i in range(high - 1, high // 2, -1):
+            if buffer[i] in _SOFT:
+                return i + 1
+        return high
+
+
+class SpeakableClient(Client):
+    """Wraps a Client and adds `segment` events carrying speakable text for TTS.
+
+    Every event of the wrapped client is passed through unchanged. Text deltas are also fed to a
+    Segmenter; each completed segment follows the delta that completed it, and any remaining text
+    is flushed as a segment before the next non-text event so that segments and tool, stop and
+    metadata events keep their order.
+    """
+
+    def __init__(self, client: Client, policy: SegmentPolicy = None):
+        self.client = client
+        self.policy = policy or SegmentPolicy()
+
+    def release(self, ctx: LLMContext):
+        self.client.release(ctx)
+
+    async def stream_generate(self, ctx: LLMContext, **kwargs) -> AsyncGenerator[StreamEvent, None]:
+        segmenter = Segmenter(self.policy)
+        async for event in self.client.stream_generate(ctx, **kwargs):
+            if event.type == StreamEventType.text_delta:
+                yield event
+                for text in segmenter.feed(event.data["text_delta"]):
+                    yield StreamEvent(type=StreamEventType.segment, data={"text": text})
+                continue
+
+            text = segmenter.flush()
+            if text:
+                yield StreamEvent(type=StreamEventType.segment, data={"text": text})
+            yield event
+
+        text = segmenter.flush()
+        if text:
+            yield StreamEvent(type=StreamEventType.segment, data={"text": text})
@@ -0,0 +1,307 @@
+import contextlib
+import json
+import os
+import sys
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Optional
+from urllib.parse import quote
+
+from echoflow.llm.base_messages import Message, Messages, ToolCall, ToolResult
+from echoflow.logger import get_logger
+
+logger = get_logger()
+
+
+def encode_message(message: Message, seq: int) -> dict:
+    """Compact JSON form of a message; `seq` orders it within its session."""
+    content = []
+    for item in message.content:
+        if isinstance(item, ToolCall):
+            content.append({"t": "call", "id": item.id, "name": item.name, "input": item.input})
+        elif isinstance(item, ToolResult):
+            record = {"t": "result", "id": item.id, "content": item.content, "error": item.is_error}
+            if item.blob is not None:
+                record["blob"] = item.blob
+            content.append(record)
+        else:
+            content.append(item)
+    return {"s": seq, "r": message.role, "c": content}
+
+
+def _decode_item(item):
+    if isinstance(item, str):
+        return item
+    if item["t"] == "call":
+        return ToolCall(item["id"], sys.intern(item["name"]), item["input"])
+    return ToolResult(item["id"], item["content"], item["error"], item.get("blob"))
+
+
+def decode_message(record: dict) -> Message:
+    # decoded strings are new objects; interned, every session shares one copy of these
+    return Message(sys.intern(record["r"]), [_decode_item(item) for item in record["c"]])
+
+
+class Store(ABC):
+    """Persists the messages of sessions so that a session can be rebuilt on another worker."""
+
+    @abstractmethod
+    def save(self, session_id: str, message: Message) -> Future:
+        """Persist `message`; the returned future resolves once it is durable.
+
+        Wait on it with `.result()`, or `await asyncio.wrap_future(...)` on an event loop.
+        """
+        pass
+
+    @abstractmethod
+    def load(self, session_id: str) -> list[Message]:
+        pass
+
+    def restore(self, session_id: str, messages: Messages) -> Messages:
+        """Add the stored messages of `session_id` to `messages`, e.g. a fresh history."""
+        for message in self.load(session_id):
+            messages.add_message(message)
+        return messages
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+@dataclass
+class _Session:
+    seq: int = 0
+    """Sequence number of the last message saved."""
+    unsnapshotted: int = 0
+    """Messages in the log that the snapshot does not cover yet."""
+
+
+class FileStore(Store):
+    """Append-only session log with periodic snapshots.
+
+    Every session has a `<id>.log` file of JSON lines and a `<id>.snap` file holding the compacted
+    messages up to some sequence number. `save` only buffers and returns a future that resolves
+    once the record is fsynced; buffered records are written and fsynced together by `commit`,
+    which runs in a background thread every `commit_interval` seconds and as soon as `max_pending`
+    records are buffered, and on `close`. Records whose write fails stay buffered, and their
+    futures pending, until a later commit succeeds. Once the log of a session holds
+    `snapshot_every` records and at least as many as its snapshot, the snapshot is rewritten
+    atomically and the log is truncated, which keeps compaction linear in the session length.
+
+    Loading reads each file with a single buffered read and decodes the log in one `json.loads`
+    call. A torn last line left by a crash is ignored, and log records already covered by the
+    snapshot (a crash between writing the snapshot and truncating the log) are skipped by their
+    sequence number. A session must have a single writer at a time.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        commit_interval: Optional[float] = 0.05,
+        max_pending: int = 256,
+        snapshot_every: int = 1000,
+        fsync: bool = True,
+    ):
+        self.directory = directory
+        self.commit_interval = commit_interval
+        self.max_pending = max_pending
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+        self._sessions: dict[str, _Session] = {}
+        self._pending: dict[str, list[str]] = {}
+        self._pending_count = 0
+        self._durable: dict[str, Future] = {}
+        """Session -> future of its pending records."""
+        self._lock = threading.Lock()
+        self._commit_lock = threading.RLock()
+        self._closed = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        if commit_interval:
+            self._thread = threading.Thread(target=self._run, name="FileStore", daemon=True)
+            self._thread.start()
+
+    def _path(self, session_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, quote(str(session_id), safe="") + suffix)
+
+    def _run(self):
+        while not self._closed.is_set():
+            self._wake.wait(self.commit_interval)
+            self._wake.clear()
+            try:
+                self.commit()
+            except Exception as e:
+                logger.error("FileStore commit failed, retrying: {!r}", e)
+
+    def save(self, session_id: str, message: Message) -> Future:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = self._scan(session_id)
+            session.seq += 1
+            line = json.dumps(encode_message(message, session.seq), ensure_ascii=False)
+            self._pending.setdefault(session_id, []).append(line)
+            self._pending_count += 1
+            durable = self._durable.get(session_id)
+            if durable is None:
+                durable = self._durable[session_id] = Future()
+            full = self._pending_count >= self.max_pending
+        if full:
+            if self._thread:
+                self._wake.set()  # writes stay off the caller's thread, often an event loop
+            else:
+                self.commit()
+        return durable
+
+    def commit(self):
+        """Write and fsync every buffered record, one write per session.
+
+        Raises the first write error after putting the records that failed back in the buffer.
+        """
+        with self._commit_lock:
+            with self._lock:
+                pending, self._pending, self._pending_count = self._pending, {}, 0
+                durable, self._durable = self._durable, {}
+            error = None
+            for session_id, lines in pending.items():
+                try:
+                    self._append(session_id, lines)
+                except Exception as e:
+                    error = error or e
+                    self._restore(session_id, lines, durable[session_id])
+                    continue
+                durable[session_id].set_result(None)
+
+                session = self._sessions[session_id]
+                session.unsnapshotted += len(lines)
+                covered = session.seq - session.unsnapshotted
+                if session.unsnapshotted >= max(self.snapshot_every, covered):
+                    try:
+                        self.snapshot(session_id)
+                    except Exception as e:  # the records are durable in the log regardless
+                        logger.error("FileStore snapshot of {} failed: {!r}", session_id, e)
+            if error is not None:
+                raise error
+
+    def _append(self, session_id: str, lines: list[str]):
+        path = self._path(session_id, ".log")
+        start = os.path.getsize(path) if os.path.exists(path) else 0
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+        except BaseException:
+            # a retried commit must neither duplicate records nor follow a torn one
+            with contextlib.suppress(OSError):
+                os.truncate(path, start)
+            raise
+
+    def _restore(self, session_id: str, lines: list[str], durable: Future):
+        with self._lock:
+            self._pending[session_id] = lines + self._pending.get(session_id, [])
+            self._pending_count += len(lines)
+            later = self._durable.get(session_id)
+            self._durable[session_id] = durable
+        if later is not None:  # records saved during the failed commit
+            durable.add_done_callback(lambda f: _settle(later, f))
+
+    def snapshot(self, session_id: str):
+        """Compact the log of `session_id` into its snapshot."""
+        with self._commit_lock:
+            _, seq, messages = self._read(session_id)
+            tmp = self._path(session_id, ".snap.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"seq": seq, "messages": messages}, ensure_ascii=False))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp, self._path(session_id, ".snap"))
+            # records saved meanwhile are still pending and land in the truncated log
+            open(self._path(session_id, ".log"), "w").close()
+            if session_id in self._sessions:
+                self._sessions[session_id].unsnapshotted = 0
+
+    def load(self, session_id: str) -> list[Message]:
+        self.commit()
+        return [decode_message(record) for record in self._read(session_id)[2]]
+
+    def _scan(self, session_id: str) -> _Session:
+        covered, seq, _ = self._read(session_id)
+        path = self._path(session_id, ".log")
+        if os.path.exists(path):
+            # cut a torn last record so that new records start on a line of their own
+            with open(path, "rb+") as f:
+                data = f.read()
+                f.truncate(data.rfind(b"\n") + 1)
+        return _Session(seq=seq, unsnapshotted=seq - covered)
+
+    def _read(self, session_id: str) -> tuple[int, int, list[dict]]:
+        """The snapshot's and the last sequence number, and the encoded messages of a session."""
+        snapshot = _read_json(self._path(session_id, ".snap"))
+        seq, messages = (snapshot["seq"], snapshot["messages"]) if snapshot else (0, [])
+        covered = seq
+
+        try:
+            with open(self._path(session_id, ".log"), encoding="utf-8") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return covered, seq, messages
+
+        end = data.rfind("\n")
+        if end != len(data) - 1:
+            logger.warn("ignoring a torn record at the end of the log of {}", session_id)
+        if end <= 0:
+            return covered, seq, messages
+
+        records = json.loads("[" + data[:end].replace("\n", ",") + "]")
+        if records and records[0]["s"] <= seq:
+            records = [r for r in records if r["s"] > seq]
+        if records:
+            seq = records[-1]["s"]
+            messages = messages + records
+        return covered, seq, messages
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+        try:
+            self.commit()
+        except Exception as e:
+            with self._lock:
+                durable, self._durable = self._durable, {}
+            for future in durable.values():
+                future.set_exception(e)
+            raise
+
+
+def _settle(future: Future, done: Future):
+    if done.exception() is not None:
+        future.set_exception(done.exception())
+    else:
+        future.set_result(done.result())
+
+
+def _read_json(path: str) -> Optional[Any]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
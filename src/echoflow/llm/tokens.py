@@ -0,0 +1,24 @@
+import json
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of `text`: about 4 ASCII characters per token, 1 per other character."""
+    non_ascii = len(text) - len(text.encode("ascii", "ignore"))
+    return (len(text) - non_ascii + 3) // 4 + non_ascii
+
+
+def serialize(value) -> str:
+    """Canonical JSON form of a provider payload element, used for hashing and token estimates."""
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def estimate_request_tokens(ctx) -> int:
+    """Estimated input tokens of an LLMContext, using the running estimate of a windowed history."""
+    history = ctx.history
+    tokens = getattr(history, "tokens", None)
+    if tokens is not None:
+        history = None
+    parts = [m.value for m in (ctx.system, history, ctx.rag) if m]
+    parts += [(t.name, t.description, t.input_schema.json_schema()) for t in ctx.tools]
+    parts += list(ctx.dynamic.values()) if ctx.dynamic else []
+    return (tokens or 0) + estimate_tokens(serialize(parts))
@@ -0,0 +1,188 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from echoflow.llm.base_messages import Message, ToolCall, ToolResult
+from echoflow.llm.base_tools import Tool, ToolWrapper
+from echoflow.logger import get_logger
+
+logger = get_logger()
+
+
+@dataclass
+class ToolLimits:
+    timeout: Optional[float] = None
+    """Seconds a single call may take, None to use the executor default."""
+    max_concurrency: Optional[int] = None
+    """Calls of this tool running at the same time, None for no cap of its own."""
+
+
+def is_async(tool: Tool) -> bool:
+    """Whether `tool` implements `async_call`, looking through ToolWrapper layers."""
+    while isinstance(tool, ToolWrapper):
+        tool = tool._source
+    return type(tool).async_call is not Tool.async_call
+
+
+def tool_messages(results: list[ToolResult]) -> list[Message]:
+    """Wrap results as tool messages, in order, ready for `Messages.add_message`."""
+    return [Message(role="tool", content=[result]) for result in results]
+
+
+class ToolExecutor:
+    """Runs every tool call of a turn concurrently.
+
+    Tools implementing `async_call` run on the event loop; the others run `call` on a bounded
+    thread pool. Each call is bounded by a timeout and by both a global and a per-tool concurrency
+    cap. Failures, timeouts and cancellations become error ToolResults, so a turn always gets one
+    result per call, in the order of the calls.
+
+    A call already started with `submit`, e.g. dispatched early by a client while the model was
+    still streaming, is not run again by `run`: its task is reused, matched by the call id. A
+    finished call that `run` does not collect within `keep_submitted` seconds, e.g. because the
+    stream failed or the turn was abandoned, is forgotten.
+
+    With `condense`, e.g. a ResultCondenser, every successful result is passed through it in a
+    worker thread, so that large outputs are stored out of line before they reach a history.
+
+    Note that a timed out or cancelled sync call cannot be interrupted: its thread runs to
+    completion in the background and its result is dropped.
+    """
+
+    def __init__(
+        self,
+        tools: list[Tool],
+        timeout: float = 30.0,
+        max_concurrency: int = 32,
+        max_workers: int = 8,
+        limits: dict[str, ToolLimits] = None,
+        condense: Callable[[ToolResult], ToolResult] = None,
+        keep_submitted: float = 60.0,
+    ):
+        self.tools = {tool.name: tool for tool in tools}
+        self.condense = condense
+        self.keep_submitted = keep_submitted
+        self.timeout = timeout
+        self.limits = limits or {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tool_semaphores = {
+            name: asyncio.Semaphore(limit.max_concurrency)
+            for name, limit in self.limits.items()
+            if limit.max_concurrency
+        }
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="echoflow-tool")
+        self._tasks: set[asyncio.Task] = set()
+        self._submitted: dict[str, asyncio.Task] = {}
+        """Call id -> task of a call started by `submit` and not yet collected by `run`."""
+
+    async def run(self, tool_calls: list[ToolCall]) -> list[ToolResult]:
+        """Run `tool_calls` concurrently and return their results in the same order."""
+        if not tool_calls:
+            return []
+
+        tasks = [self.submit(tool_call) for tool_call in tool_calls]
+        try:
+            await asyncio.wait(tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        results = []
+        for tool_call, task in zip(tool_calls, tasks):
+            if self._submitted.get(tool_call.id) is task:
+                del self._submitted[tool_call.id]
+            if task.cancelled():
+                results.append(self._error(tool_call, f"tool {tool_call.name} was cancelled"))
+            else:
+                results.append(task.result())
+        return results
+
+    def submit(self, tool_call: ToolCall) -> asyncio.Task:
+        """Start `tool_call` right away; the returned task resolves to its ToolResult.
+
+        Submitting a call with the id of one already submitted returns the task of that one.
+        """
+        task = self._submitted.get(tool_call.id)
+        if task is not None:
+            return task
+        task = self._submitted[tool_call.id] = asyncio.ensure_future(self._run_one(tool_call))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(self._expire)
+        return task
+
+    def _expire(self, task: asyncio.Task):
+        task.get_loop().call_later(self.keep_submitted, self._forget, task)
+
+    def _forget(self, task: asyncio.Task):
+        for call_id, submitted in self._submitted.items():
+            if submitted is task:
+                del self._submitted[call_id]
+                return
+
+    def cancel(self):
+        """Cancel every call in flight; their results become errors."""
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def _run_one(self, tool_call: ToolCall) -> ToolResult:
+        tool = self.tools.get(tool_call.name)
+        if tool is None:
+            return self._error(tool_call, f"tool {tool_call.name} does not exist")
+
+        limit = self.limits.get(tool_call.name)
+        timeout = limit.timeout if limit and limit.timeout is not None else self.timeout
+        tool_semaphore = self._tool_semaphores.get(tool_call.name)
+
+        async with self._semaphore:
+            if tool_semaphore is not None:
+                async with tool_semaphore:
+                    return await self._call(tool, tool_call, timeout)
+            return await self._call(tool, tool_call, timeout)
+
+    async def _call(self, tool: Tool, tool_call: ToolCall, timeout: float) -> ToolResult:
+        if is_async(tool):
+            call = tool.async_call(tool_call)
+        else:
+            loop = asyncio.get_running_loop()
+            call = loop.run_in_executor(self._pool, tool.call, tool_call)
+
+        try:
+            result = await asyncio.wait_for(call, timeout)
+        except asyncio.TimeoutError:
+            return self._error(tool_call, f"tool {tool_call.name} timed out after {timeout}s")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("tool {} failed: {!r}", tool_call.name, e)
+            return self._error(tool_call, f"tool {tool_call.name} failed: {e}")
+
+        if not isinstance(result, ToolResult):
+            return self._error(tool_call, f"tool {tool_call.name} returned {type(result).__name__}")
+        if result.id != tool_call.id:
+            result = ToolResult(tool_call.id, result.content, result.is_error, result.blob)
+        if self.condense is None:
+            return result
+        try:
+            # condensing hashes and may spill large outputs to disk: keep it off the loop
+            return await asyncio.to_thread(self.condense, result)
+        except Exception as e:
+            logger.error("condensing the result of tool {} failed: {!r}", tool_call.name, e)
+            return result
+
+    @staticmethod
+    def _error(tool_call: ToolCall, content: str) -> ToolResult:
+        return ToolResult(id=tool_call.id, content=content, is_error=True)
+
+    def close(self):
+        self.cancel()
+        self._submitted.clear()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    async def __aenter__(self) -> "ToolExecutor":
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
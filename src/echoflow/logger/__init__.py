@@ -1,3 +1,25 @@
-from .logger import Logger, get_logger, init_logger
+from .logger import (
+    DEBUG,
+    ERROR,
+    INFO,
+    WARN,
+    LocalLogger,
+    Logger,
+    QueuedLogger,
+    TenLogger,
+    get_logger,
+    init_logger,
+)
 
-__all__ = ["Logger", "get_logger", "init_logger"]
+__all__ = [
+    "DEBUG",
+    "ERROR",
+    "INFO",
+    "WARN",
+    "LocalLogger",
+    "Logger",
+    "QueuedLogger",
+    "TenLogger",
+    "get_logger",
+    "init_logger",
+]
@@ -1,9 +1,64 @@
-from loguru import logger
+import os
+import queue
+import threading
+from functools import cached_property
+from types import MappingProxyType
+from typing import Any, Callable, Mapping, Union
+
+DEBUG = 10
+INFO = 20
+WARN = 30
+ERROR = 40
+
+_LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "WARN": WARN, "WARNING": WARN, "ERROR": ERROR}
+_SINKS = {DEBUG: "log_debug", INFO: "log_info", WARN: "log_warn", ERROR: "log_error"}
 
 _logger = None
 
 
+def _level(level: Union[int, str]) -> int:
+    return level if isinstance(level, int) else _LEVELS[level.upper()]
+
+
+def render(message: Union[str, Callable[[], str]], args: tuple, fields: dict) -> str:
+    """Format a deferred log record: `message.format(*args)` plus `key=value` pairs."""
+    if callable(message):
+        message = message()
+    elif args:
+        message = message.format(*args)
+    if fields:
+        message += " " + " ".join(f"{k}={_value(v)}" for k, v in fields.items())
+    return message
+
+
+def _value(value: Any) -> str:
+    text = str(value)
+    if not text or any(c in text for c in ' "='):
+        return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return text
+
+
 class Logger:
+    """Logging interface.
+
+    Implementations provide the `log_*` methods, which write a message as is. Code logs through
+    `debug`, `info`, `warn` and `error`, which check the level first and only then format the
+    message, so a disabled record costs one comparison:
+
+        logger.debug("raw event {}", event, sample=event.type, request=request_id)
+
+    Positional arguments are formatted into the message with `str.format`, or the message can be
+    a callable returning it; keyword arguments are appended as structured `key=value` pairs. With
+    `sample`, only one in `sampling[sample]` records of that kind is written.
+
+    The default level is INFO, so the debug records on hot paths cost one comparison unless
+    debugging is turned on, e.g. with `ECHOFLOW_LOG_LEVEL=DEBUG`.
+    """
+
+    level: int = INFO
+    sampling: Mapping[str, int] = MappingProxyType({})
+    """Record kind -> keep one record in this many; implementations set their own dict."""
+
     def log_info(self, message: str):
         raise NotImplemented()
 
@@ -16,30 +71,82 @@ class Logger:
     def log_warn(self, message: str):
         raise NotImplemented()
 
+    def set_level(self, level: Union[int, str]):
+        self.level = _level(level)
+
+    def is_enabled_for(self, level: int) -> bool:
+        return level >= self.level
+
+    def _sampled(self, sample: str) -> bool:
+        rate = self.sampling.get(sample)
+        if not rate or rate <= 1:
+            return True
+        counts = self.__dict__.setdefault("_sample_counts", {})
+        count = counts.get(sample, 0)
+        counts[sample] = count + 1
+        return count % rate == 0
+
+    def log(self, level: int, message, *args, sample: str = None, **fields):
+        if level < self.level or (sample is not None and not self._sampled(sample)):
+            return
+        self._emit(level, message, args, fields)
+
+    def _emit(self, level: int, message, args: tuple, fields: dict):
+        getattr(self, _SINKS[level])(render(message, args, fields))
+
+    def debug(self, message, *args, sample: str = None, **fields):
+        if DEBUG >= self.level:
+            self.log(DEBUG, message, *args, sample=sample, **fields)
+
+    def info(self, message, *args, sample: str = None, **fields):
+        if INFO >= self.level:
+            self.log(INFO, message, *args, sample=sample, **fields)
+
+    def warn(self, message, *args, sample: str = None, **fields):
+        if WARN >= self.level:
+            self.log(WARN, message, *args, sample=sample, **fields)
+
+    def error(self, message, *args, sample: str = None, **fields):
+        if ERROR >= self.level:
+            self.log(ERROR, message, *args, sample=sample, **fields)
+
 
 class LocalLogger(Logger):
+    def __init__(self, level: Union[int, str] = None, sampling: dict[str, int] = None):
+        self.level = _level(level or os.environ.get("ECHOFLOW_LOG_LEVEL", "INFO"))
+        self.sampling = dict(sampling or {})
+
+    @cached_property
+    def _logger(self):
+        # loguru takes tens of milliseconds to import; pay for it on the first log line
+        from loguru import logger
+
+        return logger
+
     def log_info(self, message: str):
-        logger.info(message)
+        self._logger.info(message)
 
     def log_error(self, message: str):
-        logger.error(message)
+        self._logger.error(message)
 
     def log_debug(self, message: str):
-        logger.debug(message)
+        self._logger.debug(message)
 
     def log_warn(self, message: str):
-        logger.warning(message)
+        self._logger.warning(message)
 
 
 class TenLogger(Logger):
-    def __init__(self, ten_env):
+    def __init__(self, ten_env, level: Union[int, str] = INFO, sampling: dict[str, int] = None):
         self.ten_env = ten_env
+        self.level = _level(level)
+        self.sampling = dict(sampling or {})
 
     def log_info(self, message: str):
         self.ten_env.log_info(message)
 
     def log_error(self, message: str):
-        self.ten_env.log_info(message)
+        self.ten_env.log_error(message)
 
     def log_debug(self, message: str):
         self.ten_env.log_debug(message)
@@ -48,13 +155,112 @@ class TenLogger(Logger):
         self.ten_env.log_warn(message)
 
 
-def get_logger():
-    global _logger
+class QueuedLogger(Logger):
+    """Hands records to a background thread, which formats and writes them with `logger`.
+
+    The calling thread, typically the event loop, only checks the level and enqueues the
+    unformatted record, so it never waits on log I/O. Arguments are formatted later, so pass
+    values that are not mutated afterwards. When `max_size` records are waiting, new records are
+    dropped and counted in `dropped`.
+    """
+
+    def __init__(self, logger: Logger, max_size: int = 10000):
+        self.logger = logger
+        self.level = logger.level
+        self.sampling = logger.sampling
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(max_size)
+        self._thread = threading.Thread(target=self._run, name="QueuedLogger", daemon=True)
+        self._thread.start()
+
+    def _emit(self, level: int, message, args: tuple, fields: dict):
+        try:
+            self._queue.put_nowait((level, message, args, fields))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            try:
+                if record is None:
+                    return
+                self.logger._emit(*record)
+            except Exception as e:
+                self.logger.log_error(f"failed to write a log record: {e!r}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Wait until every queued record is written."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def log_info(self, message: str):
+        self._emit(INFO, message, (), {})
+
+    def log_error(self, message: str):
+        self._emit(ERROR, message, (), {})
+
+    def log_debug(self, message: str):
+        self._emit(DEBUG, message, (), {})
+
+    def log_warn(self, message: str):
+        self._emit(WARN, message, (), {})
+
+
+class _CurrentLogger(Logger):
+    """Stands for the current logger, so `init_logger` also affects module-level references.
+
+    `init_logger` binds the methods of the current logger onto it once, so a call through it
+    costs the same as a call on the logger itself.
+    """
+
+    _BOUND = (
+        "debug",
+        "info",
+        "warn",
+        "error",
+        "log",
+        "log_debug",
+        "log_info",
+        "log_warn",
+        "log_error",
+        "set_level",
+        "is_enabled_for",
+    )
+
+    def __init__(self):
+        self.logger: Logger = None
+
+    def bind(self, logger: Logger):
+        self.logger = logger
+        for name in self._BOUND:
+            setattr(self, name, getattr(logger, name))
+
+    @property
+    def level(self) -> int:
+        return self.logger.level
+
+    @property
+    def sampling(self) -> dict[str, int]:
+        return self.logger.sampling
+
+
+_current = _CurrentLogger()
+
+
+def get_logger() -> Logger:
     if _logger is None:
-        _logger = LocalLogger()
-    return _logger
+        init_logger(LocalLogger())
+    return _current
 
 
 def init_logger(log: Logger):
+    """Make `log` the logger of the whole package; None restores the default LocalLogger."""
     global _logger
-    _logger = log
+    _logger = log or LocalLogger()
+    _current.bind(_logger)
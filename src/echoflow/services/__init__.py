@@ -0,0 +1,58 @@
+"""Provider registry.
+
+Providers are registered by import path and only imported, together with their SDK, when first
+requested. Third-party packages can add providers through the `echoflow.providers` entry point
+group, e.g. `openai = "my_package.client:OpenAIClient"`.
+"""
+
+import importlib
+
+ENTRY_POINT_GROUP = "echoflow.providers"
+
+_providers: dict[str, str] = {
+    "anthropic": "echoflow.services.anthropic.client:AnthropicClient",
+}
+_loaded: dict[str, type] = {}
+
+
+def register_provider(name: str, target: str):
+    """Register the Client class at `target`, given as "module:attribute", under `name`."""
+    _providers[name] = target
+    _loaded.pop(name, None)
+
+
+def _entry_points():
+    from importlib.metadata import entry_points  # slow to import, only needed for plugins
+
+    return entry_points(group=ENTRY_POINT_GROUP)
+
+
+def providers() -> list[str]:
+    names = set(_providers)
+    names.update(ep.name for ep in _entry_points())
+    return sorted(names)
+
+
+def get_provider(name: str) -> type:
+    """The Client class of provider `name`, imported on first use."""
+    cls = _loaded.get(name)
+    if cls is not None:
+        return cls
+
+    target = _providers.get(name)
+    if target is None:
+        for ep in _entry_points():
+            if ep.name == name:
+                target = ep.value
+                break
+        else:
+            raise ValueError(f"unknown provider {name!r}, known providers are {providers()}")
+
+    module, _, attribute = target.partition(":")
+    cls = _loaded[name] = getattr(importlib.import_module(module), attribute)
+    return cls
+
+
+def create_client(name: str, **kwargs):
+    """Create a client of provider `name`; keyword arguments go to its constructor."""
+    return get_provider(name)(**kwargs)
@@ -0,0 +1,23 @@
+import importlib
+
+_EXPORTS = {
+    "AnthropicClient": "client",
+    "AnthropicContext": "client",
+    "AnthropicDynamicMessages": "messages",
+    "AnthropicStaticMessages": "messages",
+    "AnthropicWindowedMessages": "messages",
+    "AnthropicParams": "params",
+    "AnthropicTool": "tools",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    # submodules are imported on first access, so `import echoflow.services.anthropic` is cheap
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,320 @@
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Hashable, Optional
+
+from echoflow.llm.base_client import Metadata
+from echoflow.llm.base_context import CacheStrategy
+from echoflow.llm.tokens import estimate_tokens, serialize
+
+CACHE_TTL = 300.0
+"""Seconds an ephemeral cache entry lives after its last write or read."""
+
+LOOKBACK_BLOCKS = 20
+"""How far before a breakpoint the provider looks for an already cached prefix."""
+
+DEFAULT_MIN_CACHEABLE_TOKENS = 1024
+MIN_CACHEABLE_TOKENS = {
+    "claude-3-haiku": 2048,
+    "claude-3-5-haiku": 2048,
+}
+
+
+def min_cacheable_tokens(model_id: str) -> int:
+    for prefix, tokens in MIN_CACHEABLE_TOKENS.items():
+        if model_id.startswith(prefix):
+            return tokens
+    return DEFAULT_MIN_CACHEABLE_TOKENS
+
+
+@dataclass
+class CacheReport:
+    expected_read_tokens: int = 0
+    expected_write_tokens: int = 0
+    actual_read_tokens: int = 0
+    actual_write_tokens: int = 0
+    requests: int = 0
+    busts: int = 0
+    """Requests whose prefix changed within the prefix of the previous request."""
+
+    def add(self, other: "CacheReport"):
+        self.expected_read_tokens += other.expected_read_tokens
+        self.expected_write_tokens += other.expected_write_tokens
+        self.actual_read_tokens += other.actual_read_tokens
+        self.actual_write_tokens += other.actual_write_tokens
+        self.requests += other.requests
+        self.busts += other.busts
+
+
+@dataclass
+class CacheBust:
+    """Where a request stopped repeating the prefix of the previous request of its session."""
+
+    segment: str
+    """"tools", "system" or "history"."""
+    index: int
+    """Position of the first changed element within its segment."""
+    lost_tokens: int
+    """Estimated tokens of the previous prefix from that element on, which cannot be read back."""
+
+
+@dataclass
+class CachePlan:
+    session_id: Hashable
+    tools: list
+    system: list
+    messages: list
+    breakpoints: list[tuple[bytes, int]] = field(default_factory=list)
+    """(prefix digest, prefix tokens) at every placed breakpoint, in request order."""
+    expected_read_tokens: int = 0
+    expected_write_tokens: int = 0
+    read_digest: Optional[bytes] = None
+    expected_tokens: int = 0
+    """Estimated input tokens of the whole request."""
+    prefix_digest: bytes = b""
+    """Fingerprint of the stable prefix: tools, system prompt and history."""
+    bust: Optional[CacheBust] = None
+
+
+@dataclass
+class _Element:
+    value: object
+    element_digest: bytes
+    element_tokens: int
+    digest: bytes
+    """Digest of the request prefix ending with this element."""
+    tokens: int
+    """Estimated tokens of the request prefix ending with this element."""
+
+
+class _Session:
+    def __init__(self):
+        self.elements: list[_Element] = []
+        self.cached: dict[bytes, tuple[int, float]] = {}  # prefix digest -> (tokens, expiry)
+        self.history_breakpoints: list[int] = []
+        self.report = CacheReport()
+        self.diverged: Optional[int] = None
+        """First position at which the last request differed from the one before it."""
+
+    def prefixes(self, values: list) -> list[_Element]:
+        """Digest and tokens of every prefix of `values`, reusing work from the last request.
+
+        Elements are only serialized when they are new objects; prefix digests are only chained
+        again from the first element whose content differs from the last request.
+        """
+        previous, memo = self.elements, None
+        chain = []
+        digest, tokens, same = b"", 0, True
+        self.diverged = None
+        for i, value in enumerate(values):
+            old = previous[i] if same and i < len(previous) else None
+            if old is not None and old.value is value:
+                chain.append(old)
+                digest, tokens = old.digest, old.tokens
+                continue
+
+            if memo is None:
+                memo = {id(e.value): e for e in previous}
+            known = memo.get(id(value))
+            if known is not None and known.value is value:
+                element_digest, element_tokens = known.element_digest, known.element_tokens
+            else:
+                text = serialize(value)
+                element_digest = hashlib.blake2b(text.encode(), digest_size=16).digest()
+                element_tokens = estimate_tokens(text)
+
+            if old is not None and old.element_digest == element_digest:
+                digest, tokens = old.digest, old.tokens
+            else:
+                if old is not None:
+                    self.diverged = i
+                same = False
+                digest = hashlib.blake2b(digest + element_digest, digest_size=16).digest()
+                tokens += element_tokens
+            chain.append(_Element(value, element_digest, element_tokens, digest, tokens))
+
+        self.elements = chain
+        return chain
+
+    def lookup(self, digest: bytes, now: float) -> Optional[int]:
+        entry = self.cached.get(digest)
+        if entry is None or entry[1] < now:
+            return None
+        return entry[0]
+
+
+class CachePlanner:
+    """Places `cache_control` breakpoints on a request without touching the stored messages.
+
+    Up to `max_breakpoints` are spread over the end of the tools, the end of the system prompt
+    and a rolling window over the history: its last message, the last message marked on the
+    previous turn, and then every `LOOKBACK_BLOCKS` messages back. A breakpoint whose prefix is
+    shorter than the model's minimum cacheable length is skipped, since it would never be cached.
+
+    Every plan carries the cache reads and writes it expects from what earlier requests of the
+    same session wrote; `settle` compares them with the usage the provider reported.
+
+    To digest only what changed, the planner holds the blocks of the last request of every
+    session; `release` drops them, e.g. when the session's history is spilled.
+
+    Every plan also fingerprints its prefix, and when an element of the previous request's prefix
+    changed rather than only new ones being appended, `bust` says where: a cache bust, which
+    makes the provider process the rest of the prompt again. Compacting a windowed history
+    is one, on purpose; a timestamp in the system prompt is one by accident.
+    """
+
+    def __init__(self, strategy: CacheStrategy, max_sessions: int = 10000, ttl: float = CACHE_TTL):
+        self.strategy = strategy
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: OrderedDict[Hashable, _Session] = OrderedDict()
+
+    def _session(self, session_id: Hashable) -> _Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session()
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def _candidates(self, session: _Session, tools: list, system: list, messages: list) -> list:
+        """Breakpoint positions in the flattened request, most valuable first."""
+        strategy = self.strategy
+        n_tools, n_system, n = len(tools), len(system), len(messages)
+        offset = n_tools + n_system
+
+        history = []
+        if strategy.cache_history and n:
+            history.append(n - 1)
+            history.extend(p for p in reversed(session.history_breakpoints) if p < n - 1)
+            history.extend(range(n - 1 - LOOKBACK_BLOCKS, -1, -LOOKBACK_BLOCKS))
+
+        candidates = [offset + history[0]] if history else []
+        if strategy.cache_system and n_system:
+            candidates.append(offset - 1)
+        if strategy.cache_tool and n_tools:
+            candidates.append(n_tools - 1)
+        candidates.extend(offset + p for p in history[1:])
+        return candidates
+
+    def plan(
+        self, session_id: Hashable, model_id: str, tools: list, system: list, messages: list
+    ) -> CachePlan:
+        session = self._session(session_id)
+        previous = session.elements
+        chain = session.prefixes([*tools, *system, *messages])
+        minimum = self.strategy.min_cacheable_tokens or min_cacheable_tokens(model_id)
+
+        positions = []
+        for p in self._candidates(session, tools, system, messages):
+            if p in positions or chain[p].tokens < minimum:
+                continue
+            if messages and p >= len(tools) + len(system):
+                if not messages[p - len(tools) - len(system)].get("content"):
+                    continue
+            positions.append(p)
+            if len(positions) == self.strategy.max_breakpoints:
+                break
+        positions.sort()
+
+        plan = CachePlan(session_id=session_id, tools=tools, system=system, messages=messages)
+        plan.expected_tokens = chain[-1].tokens if chain else 0
+        plan.prefix_digest = chain[-1].digest if chain else b""
+        if session.diverged is not None:
+            plan.bust = self._bust(session.diverged, previous, len(tools), len(system))
+        now = time.monotonic()
+        for p in positions:
+            plan.breakpoints.append((chain[p].digest, chain[p].tokens))
+            for q in range(p, max(p - LOOKBACK_BLOCKS, -1), -1):
+                tokens = session.lookup(chain[q].digest, now)
+                if tokens is not None:
+                    if tokens > plan.expected_read_tokens:
+                        plan.expected_read_tokens = tokens
+                        plan.read_digest = chain[q].digest
+                    break
+        if positions:
+            plan.expected_write_tokens = max(
+                chain[positions[-1]].tokens - plan.expected_read_tokens, 0
+            )
+
+        offset = len(tools) + len(system)
+        session.history_breakpoints = [p - offset for p in positions if p >= offset]
+        self._apply(plan, positions)
+        return plan
+
+    @staticmethod
+    def _bust(position: int, previous: list[_Element], n_tools: int, n_system: int) -> CacheBust:
+        kept = previous[position - 1].tokens if position else 0
+        lost = previous[-1].tokens - kept
+        if position < n_tools:
+            return CacheBust("tools", position, lost)
+        if position < n_tools + n_system:
+            return CacheBust("system", position - n_tools, lost)
+        return CacheBust("history", position - n_tools - n_system, lost)
+
+    def _apply(self, plan: CachePlan, positions: list[int]):
+        cache_control = {"type": "ephemeral"}
+        n_tools, offset = len(plan.tools), len(plan.tools) + len(plan.system)
+        tools, system, messages = plan.tools, plan.system, plan.messages
+
+        for p in positions:
+            if p < n_tools:
+                if tools is plan.tools:
+                    tools = list(tools)
+                tools[p] = {**tools[p], "cache_control": cache_control}
+            elif p < offset:
+                if system is plan.system:
+                    system = list(system)
+                system[p - n_tools] = {**system[p - n_tools], "cache_control": cache_control}
+            else:
+                if messages is plan.messages:
+                    messages = list(messages)
+                message = messages[p - offset]
+                content = message["content"]
+                if isinstance(content, str):
+                    content = [{"type": "text", "text": content}]
+                content = [*content[:-1], {**content[-1], "cache_control": cache_control}]
+                messages[p - offset] = {**message, "content": content}
+
+        plan.tools, plan.system, plan.messages = tools, system, messages
+
+    def settle(self, plan: CachePlan, meta: Metadata) -> CacheReport:
+        """Record what `plan` wrote to the cache and compare expectations with `meta`."""
+        session = self._session(plan.session_id)
+        expiry = time.monotonic() + self.ttl
+        if plan.read_digest in session.cached:
+            session.cached[plan.read_digest] = (session.cached[plan.read_digest][0], expiry)
+        for digest, tokens in plan.breakpoints:
+            session.cached[digest] = (tokens, expiry)
+
+        now = time.monotonic()
+        session.cached = {k: v for k, v in session.cached.items() if v[1] >= now}
+
+        report = CacheReport(
+            expected_read_tokens=plan.expected_read_tokens,
+            expected_write_tokens=plan.expected_write_tokens,
+            actual_read_tokens=meta.cache_read_tokens or 0,
+            actual_write_tokens=meta.cache_write_tokens or 0,
+            requests=1,
+            busts=1 if plan.bust else 0,
+        )
+        session.report.add(report)
+        return report
+
+    def release(self, session_id: Hashable):
+        """Drop the prefix chain of a session, which holds on to the blocks of its last request.
+
+        What it wrote to the cache and its report are kept; its next request digests its whole
+        prefix again.
+        """
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.elements = []
+
+    def report(self, session_id: Hashable) -> CacheReport:
+        """Expected versus actual cache usage accumulated over a session."""
+        session = self._sessions.get(session_id)
+        return session.report if session else CacheReport()
@@ -1,36 +1,80 @@
-import json
+import asyncio
+import sys
 from dataclasses import dataclass, field
 from typing import AsyncGenerator, Literal
 
 from echoflow.llm.base_client import Client, Metadata, StreamEvent, StreamEventType
 from echoflow.llm.base_context import CacheStrategy, LLMContext
-from echoflow.llm.base_messages import Messages, ToolCall
+from echoflow.llm.base_messages import Messages, ToolCall, ToolResult
+from echoflow.llm.blobs import BlobStore, get_blob_store
+from echoflow.llm.context_window import WindowedMessages
+from echoflow.llm.json_schema import Model
+from echoflow.llm.metrics import Metrics, RequestTimer, get_metrics
+from echoflow.llm.partial_json import PartialJSONParser
+from echoflow.llm.tokens import estimate_tokens, serialize
+from echoflow.llm.tool_executor import ToolExecutor
 from echoflow.logger import get_logger
+from echoflow.services.anthropic.cache import CachePlanner, CacheReport
 from echoflow.services.anthropic.messages import AnthropicDynamicMessages, AnthropicStaticMessages
 from echoflow.services.anthropic.params import AnthropicParams
-from echoflow.services.anthropic.tools import AnthropicTool
+from echoflow.services.anthropic.pool import check_provider, get_client, warmup
+from echoflow.services.anthropic.tools import AnthropicTool, marshal_tools
 
 logger = get_logger()
 
-try:
-    import anthropic
-    from anthropic.types import CacheControlEphemeralParam
-
-except ModuleNotFoundError as e:
-    logger.log_error(f"Exception: {e}")
-    logger.log_error("In order to use Anthropic, you need to `pip install echoflow[anthropic]`.")
-    raise Exception(f"Missing module: {e}")
-
 
 @dataclass
 class AnthropicContext(LLMContext):
     params: AnthropicParams = field(default_factory=AnthropicParams)
     system: AnthropicStaticMessages = field(default_factory=AnthropicStaticMessages)
     history: AnthropicStaticMessages = field(default_factory=AnthropicStaticMessages)
-    rag: AnthropicDynamicMessages = field(default_factory=AnthropicStaticMessages)
+    rag: AnthropicDynamicMessages = field(default_factory=AnthropicDynamicMessages)
     tools: list[AnthropicTool] = field(default_factory=list)
 
 
+def _fresh_results(history: list, turns: int) -> list[ToolResult]:
+    """Condensed tool results followed by fewer than `turns` assistant messages, in order."""
+    results = []
+    for message in reversed(history or ()):
+        if turns <= 0:
+            break
+        if message.role == "assistant":
+            turns -= 1
+        elif message.role == "tool":
+            results += (
+                c for c in reversed(message.content) if isinstance(c, ToolResult) and c.blob
+            )
+    return results[::-1]
+
+
+def _volatile_tail(ctx: AnthropicContext, full_results: list[tuple[str, str]] = ()) -> list:
+    """Content blocks that change every turn: fresh tool results, rag, then dynamic segments."""
+    blocks = [
+        {"type": "text", "text": f"Full result of tool call {id}:\n{content}"}
+        for id, content in full_results
+    ]
+    blocks += [block for m in ctx.rag.value for block in m["content"]] if ctx.rag else []
+    blocks += [{"type": "text", "text": text} for text in (ctx.dynamic or {}).values() if text]
+    return blocks
+
+
+def _with_tail(messages: list, blocks: list) -> list:
+    """`messages` with `blocks` appended to the last user turn.
+
+    The tail goes after the cache breakpoints of the history rather than into the system prompt,
+    where it would change the prefix of every cached breakpoint on every turn.
+    """
+    if not blocks:
+        return messages
+    if not messages or messages[-1]["role"] != "user":
+        return [*messages, {"role": "user", "content": blocks}]
+    last = messages[-1]
+    content = last["content"]
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    return [*messages[:-1], {**last, "content": [*content, *blocks]}]
+
+
 class AnthropicClient(Client):
     def __init__(
         self,
@@ -40,61 +84,173 @@ class AnthropicClient(Client):
         aws_secret_key: str = None,  # bedrock
         aws_access_key: str = None,  # bedrock
         cache_strategy: CacheStrategy = CacheStrategy(),
+        metrics: Metrics = None,
+        base_url: str = None,
+        blobs: BlobStore = None,
+        full_results: int = 1,
     ):
-        if provider == "anthropic":
-            self.client = anthropic.AsyncAnthropic(api_key=api_key)
+        check_provider(provider)  # the SDK client itself is only created on the first request
+        self._credentials = (
+            provider,
+            api_key,
+            aws_region,
+            aws_secret_key,
+            aws_access_key,
+            base_url,
+        )
+        self._client = None
+        self.provider = provider
+        self.cache_strategy = cache_strategy
+        self.cache_planner = CachePlanner(cache_strategy)
+        self.metrics = metrics or get_metrics()
+        self.blobs = blobs or get_blob_store()
+        self.full_results = full_results
 
-        elif provider == "bedrock":
-            self.client = anthropic.AsyncAnthropicBedrock(
-                aws_region=aws_region, aws_secret_key=aws_secret_key, aws_access_key=aws_access_key
-            )
+    @property
+    def client(self):
+        """The SDK client, resolved per request: it belongs to the event loop of the request."""
+        if self._client is not None:
+            return self._client
+        return get_client(*self._credentials)
 
-        elif provider == "vertex":
-            self.client = anthropic.AsyncAnthropicVertex()
+    @client.setter
+    def client(self, client):
+        self._client = client
 
-        else:
-            raise ValueError("unsupported provider for AnthropicClient")
+    async def warmup(self, connections: int = 1) -> int:
+        """Open `connections` connections to the API ahead of the first request."""
+        return await warmup(self.client, connections)
 
-        self.cache_strategy = cache_strategy
+    def release(self, ctx: LLMContext):
+        if ctx.session_id is not None:
+            self.cache_planner.release(ctx.session_id)
+
+    def cache_report(self, ctx: AnthropicContext) -> CacheReport:
+        """Expected versus actual prompt-cache usage over the session of `ctx`."""
+        return self.cache_planner.report(self._session_id(ctx))
+
+    async def _full_results(self, ctx: AnthropicContext) -> list[tuple[str, str]]:
+        full = []
+        for result in _fresh_results(ctx.history, self.full_results):
+            content = await self.blobs.async_get(result.blob)
+            if content is None:
+                logger.debug("blob {} of tool call {} is gone", result.blob, result.id)
+            else:
+                full.append((result.id, content))
+        return full
+
+    @staticmethod
+    def _session_id(ctx: AnthropicContext) -> str:
+        # not id(ctx): ids are reused once a context is collected, merging unrelated sessions
+        return ctx.ensure_session_id()
 
     async def stream_generate(
         self, ctx: AnthropicContext, **kwargs
     ) -> AsyncGenerator[StreamEvent, None]:
+        """Stream a reply for `ctx`.
+
+        The request is a stable prefix, the tools, system prompt and history, followed by a
+        volatile tail of `ctx.rag` and `ctx.dynamic` appended to the last user turn, so that the
+        tail never invalidates the cached prefix. The metadata event carries the fingerprint of
+        the prefix under "prefix", and under "cache_bust" where it stopped repeating the prefix
+        of the previous request of the session, if it did.
+
+        Tool results condensed by a ResultCondenser are sent condensed in the history, and their
+        full content is added to the tail until `full_results` assistant messages followed them;
+        with the default, only on the request that answers them.
+
+        Pass `tool_executor=ToolExecutor(...)` to start tools marked idempotent as soon as their
+        input is final; their tool event is then marked "dispatched" and carries the running task
+        under "result". Running such a call again through the same executor reuses that task.
+        """
         params = ctx.params
-        tools = [t.marshal() for t in ctx.tools]
-        system = ctx.system.value if ctx.system else []
+        timer = RequestTimer(self.provider, params.model_id)
+        tools = marshal_tools(ctx.tools)
+        system = [block for m in ctx.system.value for block in m["content"]] if ctx.system else []
         history = ctx.history.value if ctx.history else []
 
-        if len(system) and self.cache_strategy.cache_system:
-            system[-1]["cache_control"] = CacheControlEphemeralParam(type="ephemeral")
+        plan = self.cache_planner.plan(
+            self._session_id(ctx), params.model_id, tools, system, history
+        )
 
-        if len(history) and self.cache_strategy.cache_history:
-            history[-1]["cache_control"] = CacheControlEphemeralParam(type="ephemeral")
+        if plan.bust is not None:
+            bust = plan.bust
+            logger.warn(
+                "cache bust in {} at {}, ~{} cached tokens lost",
+                bust.segment,
+                bust.index,
+                bust.lost_tokens,
+                session=plan.session_id,
+            )
+        tail = _volatile_tail(ctx, await self._full_results(ctx))
+        messages = _with_tail(plan.messages, tail)
 
-        # todo: dynamic
+        executor = kwargs.get("tool_executor")
+        idempotent = {t.name for t in ctx.tools if t.idempotent} if executor else set()
+        schemas = {t.name: t.input_schema for t in ctx.tools}
+        meta, stop_reason, error, cancelled = None, None, None, False
+        stream = None
+        try:
+            stream = await self.client.messages.create(
+                tools=plan.tools,
+                messages=messages,
+                model=params.model_id,
+                temperature=params.temperature,
+                top_p=params.top_p,
+                top_k=params.top_k,
+                max_tokens=params.max_tokens,
+                system=plan.system,
+                stream=True,
+            )
+            async for event in self._process_stream(stream, executor, idempotent, timer, schemas):
+                if event.type == StreamEventType.metadata:
+                    meta = event.data["metadata"]
+                    event.data["cache"] = self.cache_planner.settle(plan, meta)
+                    event.data["prefix"] = plan.prefix_digest.hex()
+                    event.data["cache_bust"] = plan.bust
+                    if isinstance(ctx.history, WindowedMessages):
+                        actual = (meta.input_text_tokens or 0) + (meta.cache_read_tokens or 0)
+                        actual += meta.cache_write_tokens or 0
+                        # the plan covers the prefix, the provider counts the tail too
+                        estimated = plan.expected_tokens
+                        if tail:
+                            estimated += estimate_tokens(serialize(tail))
+                        ctx.history.calibrate(estimated, actual)
+                elif event.type == StreamEventType.stop:
+                    stop_reason = event.data["stop_reason"]
+                yield event
 
-        stream = await self.client.messages.create(
-            tools=tools,
-            messages=history,
-            model=params.model_id,
-            temperature=params.temperature,
-            top_p=params.top_p,
-            top_k=params.top_k,
-            max_tokens=params.max_tokens,
-            system=system,
-            stream=True,
-        )
-        async for event in self._process_stream(stream):
-            yield event
+        except (GeneratorExit, asyncio.CancelledError):
+            cancelled = True
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if stream is not None:
+                # stops generation and billing now rather than when the stream is collected
+                await stream.close()
+            record = timer.finish(meta, stop_reason, error)
+            record.cancelled = cancelled
+            self.metrics.observe(record)
 
-    async def _process_stream(self, stream) -> AsyncGenerator[StreamEvent, None]:
+    async def _process_stream(
+        self,
+        stream,
+        executor: ToolExecutor = None,
+        idempotent: set[str] = frozenset(),
+        timer: RequestTimer = None,
+        schemas: dict[str, type[Model]] = None,
+    ) -> AsyncGenerator[StreamEvent, None]:
         tool_id = None
         tool_name = None
-        tool_arguments = ""
+        parser: PartialJSONParser = None
         meta = Metadata()
 
         async for event in stream:
-            logger.log_debug(f"A#### {event}")
+            logger.debug("A#### {}", event, sample=event.type)
+            if timer:
+                timer.event()
 
             if event.type == "message_start":
                 message = event.message
@@ -103,7 +259,7 @@ class AnthropicClient(Client):
                 meta.cache_write_tokens = usage.cache_creation_input_tokens
                 meta.input_text_tokens = usage.input_tokens
 
-                yield StreamEvent(type=StreamEventType.start, data={})
+                yield StreamEvent(type=StreamEventType.start, data={"metadata": meta})
                 continue
 
             elif event.type == "content_block_start":
@@ -111,6 +267,9 @@ class AnthropicClient(Client):
                 if content_block.type == "tool_use":
                     tool_id = content_block.id
                     tool_name = content_block.name
+                    parser = PartialJSONParser()
+                    if timer:
+                        timer.tool_start()
 
             elif event.type == "content_block_delta":
                 delta = event.delta
@@ -119,26 +278,58 @@ class AnthropicClient(Client):
                     if not text_delta:
                         continue
 
+                    if timer:
+                        timer.text()
                     yield StreamEvent(
                         type=StreamEventType.text_delta, data={"text_delta": text_delta}
                     )
 
                 elif delta.type == "input_json_delta":
-                    tool_arguments += delta.partial_json
+                    for argument, value in parser.feed(delta.partial_json):
+                        yield StreamEvent(
+                            type=StreamEventType.tool_argument,
+                            data={
+                                "id": tool_id,
+                                "name": tool_name,
+                                "argument": argument,
+                                "value": value,
+                            },
+                        )
 
             elif event.type == "content_block_stop":
                 if tool_id:
+                    if timer:
+                        timer.tool_end()
+                    schema = schemas.get(tool_name) if schemas else None
+                    parsed = None
                     try:
-                        arguments = json.loads(tool_arguments)
-                    except:
-                        arguments = {}
+                        arguments = parser.close()
+                        if schema is not None:
+                            parsed = schema.decode(arguments)
+                        error = None
+                    except ValueError as e:  # a JSON or a schema ValidationError
+                        arguments = parser.arguments
+                        error = f"invalid input for tool {tool_name}: {e}"
+
+                    tool_call_info = ToolCall(
+                        id=tool_id, name=sys.intern(tool_name), input=arguments, parsed=parsed
+                    )
+                    if error:
+                        logger.error(error)
+                        yield StreamEvent(
+                            type=StreamEventType.error,
+                            data={"error": error, "tool": tool_call_info},
+                        )
 
-                    tool_call_info = ToolCall(id=tool_id, name=tool_name, input=arguments)
-                    yield StreamEvent(type=StreamEventType.tool, data={"tool": tool_call_info})
+                    data = {"tool": tool_call_info}
+                    if executor and not error and tool_name in idempotent:
+                        data["result"] = executor.submit(tool_call_info)
+                        data["dispatched"] = True
+                    yield StreamEvent(type=StreamEventType.tool, data=data)
 
                     tool_id = None
                     tool_name = None
-                    tool_arguments = ""
+                    parser = None
 
             elif event.type == "message_delta":
                 stop_reason = event.delta.stop_reason
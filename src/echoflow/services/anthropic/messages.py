@@ -1,4 +1,5 @@
-from typing import Literal
+import sys
+from typing import TYPE_CHECKING, Literal
 
 from echoflow.llm.base_messages import (
     DynamicMessages,
@@ -9,25 +10,15 @@ from echoflow.llm.base_messages import (
     ToolCall,
     ToolResult,
 )
-from echoflow.logger import get_logger
+from echoflow.llm.context_window import WindowedMessages
 
-logger = get_logger()
-
-try:
-    from anthropic.types import (
-        MessageParam,
-        TextBlockParam,
-        ToolResultBlockParam,
-        ToolUseBlockParam,
-    )
-except ModuleNotFoundError as e:
-    logger.log_error(f"Exception: {e}")
-    logger.log_error("In order to use Anthropic, you need to `pip install echoflow[anthropic]`.")
-    raise Exception(f"Missing module: {e}")
+# the SDK's param types are TypedDicts, so plain dicts are built and the SDK is not imported here
+if TYPE_CHECKING:
+    from anthropic.types import MessageParam, ToolResultBlockParam
 
 
 class AnthropicAdapter(MessageAdapter):
-    def adapt(self, message: Message):
+    def adapt(self, message: Message) -> "MessageParam":
         role: Literal["user", "assistant"] = "user"
         if message.role == "assistant":
             role = "assistant"
@@ -37,17 +28,20 @@ class AnthropicAdapter(MessageAdapter):
         content = []
         for c in message.content:
             if type(c) == Text:
-                content.append(TextBlockParam(text=c, type="text"))
+                content.append({"text": c, "type": "text"})
             elif type(c) == ToolCall:
-                content.append(
-                    ToolUseBlockParam(type="tool_use", id=c.id, name=c.name, input=c.input)
-                )
+                content.append({"type": "tool_use", "id": c.id, "name": c.name, "input": c.input})
             elif type(c) == ToolResult:
-                content.append(
-                    ToolResultBlockParam(type="tool_result", tool_use_id=c.id, content=c.content)
-                )
+                block: "ToolResultBlockParam" = {
+                    "type": "tool_result",
+                    "tool_use_id": c.id,
+                    "content": c.content,
+                }
+                if c.is_error:
+                    block["is_error"] = True
+                content.append(block)
 
-        return MessageParam(role=role, content=content)
+        return {"role": role, "content": content}
 
     def to_message(self, element) -> Message:
         role: Literal["user", "assistant", "tool"] = "user"
@@ -59,17 +53,26 @@ class AnthropicAdapter(MessageAdapter):
             if c["type"] == "text":
                 content.append(c["text"])
             elif c["type"] == "tool_use":
-                content.append(ToolCall(id=c["id"], name=c["name"], input=c["input"]))
+                content.append(ToolCall(id=c["id"], name=sys.intern(c["name"]), input=c["input"]))
             elif c["type"] == "tool_result":
                 role = "tool"
-                content.append(ToolResult(id=c["tool_use_id"], content=c["content"]))
+                content.append(
+                    ToolResult(
+                        id=c["tool_use_id"], content=c["content"], is_error=c.get("is_error", False)
+                    )
+                )
 
         return Message(role=role, content=content)
 
 
 class AnthropicStaticMessages(StaticMessages):
-    def __init__(self):
-        super().__init__(adapter=AnthropicAdapter())
+    def __init__(self, lazy: bool = False):
+        super().__init__(adapter=AnthropicAdapter(), lazy=lazy)
+
+
+class AnthropicWindowedMessages(WindowedMessages):
+    def __init__(self, budget: int = 8000, low_water: float = 0.6, lazy: bool = False):
+        super().__init__(adapter=AnthropicAdapter(), budget=budget, low_water=low_water, lazy=lazy)
 
 
 class AnthropicDynamicMessages(DynamicMessages):
@@ -0,0 +1,212 @@
+import asyncio
+import functools
+import hashlib
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Literal, Optional
+
+from echoflow.logger import get_logger
+
+logger = get_logger()
+
+if TYPE_CHECKING:
+    import httpx
+
+
+def _sdk():
+    """Import the Anthropic SDK, which takes a few hundred milliseconds, on first use."""
+    try:
+        import anthropic
+        import httpx
+
+    except ModuleNotFoundError as e:
+        logger.error("Exception: {}", e)
+        logger.error("In order to use Anthropic, you need to `pip install echoflow[anthropic]`.")
+        raise Exception(f"Missing module: {e}")
+
+    return anthropic, httpx
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    max_connections: int = 1000
+    """Connections open at once across all providers and credentials."""
+    max_keepalive_connections: int = 200
+    keepalive_expiry: float = 60.0
+    """Seconds an idle connection is kept, longer than the pause between two turns."""
+    connect_timeout: float = 5.0
+    timeout: float = 600.0
+    max_clients: int = 256
+    """SDK clients kept per event loop, least recently used first out."""
+
+
+_config = PoolConfig()
+
+PROVIDERS = ("anthropic", "bedrock", "vertex")
+"""Providers whose SDK clients `get_client` creates."""
+
+
+def check_provider(provider: str):
+    """Raise ValueError unless `provider` is one of PROVIDERS; does not import the SDK."""
+    if provider not in PROVIDERS:
+        raise ValueError(f"unsupported provider for AnthropicClient: {provider!r}")
+
+
+@functools.cache
+def _shared_client_type():
+    _, httpx = _sdk()
+
+    class SharedAsyncClient(httpx.AsyncClient):
+        """The pool of an event loop; SDK clients hold it without owning it.
+
+        `close()` on an SDK client closes its HTTP client, which would tear the pool down for
+        every other SDK client of the loop, so `aclose` leaves it open; `close_pool` closes it.
+        """
+
+        async def aclose(self):
+            logger.debug("left the shared connection pool open, close_pool() closes it")
+
+        async def close(self):
+            await super().aclose()
+
+    return SharedAsyncClient
+
+
+class _Registry:
+    def __init__(self, config: PoolConfig):
+        _, httpx = _sdk()
+        self.max_clients = config.max_clients
+        self.http_client = _shared_client_type()(
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+            follow_redirects=True,
+        )
+        self.clients: OrderedDict[tuple, object] = OrderedDict()
+
+
+# connections belong to the event loop that opened them, so every loop gets its own pool
+_registries: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _Registry]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _registry() -> _Registry:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        raise RuntimeError(
+            "Anthropic SDK clients are bound to an event loop, get them from a coroutine"
+        ) from None
+
+    registry = _registries.get(loop)
+    if registry is None:
+        registry = _registries[loop] = _Registry(_config)
+    return registry
+
+
+def init_pool(config: PoolConfig):
+    """Use `config` for connection pools created from now on."""
+    global _config
+    _config = config
+
+
+def get_http_client() -> "httpx.AsyncClient":
+    """The HTTP client, and with it the connection pool, shared by all Anthropic SDK clients."""
+    return _registry().http_client
+
+
+def _secret_digest(*secrets: Optional[str]) -> bytes:
+    """Registry keys hold a digest of the credentials rather than the credentials themselves."""
+    digest = hashlib.blake2b(digest_size=16)
+    for secret in secrets:
+        digest.update(b"\x00" if secret is None else b"\x01" + secret.encode() + b"\x00")
+    return digest.digest()
+
+
+def get_client(
+    provider: Literal["anthropic", "bedrock", "vertex"] = "anthropic",
+    api_key: str = None,
+    aws_region: str = None,
+    aws_secret_key: str = None,
+    aws_access_key: str = None,
+    base_url: str = None,
+):
+    """The SDK client of `provider` and these credentials for the running event loop.
+
+    Created on first use, it shares the connection pool of the loop with all other SDK clients;
+    closing it leaves the pool open.
+    """
+    check_provider(provider)
+    registry = _registry()
+    key = (
+        provider,
+        aws_region,
+        base_url,
+        _secret_digest(api_key, aws_secret_key, aws_access_key),
+    )
+    client = registry.clients.get(key)
+    if client is not None:
+        registry.clients.move_to_end(key)
+        return client
+
+    anthropic, _ = _sdk()
+    http_client = registry.http_client
+    if provider == "anthropic":
+        client = anthropic.AsyncAnthropic(
+            api_key=api_key, base_url=base_url, http_client=http_client
+        )
+
+    elif provider == "bedrock":
+        client = anthropic.AsyncAnthropicBedrock(
+            aws_region=aws_region,
+            aws_secret_key=aws_secret_key,
+            aws_access_key=aws_access_key,
+            base_url=base_url,
+            http_client=http_client,
+        )
+
+    else:
+        client = anthropic.AsyncAnthropicVertex(base_url=base_url, http_client=http_client)
+
+    registry.clients[key] = client
+    while len(registry.clients) > registry.max_clients:
+        registry.clients.popitem(last=False)
+    return client
+
+
+async def warmup(client, connections: int = 1, timeout: float = 5.0) -> int:
+    """Open up to `connections` keep-alive connections to the API host of `client`.
+
+    Sends concurrent HEAD requests to the base URL; the responses do not matter, only the TCP and
+    TLS handshakes they leave behind in the shared pool. Call it when a user starts speaking, so
+    the first turn does not pay for the handshakes.
+
+    Returns:
+        The number of requests that got a response.
+    """
+    _, httpx = _sdk()
+    http_client = getattr(client, "_client", None) or get_http_client()
+    url = str(client.base_url)
+
+    async def head() -> bool:
+        try:
+            await http_client.head(url, timeout=timeout)
+            return True
+        except httpx.HTTPError as e:
+            logger.warn("warmup of {} failed: {!r}", url, e)
+            return False
+
+    results = await asyncio.gather(*(head() for _ in range(connections)))
+    return sum(results)
+
+
+async def close_pool():
+    """Close the connections of the pool of the running event loop."""
+    registry = _registries.pop(asyncio.get_running_loop(), None)
+    if registry is not None:
+        await registry.http_client.close()
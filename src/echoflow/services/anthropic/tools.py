@@ -1,13 +1,41 @@
+from collections import OrderedDict
+
 from echoflow.llm.base_tools import ToolWrapper
+from echoflow.llm.json_schema import FrozenList, freeze
+
+_MAX_TOOL_LISTS = 1024
+_tool_lists: OrderedDict[tuple, FrozenList] = OrderedDict()
 
 
 class AnthropicTool(ToolWrapper):
     def marshal(self):
         tool = self.clone()
-        spec = {
-            "name": tool.name,
-            "description": tool.description,
-            "input_schema": tool.input_schema.json_schema(extra={"key_any_of": "oneOf"}),
-        }
+        key = (tool.name, tool.description, tool.input_schema)
+        cached = self.__dict__.get("_spec")
+        if cached is None or cached[0] != key:
+            spec = {
+                "name": tool.name,
+                "description": tool.description,
+                "input_schema": tool.input_schema.json_schema(extra={"key_any_of": "oneOf"}),
+            }
+            cached = self._spec = (key, freeze(spec))
+
+        return cached[1]
+
+
+def marshal_tools(tools: list[AnthropicTool]) -> FrozenList:
+    """Tool specs of a request, reusing one prebuilt list for as long as the tool set is unchanged.
 
-        return spec
+    Keeping the same list object from request to request also keeps the tool part of the cached
+    prompt prefix byte-identical.
+    """
+    specs = [t.marshal() for t in tools]
+    key = tuple(map(id, specs))
+    cached = _tool_lists.get(key)
+    if cached is None:
+        cached = _tool_lists[key] = FrozenList(specs)
+        while len(_tool_lists) > _MAX_TOOL_LISTS:
+            _tool_lists.popitem(last=False)
+    else:
+        _tool_lists.move_to_end(key)
+    return cached
@@ -0,0 +1,121 @@
+"""Builders for raw Anthropic stream events, shaped like the ones `messages.create` yields."""
+
+import asyncio
+
+from anthropic.types import (
+    InputJSONDelta,
+    Message,
+    MessageDeltaUsage,
+    RawContentBlockDeltaEvent,
+    RawContentBlockStartEvent,
+    RawContentBlockStopEvent,
+    RawMessageDeltaEvent,
+    RawMessageStartEvent,
+    RawMessageStopEvent,
+    TextBlock,
+    TextDelta,
+    ToolUseBlock,
+    Usage,
+)
+from anthropic.types.raw_message_delta_event import Delta
+
+
+def message_start(input_tokens=9, cache_read=0, cache_write=0) -> RawMessageStartEvent:
+    usage = Usage(
+        cache_creation_input_tokens=cache_write,
+        cache_read_input_tokens=cache_read,
+        input_tokens=input_tokens,
+        output_tokens=1,
+    )
+    message = Message(
+        id="msg_011CN5HDeXovxZxZYWrkRcXV",
+        content=[],
+        model="claude-3-5-sonnet-20241022",
+        role="assistant",
+        stop_reason=None,
+        stop_sequence=None,
+        type="message",
+        usage=usage,
+    )
+    return RawMessageStartEvent(message=message, type="message_start")
+
+
+def text_block(index: int, deltas: list[str]) -> list:
+    return [
+        RawContentBlockStartEvent(
+            content_block=TextBlock(citations=None, text="", type="text"),
+            index=index,
+            type="content_block_start",
+        ),
+        *[
+            RawContentBlockDeltaEvent(
+                delta=TextDelta(text=text, type="text_delta"),
+                index=index,
+                type="content_block_delta",
+            )
+            for text in deltas
+        ],
+        RawContentBlockStopEvent(index=index, type="content_block_stop"),
+    ]
+
+
+def tool_block(index: int, tool_id: str, name: str, fragments: list[str]) -> list:
+    return [
+        RawContentBlockStartEvent(
+            content_block=ToolUseBlock(id=tool_id, input={}, name=name, type="tool_use"),
+            index=index,
+            type="content_block_start",
+        ),
+        *[
+            RawContentBlockDeltaEvent(
+                delta=InputJSONDelta(partial_json=fragment, type="input_json_delta"),
+                index=index,
+                type="content_block_delta",
+            )
+            for fragment in fragments
+        ],
+        RawContentBlockStopEvent(index=index, type="content_block_stop"),
+    ]
+
+
+def message_end(stop_reason="end_turn", output_tokens=12) -> list:
+    return [
+        RawMessageDeltaEvent(
+            delta=Delta(stop_reason=stop_reason, stop_sequence=None),
+            type="message_delta",
+            usage=MessageDeltaUsage(output_tokens=output_tokens),
+        ),
+        RawMessageStopEvent(type="message_stop"),
+    ]
+
+
+def hello_stream() -> list:
+    """The text reply recorded in tests/test_anthropic_client.py."""
+    return [
+        message_start(),
+        *text_block(0, ["Hi", "! How can I help", " you today?"]),
+        *message_end(),
+    ]
+
+
+class FakeStream:
+    """Async iterator over raw events, optionally sleeping `delay` seconds before each one."""
+
+    def __init__(self, events: list, delay: float = 0.0):
+        self.events = events
+        self.delay = delay
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for event in self.events:
+            if self.closed:
+                return
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield event
+
+    async def close(self):
+        self.closed = True
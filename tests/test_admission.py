@@ -0,0 +1,121 @@
+import asyncio
+import unittest
+
+from echoflow.llm.admission import (
+    AdmissionController,
+    AdmittedClient,
+    Priority,
+    RateLimits,
+    Shed,
+)
+from echoflow.llm.base_client import Client, Metadata, StreamEvent, StreamEventType
+from echoflow.llm.base_context import LLMContext, Params
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestAdmissionController(unittest.IsolatedAsyncioTestCase):
+    async def test_priority_order(self):
+        clock = Clock()
+        controller = AdmissionController(RateLimits(requests_per_minute=60), clock=clock)
+        controller.requests.take(60)
+
+        admitted = []
+
+        async def request(name, priority):
+            await controller.acquire(priority, 0, 0)
+            admitted.append(name)
+
+        tasks = [
+            asyncio.create_task(request(name, priority))
+            for name, priority in (
+                ("b1", Priority.background),
+                ("f1", Priority.follow_up),
+                ("i1", Priority.interactive),
+                ("b2", Priority.background),
+            )
+        ]
+        await asyncio.sleep(0)
+        for _ in range(4):
+            clock.now += 1
+            controller._dispatch()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+        self.assertEqual(admitted, ["i1", "f1", "b1", "b2"])
+        self.assertEqual(controller.queue_time[Priority.background].count, 2)
+        self.assertAlmostEqual(controller.queue_time[Priority.background].sum, 3 + 4)
+
+    async def test_deadline_shedding(self):
+        clock = Clock()
+        controller = AdmissionController(
+            RateLimits(output_tokens_per_minute=600),
+            max_queue_time={Priority.background: 5.0},
+            clock=clock,
+        )
+        await controller.acquire(Priority.interactive, 0, 600)
+
+        # the interactive request needs 10s of refill, so the background one cannot make its 5s
+        interactive = asyncio.create_task(controller.acquire(Priority.interactive, 0, 100))
+        await asyncio.sleep(0)
+        with self.assertRaises(Shed):
+            await controller.acquire(Priority.background, 0, 100)
+        self.assertEqual(controller.shed[Priority.background], 1)
+
+        clock.now += 10
+        controller._dispatch()
+        await interactive
+        self.assertEqual(controller.shed[Priority.interactive], 0)
+
+    async def test_settle(self):
+        controller = AdmissionController(RateLimits(input_tokens_per_minute=10_000))
+        await controller.acquire(Priority.interactive, 1000, 0)
+        controller.settle(1000, 0, 1500, 0)
+        self.assertAlmostEqual(controller.input_tokens.level, 8500, delta=10)
+
+
+class FakeClient(Client):
+    def __init__(self, metadata: bool = True):
+        self.metadata = metadata
+        self.kwargs = None
+
+    async def stream_generate(self, ctx: LLMContext, **kwargs):
+        self.kwargs = kwargs
+        yield StreamEvent(StreamEventType.text_delta, {"text_delta": "hello there, how are you"})
+        if self.metadata:
+            metadata = Metadata(input_text_tokens=40, cache_write_tokens=10, output_text_tokens=6)
+            yield StreamEvent(StreamEventType.metadata, {"metadata": metadata})
+
+
+class TestAdmittedClient(unittest.IsolatedAsyncioTestCase):
+    def context(self) -> LLMContext:
+        return LLMContext(params=Params(model_id="m", max_tokens=500))
+
+    async def test_reserves_and_settles_usage(self):
+        limits = RateLimits(input_tokens_per_minute=60_000, output_tokens_per_minute=60_000)
+        controller = AdmissionController(limits)
+        client = AdmittedClient(FakeClient(), controller)
+
+        result = await client.generate(self.context(), priority=Priority.background, temperature=0)
+        self.assertEqual(result.text, "hello there, how are you")
+        self.assertEqual(client.client.kwargs, {"temperature": 0})
+        self.assertAlmostEqual(controller.input_tokens.level, 60_000 - 50, delta=5)
+        self.assertAlmostEqual(controller.output_tokens.level, 60_000 - 6, delta=5)
+        self.assertEqual(controller.queue_time[Priority.background].count, 1)
+
+    async def test_estimates_output_without_metadata(self):
+        controller = AdmissionController(RateLimits(output_tokens_per_minute=60_000))
+        client = AdmittedClient(FakeClient(metadata=False), controller)
+        await client.generate(self.context())
+        used = 60_000 - controller.output_tokens.level
+        self.assertTrue(0 < used < 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+
+from echoflow.llm.base_client import Metadata
+from echoflow.llm.base_context import CacheStrategy
+from echoflow.llm.base_messages import Message
+from echoflow.services.anthropic.cache import CachePlanner
+from echoflow.services.anthropic.messages import AnthropicStaticMessages
+
+
+def text(size: int) -> str:
+    return "word " * size
+
+
+def breakpoints(plan) -> list:
+    marked = [t["name"] for t in plan.tools if "cache_control" in t]
+    marked += ["system" for b in plan.system if "cache_control" in b]
+    for i, m in enumerate(plan.messages):
+        if any("cache_control" in c for c in m["content"]):
+            marked.append(i)
+    return marked
+
+
+class TestCachePlanner(unittest.TestCase):
+    def setUp(self):
+        strategy = CacheStrategy(cache_system=True, cache_history=True, cache_tool=True)
+        self.planner = CachePlanner(strategy)
+        self.tools = [{"name": "search", "description": text(1000), "input_schema": {}}]
+        self.system = [{"type": "text", "text": text(1000)}]
+        self.history = AnthropicStaticMessages()
+
+    def talk(self, turns: int):
+        for i in range(turns):
+            self.history.add_message(Message(role="user", content=[f"question {i}"]))
+            self.history.add_message(Message(role="assistant", content=[f"answer {i}"]))
+
+    def plan(self):
+        return self.planner.plan(
+            "session", "claude-3-5-sonnet-latest", self.tools, self.system, self.history.value
+        )
+
+    def test_does_not_mutate_stored_messages(self):
+        self.talk(3)
+        plan = self.plan()
+
+        self.assertEqual(breakpoints(plan), ["search", "system", 5])
+        self.assertNotIn("cache_control", self.tools[0])
+        self.assertNotIn("cache_control", self.system[0])
+        for m in self.history.value:
+            self.assertFalse(any("cache_control" in c for c in m["content"]))
+
+    def test_at_most_four_breakpoints(self):
+        for _ in range(10):
+            self.talk(15)
+            plan = self.plan()
+            self.planner.settle(plan, Metadata())
+            self.assertLessEqual(len(breakpoints(plan)), 4)
+
+    def test_rolls_previous_history_breakpoint(self):
+        self.talk(2)
+        self.planner.settle(self.plan(), Metadata())
+        self.talk(1)
+
+        self.assertEqual(breakpoints(self.plan())[-2:], [3, 5])
+
+    def test_skips_short_prefixes(self):
+        self.tools = [{"name": "search", "description": "short", "input_schema": {}}]
+        self.system = [{"type": "text", "text": "short"}]
+        self.talk(1)
+
+        self.assertEqual(breakpoints(self.plan()), [])
+
+    def test_detects_cache_bust(self):
+        self.talk(2)
+        first = self.plan()
+        self.assertIsNone(first.bust)
+        self.planner.settle(first, Metadata())
+
+        self.talk(1)  # appending turns keeps the prefix
+        second = self.plan()
+        self.assertIsNone(second.bust)
+        self.assertNotEqual(second.prefix_digest, first.prefix_digest)
+        self.assertEqual(self.plan().prefix_digest, second.prefix_digest)
+
+        self.system = [{"type": "text", "text": text(1000) + "It is 10:42."}]
+        self.talk(1)
+        plan = self.plan()
+        self.assertEqual((plan.bust.segment, plan.bust.index), ("system", 0))
+        self.assertGreater(plan.bust.lost_tokens, 1000)
+        self.assertEqual(self.planner.settle(plan, Metadata()).busts, 1)
+        self.assertEqual(self.planner.report("session").busts, 1)
+
+    def test_report(self):
+        self.talk(2)
+        plan = self.plan()
+        self.assertEqual(plan.expected_read_tokens, 0)
+        self.assertGreater(plan.expected_write_tokens, 0)
+        self.planner.settle(plan, Metadata(cache_write_tokens=plan.expected_write_tokens))
+
+        self.talk(1)
+        plan = self.plan()
+        self.assertGreater(plan.expected_read_tokens, 0)
+        report = self.planner.settle(plan, Metadata(cache_read_tokens=plan.expected_read_tokens))
+        self.assertEqual(report.actual_read_tokens, report.expected_read_tokens)
+
+        total = self.planner.report("session")
+        self.assertEqual(total.requests, 2)
+        self.assertEqual(total.actual_read_tokens, plan.expected_read_tokens)
+
+    def test_release_keeps_the_cache(self):
+        self.talk(2)
+        first = self.plan()
+        self.planner.settle(first, Metadata())
+
+        self.planner.release("session")
+        self.assertEqual(self.planner._sessions["session"].elements, [])
+        self.history = AnthropicStaticMessages()  # as rebuilt from a spilled session
+        self.talk(2)
+        plan = self.plan()
+        self.assertIsNone(plan.bust)
+        self.assertEqual(plan.prefix_digest, first.prefix_digest)
+        self.assertGreater(plan.expected_read_tokens, 0)
@@ -1,3 +1,5 @@
+import copy
+import pickle
 import unittest
 
 from echoflow.llm.base_messages import Message, ToolCall, ToolResult
@@ -189,3 +191,142 @@ class TestAnthropicStaticMessages(unittest.TestCase):
             {"role": "assistant", "content": [{"text": "yes", "type": "text"}]},
         ]
         self.assertEqual(self.messages.value, expected)
+
+
+class TestAnthropicLazyStaticMessages(unittest.TestCase):
+    def setUp(self):
+        self.eager = AnthropicStaticMessages()
+        self.lazy = AnthropicStaticMessages(lazy=True)
+        self.conversation = [
+            Message(role="user", content=["first request"]),
+            Message(role="user", content=["second request"]),
+            Message(role="assistant", content=["reply", ToolCall(id="1", name="f", input={})]),
+            Message(role="tool", content=[ToolResult(id="1", content="done")]),
+            Message(role="assistant", content=["yes"]),
+        ]
+
+    def test_value(self):
+        for message in self.conversation:
+            self.eager.add_message(message)
+            self.lazy.add_message(message)
+            self.assertEqual(self.lazy.value, self.eager.value)
+        self.assertEqual(self.lazy._static, [])
+
+    def test_held_value_is_updated(self):
+        self.lazy.add_message(self.conversation[0])
+        value = self.lazy.value
+        for message in self.conversation[1:]:
+            self.lazy.add_message(message)
+            self.assertIs(self.lazy.value, value)
+
+        for message in self.conversation:
+            self.eager.add_message(message)
+        self.assertEqual(value, self.eager.value)
+
+        del value
+        self.assertIsNone(self.lazy._rendered())
+
+    def test_slots(self):
+        self.assertFalse(hasattr(self.conversation[0], "__dict__"))
+        self.assertFalse(hasattr(self.conversation[2].content[1], "__dict__"))
+
+
+class TestAnthropicDynamicMessagesIncremental(unittest.TestCase):
+    def setUp(self):
+        self.messages = AnthropicDynamicMessages()
+        self.m1 = Message(role="user", content=["first request"])
+        self.m2 = Message(role="assistant", content=["first reply"])
+        self.messages.add_message(self.m1)
+        self.messages.add_message(self.m2)
+        self.messages.value
+
+    def test_append_reuses_rendered_blocks(self):
+        first = self.messages.value[0]
+        self.messages.add_message(Message(role="assistant", content=["more"]))
+        self.messages.add_message(Message(role="user", content=["second request"]))
+
+        value = self.messages.value
+        self.assertIs(value[0], first)
+        self.assertEqual(
+            value[1]["content"],
+            [{"text": "first reply", "type": "text"}, {"text": "more", "type": "text"}],
+        )
+        self.assertEqual(
+            value[2], {"role": "user", "content": [{"text": "second request", "type": "text"}]}
+        )
+
+    def test_edit_after_render(self):
+        self.m1.content[0] = "1st request"
+        self.m2.content.append("and more")
+
+        self.assertEqual(
+            self.messages.value,
+            [
+                {"role": "user", "content": [{"text": "1st request", "type": "text"}]},
+                {
+                    "role": "assistant",
+                    "content": [
+                        {"text": "first reply", "type": "text"},
+                        {"text": "and more", "type": "text"},
+                    ],
+                },
+            ],
+        )
+
+    def test_edit_changes_merging(self):
+        self.messages.add_message(Message(role="user", content=["second request"]))
+        self.messages.value
+
+        self.m2.content[0] = ""
+        self.assertEqual(
+            self.messages.value,
+            [
+                {
+                    "role": "user",
+                    "content": [
+                        {"text": "first request", "type": "text"},
+                        {"text": "second request", "type": "text"},
+                    ],
+                }
+            ],
+        )
+
+    def test_edits_only_touch_their_owner(self):
+        other = AnthropicDynamicMessages()
+        other.add_message(Message(role="user", content=["elsewhere"]))
+        other.value
+
+        self.m1.content[0] = "1st request"
+        self.assertEqual((other._rendered, other._stale), (1, set()))
+        self.assertEqual((self.messages._rendered, self.messages._stale), (0, {id(self.m1)}))
+
+    def test_invalidate(self):
+        result = ToolResult(id="12345", content="54321")
+        self.messages.add_message(Message(role="tool", content=[result]))
+        self.messages.value
+
+        result.content = "12345"
+        self.messages.invalidate(self.messages[-1])
+        self.assertEqual(
+            self.messages.value[-1]["content"],
+            [{"type": "tool_result", "tool_use_id": "12345", "content": "12345"}],
+        )
+
+    def test_tracked_content_pickles(self):
+        self.assertEqual(pickle.loads(pickle.dumps(self.m1)), self.m1)
+        self.assertIs(type(pickle.loads(pickle.dumps(self.m1)).content), list)
+        self.assertIs(type(copy.deepcopy(self.m1).content), list)
+
+        self.m1.content = ["replaced"]
+        self.messages.invalidate(self.m1)
+        self.assertEqual(
+            self.messages.value[0],
+            {"role": "user", "content": [{"text": "replaced", "type": "text"}]},
+        )
+
+    def test_remove_message(self):
+        del self.messages[0]
+        self.assertEqual(
+            self.messages.value,
+            [{"role": "assistant", "content": [{"text": "first reply", "type": "text"}]}],
+        )
@@ -0,0 +1,98 @@
+import asyncio
+import time
+import unittest
+
+from echoflow.services.anthropic.client import AnthropicClient, AnthropicContext
+from echoflow.services.anthropic.pool import close_pool, get_client
+
+REPLY = b"HTTP/1.1 404 Not Found\r\ncontent-type: application/json\r\ncontent-length: 2\r\n\r\n"
+
+
+class StandInServer:
+    """Local HTTP server that counts connections and answers every request with a 404."""
+
+    def __init__(self, connect_delay: float = 0.0):
+        self.connect_delay = connect_delay
+        self.connections = 0
+        self.requests = 0
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        await asyncio.sleep(self.connect_delay)  # stands in for the TCP and TLS handshakes
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                self.requests += 1
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":")[1])
+                await reader.readexactly(length)
+                writer.write(REPLY if head.startswith(b"HEAD") else REPLY + b"{}")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+
+class TestPool(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = StandInServer(connect_delay=0.05)
+        self.url = await self.server.start()
+
+    async def asyncTearDown(self):
+        await close_pool()
+        await self.server.stop()
+
+    async def request(self, client: AnthropicClient) -> float:
+        start = time.perf_counter()
+        with self.assertRaises(Exception):
+            async for _ in client.stream_generate(AnthropicContext()):
+                pass
+        return time.perf_counter() - start
+
+    async def test_clients_are_shared_per_credentials(self):
+        self.assertIs(get_client(api_key="a"), get_client(api_key="a"))
+        self.assertIsNot(get_client(api_key="a"), get_client(api_key="b"))
+        self.assertIs(get_client(api_key="a")._client, get_client(api_key="b")._client)
+
+        await get_client(api_key="a").close()
+        self.assertFalse(get_client(api_key="b")._client.is_closed)
+
+    async def test_warmup_opens_connections(self):
+        client = AnthropicClient(api_key="test", base_url=self.url)
+        self.assertEqual(await client.warmup(connections=3), 3)
+        self.assertEqual(self.server.connections, 3)
+
+        latency = await self.request(client)
+        self.assertEqual(self.server.connections, 3)
+        self.assertLess(latency, self.server.connect_delay)
+
+    async def test_sessions_share_connections(self):
+        cold = await self.request(AnthropicClient(api_key="test", base_url=self.url))
+        self.assertGreaterEqual(cold, self.server.connect_delay)
+        for _ in range(5):
+            await self.request(AnthropicClient(api_key="test", base_url=self.url))
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.server.requests, 6)
+
+
+class TestPoolPerLoop(unittest.TestCase):
+    def test_client_outlives_its_loop(self):
+        client = AnthropicClient(api_key="test")  # built at startup, outside any loop
+
+        async def pool():
+            return client.client._client
+
+        first, second = asyncio.run(pool()), asyncio.run(pool())
+        self.assertIsNot(first, second)
+        with self.assertRaises(RuntimeError):
+            get_client(api_key="test")
@@ -0,0 +1,250 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from echoflow.llm.base_client import StreamEventType
+from echoflow.llm.base_messages import Message, StaticMessages, ToolCall, ToolResult
+from echoflow.llm.base_tools import Tool
+from echoflow.llm.blobs import BlobStore, ResultCondenser
+from echoflow.llm.json_schema import Field, Model
+from echoflow.llm.metrics import Metrics
+from echoflow.llm.tool_executor import ToolExecutor
+from echoflow.services.anthropic.client import AnthropicClient, AnthropicContext
+from echoflow.services.anthropic.tools import AnthropicTool
+from tests.anthropic_events import (
+    FakeStream,
+    hello_stream,
+    message_end,
+    message_start,
+    text_block,
+    tool_block,
+)
+
+
+class Empty(Model):
+    pass
+
+
+class Lookup(Model):
+    query: str = Field(pattern="^[a-z ]+$")
+
+
+class LookupTool(Tool):
+    def __init__(self, schema: type[Model] = Empty):
+        super().__init__("lookup", "looks things up", schema, idempotent=True)
+        self.started = asyncio.Event()
+        self.calls = 0
+
+    async def async_call(self, tool_call: ToolCall) -> ToolResult:
+        self.started.set()
+        self.calls += 1
+        return ToolResult(id=tool_call.id, content=f"found {tool_call.input['query']}")
+
+
+class FakeMessages:
+    def __init__(self, events: list, delay: float = 0.0):
+        self.events = events
+        self.delay = delay
+        self.requests = []
+        self.streams = []
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        self.streams.append(FakeStream(self.events, self.delay))
+        return self.streams[-1]
+
+
+def fake_client(events: list, delay: float = 0.0, **kwargs) -> AnthropicClient:
+    client = AnthropicClient(api_key="test", **kwargs)
+    client.client = SimpleNamespace(messages=FakeMessages(events, delay))
+    return client
+
+
+class TestAnthropicToolStreaming(unittest.IsolatedAsyncioTestCase):
+    async def collect(self, client, ctx, **kwargs) -> list:
+        return [event async for event in client.stream_generate(ctx, **kwargs)]
+
+    async def test_tool_arguments(self):
+        fragments = ['{"query": "wea', 'ther", "days', '": [1, 2', "]}"]
+        events = [message_start(), *tool_block(0, "t1", "lookup", fragments), *message_end()]
+        stream = await self.collect(fake_client(events), AnthropicContext())
+
+        arguments = [e.data for e in stream if e.type == StreamEventType.tool_argument]
+        self.assertEqual(
+            [(a["argument"], a["value"]) for a in arguments],
+            [("query", "weather"), ("days", [1, 2])],
+        )
+        (tool,) = [e.data["tool"] for e in stream if e.type == StreamEventType.tool]
+        self.assertEqual(
+            tool, ToolCall(id="t1", name="lookup", input={"query": "weather", "days": [1, 2]})
+        )
+
+    async def test_invalid_tool_input(self):
+        events = [
+            message_start(),
+            *tool_block(0, "t1", "lookup", ['{"query": "a", ']),
+            *message_end(),
+        ]
+        stream = await self.collect(fake_client(events), AnthropicContext())
+
+        types = [e.type for e in stream]
+        self.assertIn(StreamEventType.error, types)
+        self.assertLess(types.index(StreamEventType.error), types.index(StreamEventType.tool))
+        tool = stream[types.index(StreamEventType.tool)].data["tool"]
+        self.assertEqual(tool.input, {"query": "a"})
+
+    async def test_schema_validation(self):
+        events = [
+            message_start(),
+            *tool_block(0, "t1", "lookup", ['{"query": "rain"}']),
+            *tool_block(1, "t2", "lookup", ['{"query": "Rain"}']),
+            *message_end(stop_reason="tool_use"),
+        ]
+        ctx = AnthropicContext(tools=[AnthropicTool(LookupTool(Lookup))])
+        async with ToolExecutor(ctx.tools) as executor:
+            stream = await self.collect(fake_client(events), ctx, tool_executor=executor)
+
+        valid, invalid = [e.data for e in stream if e.type == StreamEventType.tool]
+        self.assertEqual(valid["tool"].parsed, Lookup(query="rain"))
+        self.assertIn("result", valid)
+        self.assertIsNone(invalid["tool"].parsed)
+        self.assertNotIn("result", invalid)
+        (error,) = [e.data["error"] for e in stream if e.type == StreamEventType.error]
+        self.assertTrue(error.startswith("invalid input for tool lookup: query:"))
+
+    async def test_early_dispatch(self):
+        tool = LookupTool()
+        events = [
+            message_start(),
+            *tool_block(0, "t1", "lookup", ['{"query": "weather"}']),
+            *text_block(1, ["let me ", "check ", "that ", "for you"]),
+            *message_end(stop_reason="tool_use"),
+        ]
+        client = fake_client(events, delay=0.01)
+        ctx = AnthropicContext(tools=[AnthropicTool(tool)])
+
+        async with ToolExecutor(ctx.tools) as executor:
+            stream = client.stream_generate(ctx, tool_executor=executor)
+            async for event in stream:
+                if event.type == StreamEventType.tool:
+                    self.assertTrue(event.data["dispatched"])
+                    result, tool_call = event.data["result"], event.data["tool"]
+                if event.type == StreamEventType.text_delta:
+                    self.assertTrue(tool.started.is_set())
+
+            self.assertEqual(await result, ToolResult(id="t1", content="found weather"))
+            # running the turn's calls afterwards reuses the dispatched task
+            self.assertEqual(await executor.run([tool_call]), [await result])
+            self.assertEqual(tool.calls, 1)
+
+    async def test_no_dispatch_without_opt_in(self):
+        events = [
+            message_start(),
+            *tool_block(0, "t1", "lookup", ['{"query": "x"}']),
+            *message_end(),
+        ]
+        ctx = AnthropicContext(tools=[AnthropicTool(LookupTool())])
+        stream = await self.collect(fake_client(events), ctx)
+
+        (tool,) = [e for e in stream if e.type == StreamEventType.tool]
+        self.assertNotIn("result", tool.data)
+        self.assertNotIn("dispatched", tool.data)
+
+
+class TestVolatileTail(unittest.IsolatedAsyncioTestCase):
+    async def test_tail_follows_the_last_user_turn(self):
+        client = fake_client(hello_stream())
+        ctx = AnthropicContext()
+        prefixes = []
+        for i, time in enumerate(("10:42", "10:43")):
+            ctx.history.add_message(Message(role="user", content=[f"question {i}"]))
+            ctx.rag[:] = [Message(role="user", content=[f"chunk {i}"])]
+            ctx.dynamic["time"] = f"It is {time}."
+            async for event in client.stream_generate(ctx):
+                if event.type == StreamEventType.metadata:
+                    prefixes.append(event.data["prefix"])
+                    self.assertIsNone(event.data["cache_bust"])
+            ctx.history.add_message(Message(role="assistant", content=["answer"]))
+
+        messages = client.client.messages.requests[1]["messages"]
+        self.assertEqual(
+            [block["text"] for block in messages[-1]["content"]],
+            ["question 1", "chunk 1", "It is 10:43."],
+        )
+        self.assertEqual(len(ctx.history.value[-2]["content"]), 1)  # history is left alone
+        self.assertNotEqual(prefixes[0], prefixes[1])
+
+    async def test_context_gets_a_session_id(self):
+        client = fake_client(hello_stream())
+        ctx, other = AnthropicContext(), AnthropicContext()
+        for c in (ctx, ctx, other):
+            async for _ in client.stream_generate(c):
+                pass
+        self.assertIsNotNone(ctx.session_id)
+        self.assertNotEqual(ctx.session_id, other.session_id)
+        self.assertEqual(client.cache_report(ctx).requests, 2)
+
+        client.release(ctx)
+        self.assertEqual(client.cache_planner._sessions[ctx.session_id].elements, [])
+        self.assertEqual(client.cache_report(ctx).requests, 2)
+
+    async def test_full_tool_results_until_answered(self):
+        store = BlobStore()
+        condense = ResultCondenser(store, threshold=100, preview=10)
+        client = fake_client(hello_stream(), blobs=store)
+        ctx = AnthropicContext()
+        ctx.history.add_message(Message(role="user", content=["search"]))
+        call = ToolCall(id="t1", name="search", input={})
+        ctx.history.add_message(Message(role="assistant", content=[call]))
+        full = "hit " * 100
+        ctx.history.add_message(Message(role="tool", content=[condense(ToolResult("t1", full))]))
+
+        for _ in range(2):
+            async for _ in client.stream_generate(ctx):
+                pass
+            ctx.history.add_message(Message(role="assistant", content=["done"]))
+            ctx.history.add_message(Message(role="user", content=["thanks"]))
+
+        first, second = (r["messages"] for r in client.client.messages.requests)
+        self.assertNotIn(full, first[-1]["content"][0]["content"])
+        self.assertEqual(first[-1]["content"][-1]["text"], f"Full result of tool call t1:\n{full}")
+        self.assertFalse(any(full in str(m) for m in second))
+
+
+class TestBargeIn(unittest.IsolatedAsyncioTestCase):
+    async def test_cancel(self):
+        deltas = ["Tomorrow ", "will be ", "sunny ", "and warm ", "in Paris."]
+        events = [message_start(input_tokens=40), *text_block(0, deltas), *message_end()]
+        metrics = Metrics()
+        client = fake_client(events, delay=0.01, metrics=metrics)
+        generation = client.start(AnthropicContext())
+
+        received = []
+        async for event in generation:
+            received.append(event)
+            if generation.text == "Tomorrow will be ":
+                usage = await generation.cancel()
+
+        stream = client.client.messages.streams[0]
+        self.assertTrue(stream.closed)
+        last = received[-1]
+        self.assertEqual(last.type, StreamEventType.metadata)
+        self.assertTrue(last.data["cancelled"])
+        self.assertIs(last.data["metadata"], usage)
+        self.assertEqual(usage.input_text_tokens, 40)
+        self.assertGreater(usage.output_text_tokens, 0)
+        self.assertEqual(sum(metrics.cancelled.values()), 1)
+
+        history = StaticMessages()
+        history.add_message(Message(role="user", content=["weather?"]))
+        generation.commit(history, spoken="Tomorrow")
+        self.assertEqual(history[-1], Message(role="assistant", content=["Tomorrow"]))
+
+    async def test_cancel_after_end(self):
+        events = [message_start(), *text_block(0, ["Hi"]), *message_end(output_tokens=3)]
+        generation = fake_client(events).start(AnthropicContext())
+        received = [event async for event in generation]
+        usage = await generation.cancel()
+        self.assertFalse(generation.cancelled)
+        self.assertEqual(usage.output_text_tokens, 3)
+        self.assertNotIn("cancelled", received[-1].data)
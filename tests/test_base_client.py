@@ -0,0 +1,40 @@
+import unittest
+
+from echoflow.llm.base_client import Client, Metadata, StreamEvent, StreamEventType
+from echoflow.llm.base_context import LLMContext
+from echoflow.llm.base_messages import ToolCall
+
+
+class ScriptedClient(Client):
+    def __init__(self, events: list[StreamEvent]):
+        self.events = events
+
+    async def stream_generate(self, ctx: LLMContext, **kwargs):
+        for event in self.events:
+            yield event
+
+
+class TestGenerate(unittest.IsolatedAsyncioTestCase):
+    async def test_collects_the_stream(self):
+        tool_call = ToolCall("t1", "lookup", {"query": "weather"})
+        metadata = Metadata(input_text_tokens=12, output_text_tokens=5)
+        client = ScriptedClient(
+            [
+                StreamEvent(StreamEventType.start),
+                StreamEvent(StreamEventType.text_delta, {"text_delta": "let me "}),
+                StreamEvent(StreamEventType.text_delta, {"text_delta": "check"}),
+                StreamEvent(StreamEventType.tool, {"tool": tool_call}),
+                StreamEvent(StreamEventType.metadata, {"metadata": metadata}),
+                StreamEvent(StreamEventType.stop),
+            ]
+        )
+
+        result = await client.generate(LLMContext())
+
+        self.assertEqual(result.text, "let me check")
+        self.assertIs(result.tool_call, tool_call)
+        self.assertIs(result.metadata, metadata)
+
+
+if __name__ == "__main__":
+    unittest.main()
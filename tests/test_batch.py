@@ -0,0 +1,117 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from echoflow.llm.admission import TokenBucket
+from echoflow.llm.base_client import Client, Metadata, StreamEvent, StreamEventType
+from echoflow.llm.base_context import LLMContext, Params
+from echoflow.llm.batch import BatchRunner, generate_many
+
+
+class Overloaded(Exception):
+    status_code = 529
+
+
+class FakeClient(Client):
+    """Answers every context with its session id, rejecting requests beyond `capacity`."""
+
+    def __init__(self, capacity: int = 1000, fail: set = frozenset(), delay: float = 0.01):
+        self.capacity = capacity
+        self.fail = fail
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = []
+
+    async def stream_generate(self, ctx: LLMContext, **kwargs):
+        self.calls.append(ctx.session_id)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.in_flight > self.capacity:
+                raise Overloaded("overloaded_error")
+            if ctx.session_id in self.fail:
+                raise ValueError("bad request")
+            yield StreamEvent(StreamEventType.text_delta, {"text_delta": f"re {ctx.session_id}"})
+            metadata = Metadata(input_text_tokens=30, output_text_tokens=10)
+            yield StreamEvent(StreamEventType.metadata, {"metadata": metadata})
+        finally:
+            self.in_flight -= 1
+
+
+def contexts(n: int) -> list[LLMContext]:
+    return [
+        LLMContext(params=Params(model_id="m", max_tokens=50), session_id=f"s{i}") for i in range(n)
+    ]
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_refill_and_debt(self):
+        now = [0.0]
+        bucket = TokenBucket(60, clock=lambda: now[0])
+        self.assertEqual(bucket.wait_time(60), 0)
+        bucket.take(70)
+        self.assertAlmostEqual(bucket.wait_time(1), 11.0)
+        now[0] = 11.0
+        self.assertAlmostEqual(bucket.wait_time(1), 0.0)
+        self.assertAlmostEqual(bucket.wait_time(1000), 59.0)  # capped at the capacity
+
+
+class TestBatchRunner(unittest.IsolatedAsyncioTestCase):
+    async def test_results_and_concurrency(self):
+        client = FakeClient()
+        results = [r async for r in generate_many(client, contexts(40), max_concurrency=8)]
+        self.assertEqual(sorted(r.key for r in results), list(range(40)))
+        self.assertTrue(all(r.result.text == f"re s{r.key}" for r in results))
+        self.assertEqual(client.peak, 8)
+
+    async def test_adapts_to_overload(self):
+        client = FakeClient(capacity=4)
+        runner = BatchRunner(client, max_concurrency=16, backoff=0.01)
+        results = [r async for r in runner.run(contexts(60))]
+
+        self.assertEqual(len(results), 60)
+        self.assertTrue(all(r.error is None for r in results))
+        self.assertGreater(runner.overloads, 0)
+        self.assertLess(runner.concurrency, 16)
+
+    async def test_errors_are_reported(self):
+        client = FakeClient(fail={"s3"})
+        results = {r.key: r async for r in generate_many(client, contexts(5))}
+        self.assertIn("ValueError", results[3].error)
+        self.assertEqual(results[3].attempts, 1)
+        self.assertIsNone(results[4].error)
+
+    async def test_token_budget_is_settled(self):
+        runner = BatchRunner(FakeClient(), tokens_per_minute=100_000)
+        runner.tokens = TokenBucket(100_000, clock=lambda: 0.0)  # no refill while it runs
+        results = [r async for r in runner.run(contexts(10))]
+        self.assertEqual(len(results), 10)
+        # each request reserved its estimate plus max_tokens and was charged its 40 tokens
+        self.assertEqual(runner.tokens.level, 100_000 - 10 * 40)
+
+    async def test_resume_from_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "run.jsonl")
+            client = FakeClient(fail={"s2"})
+            first = []
+            async for result in generate_many(client, contexts(20), checkpoint=path):
+                first.append(result)
+                if len(first) == 10:
+                    break
+
+            client = FakeClient()
+            second = [r async for r in generate_many(client, contexts(20), checkpoint=path)]
+
+        done = {r.key for r in first if r.error is None}
+        resumed = {r.key for r in second if r.resumed}
+        self.assertEqual(resumed, done)
+        self.assertEqual(sorted(r.key for r in second), list(range(20)))
+        self.assertEqual(len(client.calls), 20 - len(done))
+        self.assertEqual({r.result.text for r in second if r.key == 2}, {"re s2"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from echoflow.llm.base_messages import Message, ToolCall, ToolResult
+from echoflow.llm.base_tools import Tool
+from echoflow.llm.blobs import BlobStore, ResultCondenser
+from echoflow.llm.json_schema import Model
+from echoflow.llm.store import decode_message, encode_message
+from echoflow.llm.tool_executor import ToolExecutor
+
+
+class TestBlobStore(unittest.TestCase):
+    def test_deduplicates(self):
+        store = BlobStore()
+        first = store.put("x" * 1000)
+        self.assertEqual(store.put("x" * 1000), first)
+        self.assertEqual(store.memory, 1000)
+        self.assertEqual(store.get(first), "x" * 1000)
+        self.assertIsNone(store.get("0" * 32))
+
+    def test_spills_to_disk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = BlobStore(directory, max_memory=2500)
+            digests = [store.put(c * 1000) for c in "abc"]
+            self.assertEqual(store.memory, 2000)
+            self.assertEqual(os.listdir(directory), [f"{digests[0]}.blob"])
+            self.assertEqual([store.get(d) for d in digests], [c * 1000 for c in "abc"])
+
+            # another worker sharing the directory finds spilled blobs
+            self.assertIn(digests[0], BlobStore(directory))
+
+    def test_deletes_oldest_spilled_blobs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = BlobStore(directory, max_memory=1500, max_disk=2500)
+            digests = [store.put(c * 1000) for c in "abcd"]
+            self.assertEqual(store.disk, 2000)
+            self.assertEqual(
+                sorted(os.listdir(directory)), sorted(f"{d}.blob" for d in digests[1:3])
+            )
+            self.assertIsNone(store.get(digests[0]))
+
+            # a new store accounts for the blobs already on disk
+            self.assertEqual(BlobStore(directory, max_disk=2500).disk, 2000)
+
+    def test_drops_without_directory(self):
+        store = BlobStore(max_memory=1500)
+        old, new = store.put("a" * 1000), store.put("b" * 1000)
+        self.assertIsNone(store.get(old))
+        self.assertEqual(store.get(new), "b" * 1000)
+
+
+class TestAsyncGet(unittest.IsolatedAsyncioTestCase):
+    async def test_reads_spilled_blobs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = BlobStore(directory, max_memory=1500)
+            spilled, held = store.put("a" * 1000), store.put("b" * 1000)
+            self.assertEqual(await store.async_get(spilled), "a" * 1000)
+            self.assertEqual(await store.async_get(held), "b" * 1000)
+            self.assertIsNone(await store.async_get("0" * 32))
+
+
+class Empty(Model):
+    pass
+
+
+class SearchTool(Tool):
+    def __init__(self):
+        super().__init__("search", "searches", Empty)
+
+    async def async_call(self, tool_call: ToolCall) -> ToolResult:
+        return ToolResult(id=tool_call.id, content="result " * 2000)
+
+
+class TestResultCondenser(unittest.IsolatedAsyncioTestCase):
+    async def test_condenses_large_results(self):
+        store = BlobStore()
+        condense = ResultCondenser(store, threshold=1000, preview=100)
+        self.assertIs(condense(ToolResult("t0", "short")).blob, None)
+
+        async with ToolExecutor([SearchTool()], condense=condense) as executor:
+            calls = [ToolCall(id=f"t{i}", name="search", input={}) for i in range(2)]
+            results = await executor.run(calls)
+
+        self.assertEqual([r.id for r in results], ["t0", "t1"])
+        self.assertEqual(results[0].blob, results[1].blob)  # stored once
+        self.assertEqual(store.get(results[0].blob), "result " * 2000)
+        self.assertTrue(results[0].content.startswith("result result"))
+        self.assertLess(len(results[0].content), 150)
+
+        message = Message(role="tool", content=[results[0]])
+        self.assertEqual(decode_message(encode_message(message, 0)), message)
+
+    async def test_failed_condensing_keeps_the_result(self):
+        store = BlobStore()
+        condense = ResultCondenser(store, threshold=1000)
+        calls = [ToolCall(id=f"t{i}", name="search", input={}) for i in range(2)]
+        with mock.patch.object(store, "put", side_effect=OSError("disk full")):
+            async with ToolExecutor([SearchTool()], condense=condense) as executor:
+                results = await executor.run(calls)
+
+        self.assertEqual([r.id for r in results], ["t0", "t1"])
+        self.assertEqual(results[0], ToolResult("t0", "result " * 2000))
+
+    def test_summarize(self):
+        condense = ResultCondenser(BlobStore(), threshold=10, summarize=lambda c: f"{len(c)} chars")
+        self.assertEqual(condense(ToolResult("t", "x" * 50)).content, "50 chars")
+
+        condense = ResultCondenser(BlobStore(), threshold=10, preview=5, summarize=str.upper)
+        self.assertEqual(condense(ToolResult("t", "x" * 50)).content, "XXXXX")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+
+from echoflow.llm.base_messages import Message, ToolCall, ToolResult
+from echoflow.llm.tokens import estimate_tokens, serialize
+from echoflow.services.anthropic.client import AnthropicContext
+from echoflow.services.anthropic.messages import AnthropicWindowedMessages
+from tests.anthropic_events import hello_stream, message_start
+from tests.test_anthropic_stream import fake_client
+
+
+def add_turn(history: AnthropicWindowedMessages, i: int, tool: bool = False):
+    history.add_message(Message(role="user", content=[f"question {i} " + "x" * 200]))
+    if tool:
+        call = ToolCall(id=f"t{i}", name="lookup", input={"query": "y" * 100})
+        history.add_message(Message(role="assistant", content=[call]))
+        history.add_message(
+            Message(role="tool", content=[ToolResult(id=f"t{i}", content="z" * 200)])
+        )
+    history.add_message(Message(role="assistant", content=[f"answer {i} " + "w" * 200]))
+
+
+class TestWindowedMessages(unittest.TestCase):
+    def test_window_fits_budget_and_starts_with_user(self):
+        history = AnthropicWindowedMessages(budget=1000)
+        for i in range(50):
+            add_turn(history, i, tool=i % 2 == 0)
+            self.assertLessEqual(history.tokens, 1000)
+            self.assertEqual(history.value[0]["role"], "user")
+            self.assertEqual(history.value[0]["content"][0]["type"], "text")
+        self.assertEqual(len(history), 150)
+        self.assertEqual(history.value[-1], history._static[-1])
+
+    def test_tokens_are_incremental(self):
+        history = AnthropicWindowedMessages(budget=10**6)
+        for i in range(10):
+            add_turn(history, i, tool=True)
+        self.assertEqual(history.tokens, sum(estimate_tokens(serialize(m)) for m in history.value))
+
+    def test_window_start_is_stable(self):
+        history = AnthropicWindowedMessages(budget=2000, low_water=0.5)
+        starts = []
+        for i in range(40):
+            add_turn(history, i)
+            starts.append(history.start)
+        self.assertGreater(starts[-1], 0)
+        # the start moves in a few jumps, not on every turn
+        self.assertLess(len(set(starts)), 10)
+
+    def test_lazy_window(self):
+        lazy = AnthropicWindowedMessages(budget=2000, lazy=True)
+        eager = AnthropicWindowedMessages(budget=2000)
+        for i in range(20):
+            add_turn(lazy, i)
+            add_turn(eager, i)
+        self.assertGreater(lazy.start, 0)
+        value = lazy.value
+        self.assertEqual(value, eager.value)
+        self.assertEqual(len(value), len(lazy) - lazy.start)
+
+        # kept up to date, not adapted again, while the window does not move
+        lazy.add_message(Message(role="user", content=["one more"]))
+        self.assertIs(lazy.value, value)
+        self.assertEqual(value[-1]["content"][-1]["text"], "one more")
+
+    def test_calibrate(self):
+        history = AnthropicWindowedMessages(budget=1000)
+        for i in range(3):
+            add_turn(history, i)
+        before = history.tokens
+        history.calibrate(estimated=100, actual=300, weight=1.0)
+        self.assertEqual(history.scale, 3.0)
+        self.assertLessEqual(history.tokens, 1000)
+        self.assertLess(history.tokens, before * 3)
+
+
+class TestClientCalibration(unittest.IsolatedAsyncioTestCase):
+    async def test_client_calibrates_history(self):
+        events = hello_stream()
+        events[0] = message_start(input_tokens=1000)
+        client = fake_client(events)
+        ctx = AnthropicContext(history=AnthropicWindowedMessages(budget=10**6))
+        add_turn(ctx.history, 0)
+        ctx.history.add_message(Message(role="user", content=["hi"]))
+
+        async for _ in client.stream_generate(ctx):
+            pass
+        self.assertGreater(ctx.history.scale, 1.0)
+
+    async def test_tail_is_part_of_the_estimate(self):
+        client = fake_client(hello_stream())
+        ctx = AnthropicContext(history=AnthropicWindowedMessages(budget=10**6))
+        add_turn(ctx.history, 0)
+        ctx.history.add_message(Message(role="user", content=["hi"]))
+        estimates = []
+        calibrate = ctx.history.calibrate
+        ctx.history.calibrate = lambda estimated, actual: (
+            estimates.append(estimated),
+            calibrate(estimated, actual),
+        )
+
+        for dynamic in ({}, {"notes": "n" * 4000}):
+            ctx.dynamic = dynamic
+            async for _ in client.stream_generate(ctx):
+                pass
+        tail = [{"type": "text", "text": "n" * 4000}]
+        self.assertEqual(estimates[1] - estimates[0], estimate_tokens(serialize(tail)))
@@ -0,0 +1,100 @@
+import asyncio
+import unittest
+
+from echoflow.llm.base_client import Client, StreamEvent, StreamEventType
+from echoflow.llm.base_context import LLMContext
+from echoflow.llm.hedging import HedgedClient
+
+
+class FakeBackend(Client):
+    """Streams start, `text` deltas and stop after `delay` seconds, optionally failing."""
+
+    def __init__(self, name: str, delay: float = 0.0, fail_after: int = None, gap: float = 0.0):
+        self.name = name
+        self.delay = delay
+        self.fail_after = fail_after
+        self.gap = gap
+        self.calls = 0
+        self.cancelled = 0
+
+    async def stream_generate(self, ctx: LLMContext, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+            events = [StreamEvent(StreamEventType.start)]
+            events += [
+                StreamEvent(StreamEventType.text_delta, {"text_delta": f"{self.name}{i}"})
+                for i in range(3)
+            ]
+            events.append(StreamEvent(StreamEventType.stop, {"stop_reason": "end_turn"}))
+            for i, event in enumerate(events):
+                if i == self.fail_after:
+                    raise ConnectionError(f"{self.name} failed")
+                yield event
+                await asyncio.sleep(self.gap)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+async def text(client: Client) -> str:
+    deltas = [
+        event.data["text_delta"]
+        async for event in client.stream_generate(LLMContext())
+        if event.type == StreamEventType.text_delta
+    ]
+    return "".join(deltas)
+
+
+class TestHedgedClient(unittest.IsolatedAsyncioTestCase):
+    async def test_primary_in_time(self):
+        primary, secondary = FakeBackend("a", delay=0.01), FakeBackend("b")
+        client = HedgedClient([primary, secondary], hedge_after=0.1)
+        self.assertEqual(await text(client), "a0a1a2")
+        self.assertEqual((secondary.calls, client.hedges), (0, 0))
+
+    async def test_hedge_wins_and_loser_is_cancelled(self):
+        primary, secondary = FakeBackend("a", delay=1.0), FakeBackend("b", delay=0.01)
+        client = HedgedClient([primary, secondary], hedge_after=0.05)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        self.assertEqual(await text(client), "b0b1b2")
+        self.assertLess(loop.time() - start, 0.5)
+        self.assertEqual((client.hedges, primary.cancelled), (1, 1))
+
+    async def test_primary_wins_over_hedge(self):
+        primary, secondary = FakeBackend("a", delay=0.1), FakeBackend("b", delay=1.0)
+        client = HedgedClient([primary, secondary], hedge_after=0.05)
+        self.assertEqual(await text(client), "a0a1a2")
+        self.assertEqual((client.hedges, secondary.cancelled), (1, 1))
+
+    async def test_failover_before_content(self):
+        primary, secondary = FakeBackend("a", fail_after=1), FakeBackend("b")
+        client = HedgedClient([primary, secondary], hedge_after=1.0)
+        self.assertEqual(await text(client), "b0b1b2")
+        self.assertEqual(client.failovers, 1)
+
+    async def test_failure_after_content_is_raised(self):
+        client = HedgedClient([FakeBackend("a", fail_after=2), FakeBackend("b")], hedge_after=1.0)
+        with self.assertRaises(ConnectionError):
+            await text(client)
+
+    async def test_all_backends_fail(self):
+        client = HedgedClient([FakeBackend("a", fail_after=0), FakeBackend("b", fail_after=0)])
+        with self.assertRaisesRegex(ConnectionError, "b failed"):
+            await text(client)
+
+    async def test_adaptive_delay(self):
+        client = HedgedClient([FakeBackend("a")], min_samples=10, min_hedge_after=0.0)
+        self.assertEqual(client.hedge_delay(), client.initial_hedge_after)
+        client.first_event_latencies.extend(i / 100 for i in range(1, 101))
+        self.assertAlmostEqual(client.hedge_delay(), 0.95)
+
+    async def test_abandoned_stream_cancels_backends(self):
+        primary, secondary = FakeBackend("a", gap=1.0), FakeBackend("b", delay=1.0)
+        client = HedgedClient([primary, secondary], hedge_after=1.0)
+        stream = client.stream_generate(LLMContext())
+        async for event in stream:
+            break
+        await stream.aclose()
+        self.assertEqual((primary.cancelled, secondary.calls), (1, 0))
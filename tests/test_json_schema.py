@@ -0,0 +1,166 @@
+import copy
+import json
+import unittest
+from typing import Union
+
+from echoflow.llm.base_tools import Tool
+from echoflow.llm.json_schema import Field, Model, ValidationError
+from echoflow.services.anthropic.tools import AnthropicTool, marshal_tools
+
+
+class Place(Model):
+    city: str = Field(description="city name")
+
+
+class Query(Model):
+    keyword: str = Field(description="search keyword", pattern="^[a-z]+$")
+    limit: int
+    places: list[Union[Place, str]] = Field(max_items=3, alias="where")
+
+
+class TestModelSchema(unittest.TestCase):
+    def test_json_schema(self):
+        expected = {
+            "properties": {
+                "keyword": {
+                    "description": "search keyword",
+                    "pattern": "^[a-z]+$",
+                    "type": "string",
+                },
+                "limit": {"type": "integer"},
+                "where": {
+                    "items": {
+                        "oneOf": [
+                            {
+                                "properties": {
+                                    "city": {"description": "city name", "type": "string"}
+                                },
+                                "required": ["city"],
+                                "type": "object",
+                            },
+                            {"type": "string"},
+                        ]
+                    },
+                    "maxItems": 3,
+                    "type": "array",
+                },
+            },
+            "required": ["keyword", "limit", "where"],
+            "type": "object",
+        }
+        self.assertEqual(Query.json_schema(extra={"key_any_of": "oneOf"}), expected)
+        self.assertEqual(
+            json.loads(json.dumps(Query.json_schema(extra={"key_any_of": "oneOf"}))), expected
+        )
+
+    def test_compiled_once_per_dialect(self):
+        self.assertIs(Query.json_schema(), Query.json_schema(extra={}))
+        self.assertIs(
+            Query.json_schema(extra={"additionalProperties": False}),
+            Query.json_schema(extra={"additionalProperties": False}),
+        )
+        self.assertIsNot(Query.json_schema(), Query.json_schema(extra={"key_any_of": "oneOf"}))
+        self.assertFalse(
+            Query.json_schema(extra={"additionalProperties": False})["additionalProperties"]
+        )
+
+    def test_frozen(self):
+        schema = Query.json_schema()
+        with self.assertRaises(TypeError):
+            schema["type"] = "array"
+        with self.assertRaises(TypeError):
+            schema["required"].append("extra")
+
+        thawed = copy.deepcopy(schema)
+        thawed["required"].append("extra")
+        self.assertEqual(schema["required"], ["keyword", "limit", "where"])
+
+    def test_union_of_models_is_typed_as_objects(self):
+        class Town(Model):
+            name: str
+
+        class Trip(Model):
+            stops: list[Union[Place, Town]]
+
+        self.assertEqual(Trip.json_schema()["properties"]["stops"]["items"]["type"], "object")
+
+
+class Order(Model):
+    size: str = Field(enum=["small", "large"])
+    items: list[int] = Field(min_items=1, max_items=2)
+    price: float
+
+
+class TestModelDecode(unittest.TestCase):
+    def test_decode(self):
+        query = Query.decode(
+            {"keyword": "rain", "limit": 2.0, "where": [{"city": "Paris"}, "Lyon"], "x": 1}
+        )
+        self.assertEqual(
+            query, Query(keyword="rain", limit=2, places=[Place(city="Paris"), "Lyon"])
+        )
+        self.assertIsInstance(query.places[0], Place)
+        self.assertIs(type(query.limit), int)
+
+        order = Order.decode({"size": "small", "items": [1], "price": 3})
+        self.assertEqual((order.size, order.items, order.price), ("small", [1], 3.0))
+
+    def test_schema_accepts_what_decode_accepts(self):
+        try:
+            import jsonschema
+        except ImportError:
+            self.skipTest("jsonschema is not installed")
+        data = {"keyword": "rain", "limit": 2, "where": [{"city": "Paris"}, "Lyon"]}
+        Query.decode(data)
+        jsonschema.validate(data, Query.json_schema({"key_any_of": "oneOf"}))
+
+    def test_not_hashable(self):
+        with self.assertRaises(TypeError):
+            hash(Place(city="Paris"))
+
+    def test_errors(self):
+        cases = [
+            ({"keyword": "Rain", "limit": 1, "where": []}, "keyword"),
+            ({"keyword": "rain", "limit": True, "where": []}, "limit"),
+            ({"keyword": "rain", "limit": 1, "places": []}, "where"),
+            ({"keyword": "rain", "limit": 1, "where": ["a", {"town": "b"}]}, "where[1].city"),
+            ({"keyword": "rain", "limit": 1, "where": ["a", 2]}, "where[1]"),
+            ({"keyword": "rain", "limit": 1, "where": ["a"] * 4}, "where"),
+        ]
+        for data, path in cases:
+            with self.subTest(path=path), self.assertRaises(ValidationError) as raised:
+                Query.decode(data)
+            self.assertEqual(raised.exception.path, path)
+
+        for data in (
+            {"size": "medium", "items": [1], "price": 1.0},
+            {"size": "small", "items": [], "price": 1.0},
+            {"size": "small", "items": [1], "price": "1"},
+        ):
+            with self.assertRaises(ValidationError):
+                Order.decode(data)
+        with self.assertRaises(ValidationError):
+            Order.decode([])
+
+
+class TestAnthropicToolSpecs(unittest.TestCase):
+    def setUp(self):
+        self.search = Tool("search", "search the web", Query)
+        self.tools = [
+            AnthropicTool(self.search),
+            AnthropicTool(Tool("locate", "locate a city", Place)),
+        ]
+
+    def test_marshal(self):
+        spec = self.tools[0].marshal()
+        self.assertEqual(spec["name"], "search")
+        self.assertIs(spec, self.tools[0].marshal())
+
+        self.search.description = "search the news"
+        self.assertEqual(self.tools[0].marshal()["description"], "search the news")
+
+    def test_tool_list_reused(self):
+        specs = marshal_tools(self.tools)
+        self.assertIs(specs, marshal_tools(list(self.tools)))
+        self.assertEqual([s["name"] for s in specs], ["search", "locate"])
+        self.assertIsNot(specs, marshal_tools(self.tools[:1]))
@@ -0,0 +1,142 @@
+import threading
+import unittest
+
+from echoflow import logger as logger_module
+from echoflow.logger import (
+    DEBUG,
+    ERROR,
+    INFO,
+    Logger,
+    QueuedLogger,
+    TenLogger,
+    get_logger,
+    init_logger,
+)
+
+
+class ListLogger(Logger):
+    def __init__(self, level=DEBUG, sampling=None):
+        self.level = level
+        self.sampling = sampling or {}
+        self.lines = []
+
+    def log_info(self, message: str):
+        self.lines.append(("info", message))
+
+    def log_error(self, message: str):
+        self.lines.append(("error", message))
+
+    def log_debug(self, message: str):
+        self.lines.append(("debug", message))
+
+    def log_warn(self, message: str):
+        self.lines.append(("warn", message))
+
+
+class FakeTenEnv:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda message: self.calls.append((name, message))
+
+
+class TestLogger(unittest.TestCase):
+    def test_disabled_level_is_not_formatted(self):
+        log = ListLogger(level=INFO)
+        calls = []
+
+        def message():
+            calls.append(1)
+            return "expensive"
+
+        log.debug(message)
+        log.debug("event {}", object())
+        self.assertEqual(calls, [])
+        self.assertEqual(log.lines, [])
+
+        log.info(message)
+        self.assertEqual(calls, [1])
+        self.assertEqual(log.lines, [("info", "expensive")])
+
+    def test_fields(self):
+        log = ListLogger()
+        log.warn("request {} slow", 7, ms=12.5, model="a b", empty="")
+        self.assertEqual(log.lines, [("warn", 'request 7 slow ms=12.5 model="a b" empty=""')])
+
+    def test_sampling(self):
+        log = ListLogger(sampling={"delta": 10})
+        for i in range(25):
+            log.debug("delta {}", i, sample="delta")
+            log.debug("other {}", i, sample="other")
+
+        deltas = [m for _, m in log.lines if m.startswith("delta")]
+        self.assertEqual(deltas, ["delta 0", "delta 10", "delta 20"])
+        self.assertEqual(len(log.lines), 3 + 25)
+
+    def test_ten_logger(self):
+        env = FakeTenEnv()
+        log = TenLogger(env, level="WARN")
+        log.info("hidden")
+        log.warn("careful")
+        log.error("broken {}", 1)
+        self.assertEqual(env.calls, [("log_warn", "careful"), ("log_error", "broken 1")])
+
+
+class TestQueuedLogger(unittest.TestCase):
+    def test_flush(self):
+        sink = ListLogger()
+        log = QueuedLogger(sink)
+        for i in range(100):
+            log.debug("line {}", i, n=i)
+        log.log_error("direct")
+        log.flush()
+        log.close()
+
+        self.assertEqual(len(sink.lines), 101)
+        self.assertEqual(sink.lines[0], ("debug", "line 0 n=0"))
+        self.assertEqual(sink.lines[-1], ("error", "direct"))
+
+    def test_drops_when_full(self):
+        gate = threading.Event()
+
+        class SlowLogger(ListLogger):
+            def log_debug(self, message: str):
+                gate.wait()
+                super().log_debug(message)
+
+        sink = SlowLogger()
+        log = QueuedLogger(sink, max_size=5)
+        for i in range(20):
+            log.debug("line {}", i)
+        gate.set()
+        log.flush()
+        log.close()
+
+        self.assertGreater(log.dropped, 0)
+        self.assertEqual(len(sink.lines) + log.dropped, 20)
+
+
+class TestGetLogger(unittest.TestCase):
+    def test_follows_init_logger(self):
+        previous = logger_module.logger._logger
+        captured = get_logger()
+        sink = ListLogger(level=ERROR)
+        try:
+            init_logger(sink)
+            captured.error("now {}", "here")
+            captured.debug("not here")
+        finally:
+            init_logger(previous)
+        self.assertEqual(sink.lines, [("error", "now here")])
+
+    def test_defaults(self):
+        self.assertEqual(TenLogger(FakeTenEnv()).level, INFO)
+        first, second = TenLogger(FakeTenEnv()), TenLogger(FakeTenEnv())
+        self.assertIsNot(first.sampling, second.sampling)
+        with self.assertRaises(TypeError):
+            Logger.sampling["delta"] = 10  # shared by implementations that set none
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import math
+import os
+import tempfile
+import unittest
+
+from echoflow.llm.base_client import Metadata, StreamEventType
+from echoflow.llm.metrics import Histogram, Metrics, RequestRecord
+from echoflow.services.anthropic.client import AnthropicContext
+from tests.anthropic_events import message_end, message_start, text_block, tool_block
+from tests.test_anthropic_stream import fake_client
+
+
+class TestHistogram(unittest.TestCase):
+    def test_quantiles(self):
+        histogram = Histogram()
+        for i in range(1, 1001):
+            histogram.observe(i / 1000)
+
+        for q in (0.5, 0.95, 0.99):
+            self.assertAlmostEqual(histogram.quantile(q), q, delta=q * 0.1)
+        self.assertTrue(math.isnan(Histogram().quantile(0.5)))
+
+
+class TestMetrics(unittest.TestCase):
+    def test_prometheus(self):
+        metrics = Metrics()
+        metrics.observe(
+            RequestRecord(
+                provider="anthropic",
+                model='m"1',
+                ttfb=0.2,
+                ttft=0.3,
+                inter_token_gaps=[0.01, 0.02],
+                total=1.0,
+                metadata=Metadata(input_text_tokens=10, output_text_tokens=5),
+            )
+        )
+        metrics.observe(RequestRecord(provider="anthropic", model='m"1', error="boom"))
+
+        text = metrics.prometheus()
+        self.assertIn('echoflow_llm_ttft_seconds_count{provider="anthropic",model="m\\"1"} 1', text)
+        self.assertIn(
+            'echoflow_llm_inter_token_seconds_count{provider="anthropic",model="m\\"1"} 2', text
+        )
+        self.assertIn('echoflow_llm_requests_total{provider="anthropic",model="m\\"1"} 2', text)
+        self.assertIn('echoflow_llm_errors_total{provider="anthropic",model="m\\"1"} 1', text)
+        self.assertIn(
+            'echoflow_llm_tokens_total{provider="anthropic",model="m\\"1",kind="input"} 10', text
+        )
+        self.assertIn('le="+Inf"} 1', text)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "llm.prom")
+            metrics.write_prometheus(path)
+            with open(path) as f:
+                self.assertEqual(f.read(), text)
+
+
+class TestAnthropicClientMetrics(unittest.IsolatedAsyncioTestCase):
+    async def test_records_stream(self):
+        metrics = Metrics()
+        records = []
+        metrics.subscribe(records.append)
+
+        client = fake_client(
+            [
+                message_start(input_tokens=20, cache_read=5),
+                *text_block(0, ["Hi", " there", "!"]),
+                *tool_block(1, "t1", "lookup", ['{"q": 1}']),
+                *message_end(stop_reason="tool_use", output_tokens=7),
+            ],
+            delay=0.005,
+            metrics=metrics,
+        )
+        async for _ in client.stream_generate(AnthropicContext()):
+            pass
+
+        (record,) = records
+        self.assertEqual((record.provider, record.model), ("anthropic", "claude-3-5-sonnet-latest"))
+        self.assertLess(record.ttfb, record.ttft)
+        self.assertLess(record.ttft, record.total)
+        self.assertEqual(len(record.inter_token_gaps), 2)
+        self.assertEqual(len(record.tool_durations), 1)
+        self.assertEqual(record.stop_reason, "tool_use")
+        self.assertEqual(record.metadata.cache_read_tokens, 5)
+        self.assertEqual(record.metadata.output_text_tokens, 7)
+        self.assertFalse(record.cancelled)
+        p50 = metrics.quantiles("anthropic", "claude-3-5-sonnet-latest", "ttft")[0.5]
+        self.assertGreater(p50, 0)
+
+    async def test_records_cancelled_stream(self):
+        metrics = Metrics()
+        events = [message_start(), *text_block(0, ["a", "b"])]
+        client = fake_client(events, metrics=metrics)
+
+        stream = client.stream_generate(AnthropicContext())
+        async for event in stream:
+            if event.type == StreamEventType.text_delta:
+                break
+        await stream.aclose()
+
+        self.assertEqual(metrics.cancelled, {("anthropic", "claude-3-5-sonnet-latest"): 1})
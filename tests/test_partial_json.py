@@ -0,0 +1,48 @@
+import json
+import unittest
+
+from echoflow.llm.partial_json import PartialJSONParser
+
+
+class TestPartialJSONParser(unittest.TestCase):
+    def feed_all(self, text: str, size: int) -> tuple[PartialJSONParser, list]:
+        parser = PartialJSONParser()
+        completed = []
+        for i in range(0, len(text), size):
+            completed.extend(parser.feed(text[i : i + size]))
+        return parser, completed
+
+    def test_matches_json_loads(self):
+        value = {
+            "query": 'say "hi" \\ 你好\n',
+            "limit": -12.5e3,
+            "flags": [True, None, {"nested": ["}", "]"]}],
+            "empty": {},
+        }
+        text = json.dumps(value, ensure_ascii=False, indent=1)
+        for size in (1, 2, 3, 7, len(text)):
+            parser, completed = self.feed_all(text, size)
+            self.assertEqual([name for name, _ in completed], list(value))
+            self.assertEqual(parser.close(), value)
+
+    def test_partial_string(self):
+        parser = PartialJSONParser()
+        parser.feed('{"count": 2, "text": "hello wor')
+        self.assertEqual(parser.partial, {"count": 2, "text": "hello wor"})
+        parser.feed("ld\\u00e9")
+        self.assertEqual(parser.partial["text"], "hello worldé")
+
+        parser.feed('"}')
+        self.assertEqual(parser.close(), {"count": 2, "text": "hello worldé"})
+
+    def test_empty(self):
+        self.assertEqual(PartialJSONParser().close(), {})
+        parser = PartialJSONParser()
+        parser.feed("{ }")
+        self.assertEqual(parser.close(), {})
+
+    def test_invalid(self):
+        for text in ('{"a": 1,', '{"a" 1}', '{"a": tru}', '{"a": 1} x', '{"a": "x', "[1]"):
+            parser, _ = self.feed_all(text, 2)
+            with self.assertRaises(ValueError, msg=text):
+                parser.close()
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import echoflow.services as services
+import echoflow.services.anthropic as anthropic_service
+from echoflow.services import create_client, get_provider, providers, register_provider
+from echoflow.services.anthropic.client import AnthropicClient
+
+
+class TestProviders(unittest.TestCase):
+    def test_registry(self):
+        self.assertIs(get_provider("anthropic"), AnthropicClient)
+        self.assertIn("anthropic", providers())
+        self.assertIsInstance(create_client("anthropic", api_key="test"), AnthropicClient)
+        with self.assertRaisesRegex(ValueError, "unsupported provider"):
+            create_client("anthropic", provider="openai")
+        with self.assertRaisesRegex(ValueError, "unknown provider"):
+            get_provider("missing")
+
+        register_provider("echo", "tests.test_providers:EchoClient")
+        self.addCleanup(services._loaded.pop, "echo", None)
+        self.addCleanup(services._providers.pop, "echo", None)
+        self.assertIs(get_provider("echo"), EchoClient)
+
+    def test_lazy_attributes(self):
+        self.assertIs(anthropic_service.AnthropicClient, AnthropicClient)
+        with self.assertRaises(AttributeError):
+            anthropic_service.Missing
+
+    def test_imports_do_not_load_the_sdk(self):
+        code = (
+            "import sys, echoflow.services, echoflow.services.anthropic.client;"
+            "print(sorted(m for m in ('anthropic', 'httpx', 'loguru') if m in sys.modules))"
+        )
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True
+        )
+        self.assertEqual(result.stdout.strip(), "[]")
+
+
+class EchoClient:
+    pass
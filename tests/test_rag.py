@@ -0,0 +1,121 @@
+import tempfile
+import time
+import unittest
+import unittest.mock
+
+import numpy as np
+
+from echoflow.llm.base_context import LLMContext
+from echoflow.llm.base_messages import DynamicMessages, Message, StaticMessages
+from echoflow.llm.rag import HashingEmbedder, Retriever, VectorIndex
+
+CHUNKS = [
+    "The office opens at nine in the morning and closes at six.",
+    "Refunds are processed within five business days.",
+    "Our support line is open on weekends from ten to four.",
+    "Parking is free for visitors in the north garage.",
+]
+
+
+class TestVectorIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.vectors = rng.standard_normal((500, 32)).astype(np.float32)
+        self.texts = [f"chunk {i}" for i in range(500)]
+
+    def exact(self, queries: np.ndarray, k: int) -> list[list[int]]:
+        a = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        return [list(np.argsort(-scores)[:k]) for scores in q @ a.T]
+
+    def test_batched_top_k(self):
+        index = VectorIndex(32, capacity=16)
+        index.add(self.vectors[:200], self.texts[:200])
+        index.add(self.vectors[200:], self.texts[200:])  # grows past its capacity
+        queries = self.vectors[[3, 250, 499]] + 0.1
+
+        hits = index.search(queries, k=5)
+        self.assertEqual([[h.id for h in found] for found in hits], self.exact(queries, 5))
+        self.assertEqual(hits[1][0].text, "chunk 250")
+        self.assertTrue(all(a.score >= b.score for a, b in zip(hits[0], hits[0][1:])))
+
+    def test_quantized(self):
+        index = VectorIndex(32, quantized=True)
+        index.add(self.vectors, self.texts)
+        queries = self.vectors[:20]
+        hits = index.search(queries, k=1)
+        self.assertEqual([found[0].id for found in hits], list(range(20)))
+        self.assertTrue(all(abs(found[0].score - 1) < 0.01 for found in hits))
+
+    def test_deadline(self):
+        index = VectorIndex(32)
+        index.add(self.vectors, self.texts)
+        with unittest.mock.patch("echoflow.llm.rag._BLOCK_ELEMENTS", 32 * 100):
+            hits = index.search(self.vectors[[450]], k=1, deadline=time.perf_counter())
+        self.assertLess(hits[0][0].id, 100)  # only the first block was scanned
+        self.assertEqual(index.truncated, 1)
+
+    def test_partitioned(self):
+        index = VectorIndex(32, probes=4)
+        index.add(self.vectors[:400], self.texts[:400])
+        index.partition(lists=8)
+        index.add(self.vectors[400:], self.texts[400:])  # unpartitioned tail, always scanned
+
+        queries = self.vectors[[5, 123, 450]]
+        hits = index.search(queries, k=1)
+        self.assertEqual([found[0].id for found in hits], [5, 123, 450])
+        self.assertEqual(hits[1][0].text, "chunk 123")
+
+        # probing every list is an exhaustive search
+        exact = index.search(queries, k=5, probes=8)
+        self.assertEqual([[h.id for h in found] for found in exact], self.exact(queries, 5))
+
+        with tempfile.TemporaryDirectory() as directory:
+            index.save(directory)
+            loaded = VectorIndex.load(directory, probes=4)
+            self.assertEqual(loaded.search(queries, k=3), index.search(queries, k=3))
+
+    def test_save_and_load(self):
+        for quantized in (False, True):
+            index = VectorIndex(32, quantized=quantized)
+            index.add(self.vectors[:300], self.texts[:300])
+            with tempfile.TemporaryDirectory() as directory:
+                index.save(directory)
+                loaded = VectorIndex.load(directory)
+                self.assertIsInstance(loaded._vectors, np.memmap)
+                self.assertEqual(len(loaded), 300)
+
+                loaded.add(self.vectors[300:], ["ünïcode"] * 200)
+                del index
+                expected = VectorIndex(32, quantized=quantized)
+                expected.add(self.vectors, self.texts[:300] + ["ünïcode"] * 200)
+                queries = self.vectors[[10, 400]]
+                self.assertEqual(loaded.search(queries, 3), expected.search(queries, 3))
+                self.assertEqual(loaded.text(10), "chunk 10")
+
+
+class TestRetriever(unittest.IsolatedAsyncioTestCase):
+    async def test_fills_rag(self):
+        retriever = Retriever(VectorIndex(256), HashingEmbedder(), k=2, min_score=0.05)
+        retriever.add(CHUNKS)
+
+        history = StaticMessages()
+        history.add_message(Message(role="user", content=["How fast are refunds processed?"]))
+        ctx = LLMContext(history=history, rag=DynamicMessages())
+        hits = await retriever.retrieve(ctx)
+
+        self.assertEqual(hits[0].id, 1)
+        self.assertEqual(len(ctx.rag), 1)
+        self.assertIn("five business days", ctx.rag.value[0].content[0])
+
+        await retriever.retrieve(ctx, "zzz")
+        self.assertEqual(ctx.rag.value, [])
+
+    async def test_requires_dynamic_rag(self):
+        retriever = Retriever(VectorIndex(256), HashingEmbedder())
+        with self.assertRaises(TypeError):
+            await retriever.retrieve(LLMContext(rag=StaticMessages()), "hi")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import asyncio
+import tempfile
+import threading
+import unittest
+
+from echoflow.llm.base_client import StreamEventType
+from echoflow.llm.base_messages import Message
+from echoflow.llm.response_cache import CachedClient, request_key
+from echoflow.services.anthropic.client import AnthropicContext
+from tests.anthropic_events import hello_stream, message_start, text_block
+from tests.test_anthropic_stream import fake_client
+
+
+def context(text: str = "hello") -> AnthropicContext:
+    ctx = AnthropicContext()
+    ctx.history.add_message(Message(role="user", content=[text]))
+    return ctx
+
+
+async def collect(client, ctx) -> list:
+    return [event async for event in client.stream_generate(ctx)]
+
+
+class TestCachedClient(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.upstream = fake_client(hello_stream(), delay=0.01)
+        self.requests = self.upstream.client.messages.requests
+
+    async def test_hit_replays_events(self):
+        client = CachedClient(self.upstream)
+        first = await collect(client, context())
+        second = await collect(client, context())
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual((client.hits, client.misses), (1, 1))
+        self.assertEqual([e.type for e in first], [e.type for e in second])
+        self.assertTrue(second[-1].data["cached"])
+        self.assertNotIn("cached", first[-1].data)
+
+        await collect(client, context("bye"))
+        self.assertEqual(len(self.requests), 2)
+
+    async def test_single_flight(self):
+        client = CachedClient(self.upstream)
+        results = await asyncio.gather(*(collect(client, context()) for _ in range(5)))
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(client.coalesced, 4)
+        texts = {
+            "".join(e.data["text_delta"] for e in r if e.type == StreamEventType.text_delta)
+            for r in results
+        }
+        self.assertEqual(texts, {"Hi! How can I help you today?"})
+
+    async def test_replays_are_independent(self):
+        client = CachedClient(self.upstream)
+        first = await collect(client, context())
+        first[-1].data["metadata"].output_text_tokens = -1
+        second = await collect(client, context())
+        self.assertNotEqual(second[-1].data["metadata"].output_text_tokens, -1)
+        recorded = (await client.get(request_key(context())))[-1].data["metadata"]
+        self.assertIsNot(second[-1].data["metadata"], recorded)
+
+    async def test_join_after_abandoned_flight(self):
+        client = CachedClient(self.upstream)
+        stream = client.stream_generate(context())
+        await anext(stream)
+        await stream.aclose()  # the last subscriber leaves and the flight is cancelled
+        events = await collect(client, context())
+        self.assertEqual(events[-1].type, StreamEventType.metadata)
+        self.assertEqual(client.misses, 2)
+
+    async def test_incomplete_reply_is_not_cached(self):
+        upstream = fake_client([message_start(), *text_block(0, ["Hi"])])
+        client = CachedClient(upstream)
+        await collect(client, context())
+        await collect(client, context())
+        self.assertEqual(len(upstream.client.messages.requests), 2)
+
+    async def test_ttl_and_lru(self):
+        client = CachedClient(self.upstream, max_entries=1, ttl=0.05)
+        await collect(client, context("a"))
+        await collect(client, context("b"))
+        await collect(client, context("a"))
+        self.assertEqual(client.misses, 3)
+        await asyncio.sleep(0.06)
+        await collect(client, context("a"))
+        self.assertEqual(client.misses, 4)
+
+    async def test_disk_tier(self):
+        with tempfile.TemporaryDirectory() as directory:
+            writer = CachedClient(self.upstream, directory=directory)
+            await collect(writer, context())
+            await writer.flush()
+            client = CachedClient(self.upstream, directory=directory)
+            events = await collect(client, context())
+            self.assertEqual(client.hits, 1)
+            self.assertEqual(len(self.requests), 1)
+            self.assertEqual(events[-1].type, StreamEventType.metadata)
+
+    async def test_disk_io_leaves_the_loop(self):
+        threads = []
+
+        def record(method):
+            def run(*args):
+                threads.append(threading.current_thread())
+                return method(*args)
+
+            return run
+
+        with tempfile.TemporaryDirectory() as directory:
+            client = CachedClient(self.upstream, directory=directory)
+            client._read, client._write = record(client._read), record(client._write)
+            await collect(client, context())
+            await client.flush()
+            await collect(client, context())  # a memory hit
+
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.main_thread(), threads)
+
+    async def test_pacing(self):
+        client = CachedClient(self.upstream, pace=0.02)
+        await collect(client, context())
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await collect(client, context())
+        self.assertGreaterEqual(loop.time() - start, 0.06)
@@ -0,0 +1,131 @@
+import asyncio
+import unittest
+
+from echoflow.llm.base_client import Client, Metadata, StreamEvent, StreamEventType
+from echoflow.llm.base_context import LLMContext, Params
+from echoflow.llm.base_tools import Tool
+from echoflow.llm.json_schema import Field, Model
+from echoflow.llm.router import Backend, Constraints, RouterClient
+
+
+class FakeModel(Client):
+    """Answers after `delay` seconds with `tokens` deltas, or fails with `fail`."""
+
+    def __init__(
+        self, delay: float = 0.0, tokens: int = 5, fail: bool = False, bad_tool: bool = False
+    ):
+        self.delay = delay
+        self.tokens = tokens
+        self.fail = fail
+        self.bad_tool = bad_tool
+        self.models = []
+        self.sessions = []
+
+    async def stream_generate(self, ctx: LLMContext, **kwargs):
+        self.models.append(ctx.params.model_id if ctx.params else None)
+        self.sessions.append(ctx.session_id)
+        yield StreamEvent(StreamEventType.start)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("overloaded")
+        if self.bad_tool:
+            yield StreamEvent(StreamEventType.error, {"error": "invalid input", "tool": None})
+        for i in range(self.tokens):
+            yield StreamEvent(StreamEventType.text_delta, {"text_delta": str(i)})
+        yield StreamEvent(StreamEventType.stop, {"stop_reason": "end_turn"})
+        yield StreamEvent(StreamEventType.metadata, {"metadata": Metadata(output_text_tokens=5)})
+
+
+class Args(Model):
+    city: str = Field(description="city name")
+
+
+async def drain(client: Client, ctx: LLMContext, **kwargs):
+    async for _ in client.stream_generate(ctx, **kwargs):
+        pass
+
+
+class TestRouterClient(unittest.IsolatedAsyncioTestCase):
+    async def test_prefers_fast_backend(self):
+        slow, fast = FakeModel(delay=0.05), FakeModel()
+        router = RouterClient(
+            [Backend("slow", slow), Backend("fast", fast)],
+            weight=0.5,
+            initial_ttft=0.0,
+            initial_tokens_per_second=1e6,
+        )
+        for _ in range(6):
+            await drain(router, LLMContext())
+
+        self.assertGreater(router.stats["slow"].ttft, router.stats["fast"].ttft)
+        self.assertEqual(router.route(LLMContext()).name, "fast")
+        self.assertEqual(len(slow.models), 1)
+
+    async def test_errors_move_traffic(self):
+        broken, healthy = FakeModel(fail=True), FakeModel(delay=0.01)
+        router = RouterClient([Backend("broken", broken), Backend("healthy", healthy)])
+        with self.assertRaises(ConnectionError):
+            await drain(router, LLMContext())
+        self.assertGreater(router.stats["broken"].error_rate, 0)
+        self.assertEqual(router.route(LLMContext()).name, "healthy")
+
+    async def test_model_id(self):
+        model = FakeModel()
+        router = RouterClient([Backend("haiku", model, model_id="claude-haiku")])
+        ctx = LLMContext(params=Params(model_id="claude-sonnet"))
+        await drain(router, ctx)
+        await drain(router, ctx)
+        self.assertEqual(model.models, ["claude-haiku"] * 2)
+        # the copies with the backend's model keep one session for cache planning
+        self.assertEqual(model.sessions, [ctx.session_id] * 2)
+        self.assertIsNotNone(ctx.session_id)
+
+    async def test_invalid_tool_input_is_not_a_backend_error(self):
+        router = RouterClient([Backend("model", FakeModel(bad_tool=True))])
+        await drain(router, LLMContext())
+        self.assertEqual(router.stats["model"].error_rate, 0)
+
+
+class TestRoute(unittest.TestCase):
+    def setUp(self):
+        self.small = Backend("small", FakeModel(), supports_tools=False, context_tokens=1000)
+        self.large = Backend("large", FakeModel(), context_tokens=100_000)
+        self.router = RouterClient([self.small, self.large])
+        self.router.stats["large"].ttft = 2.0
+
+    def test_constraints(self):
+        router = self.router
+        self.assertIs(router.route(LLMContext()), self.small)
+        self.assertIs(router.route(LLMContext(), Constraints(tools=True)), self.large)
+        self.assertIs(router.route(LLMContext(), Constraints(context_tokens=5000)), self.large)
+        with self.assertRaises(ValueError):
+            router.route(LLMContext(), Constraints(context_tokens=500_000))
+
+        tool = Tool(name="t", description="d", input_schema=Args)
+        self.assertIs(router.route(LLMContext(tools=[tool])), self.large)
+
+    def test_max_ttft(self):
+        router = self.router
+        router.stats["small"].ttft = 0.1
+        router.stats["small"].tokens_per_second = 1.0  # far slower to finish
+        self.assertIs(router.route(LLMContext()), self.large)
+        self.assertIs(router.route(LLMContext(), Constraints(max_ttft=0.5)), self.small)
+
+    def test_sticky_sessions(self):
+        router = self.router
+        ctx = LLMContext(session_id="s1")
+        self.assertIs(router.route(ctx), self.small)
+
+        # slightly slower now: the session stays for its warm cache, new sessions move
+        router.stats["small"].ttft = 2.5
+        self.assertIs(router.route(ctx), self.small)
+        self.assertIs(router.route(LLMContext(session_id="s2")), self.large)
+
+        router.stats["small"].ttft = 10.0
+        self.assertIs(router.route(ctx), self.large)
+        router.stats["small"].ttft = 1.0
+        self.assertIs(router.route(ctx), self.large)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from echoflow.dialogue.session import SessionManager
+from echoflow.dialogue.timing_wheel import TimingWheel
+from echoflow.llm.base_context import LLMContext
+from echoflow.llm.base_messages import Message, ToolCall, ToolResult
+from echoflow.services.anthropic.messages import AnthropicStaticMessages
+
+
+class TestTimingWheel(unittest.TestCase):
+    def test_expiry_order_and_cancel(self):
+        wheel = TimingWheel(tick=1.0, size=4, levels=2, now=100.0)
+        for key, deadline in (("c", 130.0), ("a", 101.5), ("b", 110.0), ("x", 105.0)):
+            wheel.schedule(key, deadline)
+        self.assertTrue(wheel.cancel("x"))
+        self.assertFalse(wheel.cancel("x"))
+
+        self.assertEqual(wheel.advance(101.9), [])
+        self.assertEqual(wheel.advance(102.0), ["a"])
+        # 130 lies past the 16 ticks of the top level, so it is parked and rescheduled
+        self.assertEqual(wheel.advance(129.0), ["b"])
+        self.assertEqual(wheel.advance(131.0), ["c"])
+        self.assertEqual(len(wheel), 0)
+
+    def test_reschedule(self):
+        wheel = TimingWheel(tick=0.5, now=0.0)
+        wheel.schedule("s", 10.0)
+        wheel.schedule("s", 3.0)
+        self.assertEqual(len(wheel), 1)
+        self.assertEqual(wheel.advance(5.0), ["s"])
+        self.assertEqual(wheel.advance(20.0), [])
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def new_context(session_id: str) -> LLMContext:
+    return LLMContext(history=AnthropicStaticMessages())
+
+
+class TestSessionManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clock = Clock()
+        self.manager = SessionManager(
+            new_context,
+            self.tmp.name,
+            default_timeout=60.0,
+            min_timeout=5.0,
+            retention=3600.0,
+            clock=self.clock,
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_idle_session_is_spilled_and_rehydrated(self):
+        manager, clock = self.manager, self.clock
+        ctx = manager.get("s/1")
+        self.assertEqual(ctx.session_id, "s/1")
+        ctx.history.add_message(Message(role="user", content=["weather?"]))
+        ctx.history.add_message(
+            Message(role="assistant", content=[ToolCall(id="t1", name="weather", input={})])
+        )
+
+        clock.now += 59
+        manager.advance()
+        self.assertEqual((manager.live, manager.spilled), (1, 0))
+        clock.now += 2
+        manager.advance()
+        self.assertEqual((manager.live, manager.spilled), (0, 1))
+
+        clock.now += 100
+        again = manager.get("s/1")
+        self.assertIsNot(again, ctx)
+        self.assertEqual(list(again.history), list(ctx.history))
+        self.assertEqual(again.history.value, ctx.history.value)
+        self.assertEqual(manager.rehydrations, 1)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_parallel_tool_results_survive_a_spill(self):
+        manager = self.manager
+        ctx = manager.get("s")
+        calls = [ToolCall(id=f"t{i}", name="weather", input={}) for i in (1, 2)]
+        ctx.history.add_message(Message(role="user", content=["weather?"]))
+        ctx.history.add_message(Message(role="assistant", content=calls))
+        for i in (1, 2):
+            ctx.history.add_message(Message(role="tool", content=[ToolResult(f"t{i}", str(i))]))
+
+        manager.max_live = 0
+        manager.get("other")
+        manager.max_live = 10
+        again = manager.get("s")
+        self.assertIsNot(again, ctx)
+        self.assertEqual(list(again.history), list(ctx.history))
+        self.assertEqual(again.history.value, ctx.history.value)
+
+    def test_failed_eviction_keeps_the_session_live(self):
+        self.manager.max_live = 1
+        self.manager.get("a")
+        with mock.patch.object(self.manager, "_spill", side_effect=OSError("disk full")):
+            self.manager.get("b")
+        self.assertEqual(list(self.manager._live), ["a", "b"])
+
+    def test_release(self):
+        released = []
+        self.manager.release = lambda ctx: released.append(ctx.session_id)
+        self.manager.max_live = 1
+        self.manager.get("a")
+        self.manager.get("b")  # spills a
+        self.manager.remove("b")
+        self.manager.remove("a")  # already spilled, released then
+        self.assertEqual(released, ["a", "b"])
+
+    def test_timeout_follows_turn_gaps(self):
+        manager, clock = self.manager, self.clock
+        for i in range(50):
+            manager.get("fast")
+            if i % 10 == 9:
+                manager.get("slow")
+            clock.now += 2
+
+        fast, slow = manager._live["fast"].gaps, manager._live["slow"].gaps
+        self.assertEqual(manager.timeout(fast), 5.0)
+        self.assertAlmostEqual(manager.timeout(slow), 20.0)
+
+        clock.now += 8
+        manager.advance()
+        self.assertEqual(list(manager._live), ["slow"])
+
+    def test_max_live(self):
+        self.manager.max_live = 2
+        for session_id in ("a", "b", "c"):
+            self.manager.get(session_id)
+        self.assertEqual(list(self.manager._live), ["b", "c"])
+        self.assertEqual(self.manager.spilled, 1)
+
+    def test_retention(self):
+        manager, clock = self.manager, self.clock
+        manager.get("old")
+        clock.now += 61
+        manager.advance()
+        self.assertEqual(len(os.listdir(self.tmp.name)), 1)
+
+        # a restarted manager picks the spilled session up and deletes it in time
+        restarted = SessionManager(new_context, self.tmp.name, retention=3600.0)
+        self.assertEqual(restarted.spilled, 1)
+        restarted.advance(os.path.getmtime(manager._path("old")) + 3599)
+        self.assertEqual(restarted.spilled, 1)
+        restarted.advance(os.path.getmtime(manager._path("old")) + 3601)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+
+class TestSessionManagerTask(unittest.IsolatedAsyncioTestCase):
+    async def test_start_and_close(self):
+        with tempfile.TemporaryDirectory() as directory:
+            manager = SessionManager(new_context, directory, default_timeout=0.05, tick=0.01)
+            manager.start()
+            manager.get("a")
+            await asyncio.sleep(0.15)
+            self.assertEqual((manager.live, manager.spilled), (0, 1))
+
+            manager.get("b")
+            await manager.close()
+            self.assertEqual((manager.live, manager.spilled), (0, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
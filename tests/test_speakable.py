@@ -0,0 +1,79 @@
+import unittest
+
+from echoflow.llm.base_client import StreamEventType
+from echoflow.llm.speakable import Segmenter, SegmentPolicy, SpeakableClient
+from echoflow.services.anthropic.client import AnthropicContext
+from tests.anthropic_events import message_end, message_start, text_block, tool_block
+from tests.test_anthropic_stream import fake_client
+
+
+def segment(text: str, size: int, policy: SegmentPolicy = None) -> list[str]:
+    segmenter = Segmenter(policy)
+    segments = []
+    for i in range(0, len(text), size):
+        segments.extend(segmenter.feed(text[i : i + size]))
+    rest = segmenter.flush()
+    return segments + [rest] if rest else segments
+
+
+class TestSegmenter(unittest.TestCase):
+    def test_first_clause_then_sentences(self):
+        text = "Sure, I can help. It will be sunny tomorrow. Take a hat, and some water!"
+        segments = segment(text, 3)
+        self.assertEqual(
+            segments,
+            [
+                "Sure,",
+                " I can help. It will be sunny tomorrow.",
+                " Take a hat, and some water!",
+            ],
+        )
+
+    def test_cjk(self):
+        segments = segment("好的，我来查一下。明天北京以晴为主，最高气温二十一度。", 2)
+        self.assertEqual(segments, ["好的，", "我来查一下。明天北京以晴为主，最高气温二十一度。"])
+
+    def test_latin_punctuation_needs_whitespace(self):
+        segments = segment("Pi is 3.14159, e.g. roughly three. Yes.", 1)
+        self.assertEqual(segments[0], "Pi is 3.14159,")
+
+    def test_forced_cut_grows(self):
+        policy = SegmentPolicy(first_max_chars=10, growth=2, max_chars=40)
+        segments = segment("x" * 100, 1, policy)
+        self.assertEqual([len(s) for s in segments], [10, 20, 40, 30])
+
+    def test_soft_cut_at_whitespace(self):
+        policy = SegmentPolicy(first_max_chars=12)
+        self.assertEqual(segment("one two three four", 1, policy)[0], "one two ")
+
+
+class TestSpeakableClient(unittest.IsolatedAsyncioTestCase):
+    async def test_events(self):
+        events = [
+            message_start(),
+            *text_block(0, ["Hi", "! How can I help", " you today? Let me", " check"]),
+            *tool_block(1, "t1", "lookup", ['{"query": "x"}']),
+            *message_end(stop_reason="tool_use"),
+        ]
+        client = SpeakableClient(fake_client(events))
+        stream = [event async for event in client.stream_generate(AnthropicContext())]
+
+        segments = [e.data["text"] for e in stream if e.type == StreamEventType.segment]
+        self.assertEqual(segments, ["Hi!", " How can I help you today?", " Let me check"])
+
+        types = [e.type for e in stream if e.type != StreamEventType.text_delta]
+        self.assertEqual(
+            types,
+            [
+                StreamEventType.start,
+                StreamEventType.segment,
+                StreamEventType.segment,
+                StreamEventType.segment,
+                StreamEventType.tool_argument,
+                StreamEventType.tool,
+                StreamEventType.stop,
+                StreamEventType.metadata,
+            ],
+        )
+        deltas = [e.data["text_delta"] for e in stream if e.type == StreamEventType.text_delta]
+        self.assertEqual("".join(deltas), "".join(segments))
@@ -0,0 +1,126 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from echoflow.llm.base_messages import Message, ToolCall, ToolResult
+from echoflow.llm.store import FileStore
+from echoflow.services.anthropic.messages import AnthropicStaticMessages
+
+
+def conversation(n: int) -> list[Message]:
+    messages = []
+    for i in range(n):
+        messages.append(Message(role="user", content=[f"question {i}，好吗?"]))
+        messages.append(
+            Message(role="assistant", content=[ToolCall(id=f"t{i}", name="f", input={"i": i})])
+        )
+        messages.append(Message(role="tool", content=[ToolResult(id=f"t{i}", content="ok")]))
+        messages.append(Message(role="assistant", content=[f"answer {i}"]))
+    return messages
+
+
+class TestFileStore(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def store(self, **kwargs) -> FileStore:
+        kwargs.setdefault("commit_interval", None)
+        kwargs.setdefault("fsync", False)
+        return FileStore(self.directory, **kwargs)
+
+    def test_round_trip_across_stores(self):
+        messages = conversation(5)
+        with self.store(snapshot_every=7) as store:
+            for message in messages:
+                store.save("user/1", message)
+            store.save("other", messages[0])
+
+        with self.store() as store:
+            self.assertEqual(store.load("user/1"), messages)
+            self.assertEqual(store.load("other"), messages[:1])
+            self.assertEqual(store.load("missing"), [])
+
+            history = store.restore("user/1", AnthropicStaticMessages())
+            expected = AnthropicStaticMessages()
+            for message in messages:
+                expected.add_message(message)
+            self.assertEqual(history.value, expected.value)
+
+    def test_group_commit(self):
+        store = self.store(max_pending=3)
+        path = os.path.join(self.directory, "s.log")
+        for message in conversation(1)[:2]:
+            store.save("s", message)
+        self.assertFalse(os.path.exists(path))
+        store.save("s", conversation(1)[2])
+        with open(path) as f:
+            self.assertEqual(len(f.readlines()), 3)
+        store.close()
+
+    def test_snapshot_truncates_log(self):
+        messages = conversation(3)
+        with self.store(snapshot_every=5) as store:
+            for message in messages:
+                store.save("s", message)
+                store.commit()
+        with open(os.path.join(self.directory, "s.log")) as f:
+            self.assertEqual(len(f.readlines()), 2)
+        with self.store() as store:
+            self.assertEqual(store.load("s"), messages)
+
+    def test_recovers_from_crash(self):
+        messages = conversation(2)
+        with self.store() as store:
+            for message in messages[:4]:
+                store.save("s", message)
+            store.snapshot("s")
+        # a crash after writing the snapshot but before truncating the log, and a torn record
+        with self.store(snapshot_every=10**6) as store:
+            for message in messages[:4]:
+                store.save("x", message)
+        os.replace(os.path.join(self.directory, "x.log"), os.path.join(self.directory, "s.log"))
+        with open(os.path.join(self.directory, "s.log"), "a") as f:
+            f.write('{"s": 5, "r": "us')
+
+        with self.store() as store:
+            self.assertEqual(store.load("s"), messages[:4])
+            for message in messages[4:]:
+                store.save("s", message)
+        with self.store() as store:
+            self.assertEqual(store.load("s"), messages)
+
+    def test_background_commit(self):
+        store = FileStore(self.directory, commit_interval=0.01, fsync=False)
+        store.save("s", conversation(1)[0]).result(timeout=1)
+        with open(os.path.join(self.directory, "s.log")) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+        # a full buffer wakes the committer rather than writing on the caller's thread
+        store.commit_interval = 60
+        store._wake.set()
+        store.max_pending = 2
+        store.save("s", conversation(1)[1])
+        store.save("s", conversation(1)[2]).result(timeout=1)
+        store.close()
+
+    def test_failed_commit_keeps_records(self):
+        store = self.store(fsync=True)
+        messages = conversation(1)
+        durable = store.save("s", messages[0])
+        with mock.patch("echoflow.llm.store.os.fsync", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                store.commit()
+            later = store.save("s", messages[1])
+        self.assertFalse(durable.done())
+        self.assertEqual(os.path.getsize(os.path.join(self.directory, "s.log")), 0)
+
+        store.commit()
+        self.assertIsNone(durable.result(timeout=0))
+        self.assertIsNone(later.result(timeout=0))
+        self.assertEqual(store.load("s"), messages[:2])
+        store.close()
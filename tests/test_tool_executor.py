@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from echoflow.llm.base_messages import ToolCall, ToolResult
+from echoflow.llm.base_tools import Tool, ToolWrapper
+from echoflow.llm.json_schema import Model
+from echoflow.llm.tool_executor import ToolExecutor, ToolLimits, tool_messages
+
+
+class Empty(Model):
+    pass
+
+
+class SleepTool(Tool):
+    def __init__(self, name: str, delay: float):
+        super().__init__(name, "sleeps", Empty)
+        self.delay = delay
+        self.running = 0
+        self.peak = 0
+
+    async def async_call(self, tool_call: ToolCall) -> ToolResult:
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        return ToolResult(id=tool_call.id, content=f"{self.name} done")
+
+
+class BlockingTool(Tool):
+    def __init__(self, name: str, delay: float):
+        super().__init__(name, "blocks", Empty)
+        self.delay = delay
+        self.threads = set()
+
+    def call(self, tool_call: ToolCall) -> ToolResult:
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return ToolResult(id=tool_call.id, content=f"{self.name} done")
+
+
+class FailingTool(Tool):
+    def __init__(self):
+        super().__init__("fail", "fails", Empty)
+
+    async def async_call(self, tool_call: ToolCall) -> ToolResult:
+        raise RuntimeError("boom")
+
+
+def calls(*names: str) -> list[ToolCall]:
+    return [ToolCall(id=str(i), name=name, input={}) for i, name in enumerate(names)]
+
+
+class TestToolExecutor(unittest.IsolatedAsyncioTestCase):
+    async def test_runs_concurrently_in_order(self):
+        slow, fast = SleepTool("slow", 0.2), BlockingTool("fast", 0.1)
+        async with ToolExecutor([ToolWrapper(slow), fast]) as executor:
+            start = time.perf_counter()
+            results = await executor.run(calls("slow", "fast", "slow", "fast"))
+            elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.35)
+        self.assertEqual([r.id for r in results], ["0", "1", "2", "3"])
+        self.assertEqual(results[1].content, "fast done")
+        self.assertNotIn(threading.get_ident(), fast.threads)
+
+    async def test_timeout(self):
+        slow = SleepTool("slow", 1)
+        limits = {"slow": ToolLimits(timeout=0.05)}
+        async with ToolExecutor([slow], limits=limits) as executor:
+            (result,) = await executor.run(calls("slow"))
+
+        self.assertTrue(result.is_error)
+        self.assertIn("timed out", result.content)
+
+    async def test_concurrency_caps(self):
+        a, b = SleepTool("a", 0.05), SleepTool("b", 0.05)
+        limits = {"a": ToolLimits(max_concurrency=2)}
+        async with ToolExecutor([a, b], max_concurrency=3, limits=limits) as executor:
+            await executor.run(calls(*["a"] * 6, *["b"] * 6))
+
+        self.assertEqual(a.peak, 2)
+        self.assertEqual(b.peak, 3)
+
+    async def test_errors(self):
+        async with ToolExecutor([FailingTool()]) as executor:
+            failed, missing = await executor.run(calls("fail", "missing"))
+
+        self.assertTrue(failed.is_error)
+        self.assertIn("boom", failed.content)
+        self.assertTrue(missing.is_error)
+        self.assertEqual(tool_messages([failed])[0].content, [failed])
+
+    async def test_cancel(self):
+        async with ToolExecutor([SleepTool("slow", 1)]) as executor:
+            run = asyncio.ensure_future(executor.run(calls("slow", "slow")))
+            await asyncio.sleep(0.01)
+            executor.cancel()
+            results = await run
+
+        self.assertTrue(all(r.is_error and "cancelled" in r.content for r in results))
+
+
+class TestSubmit(unittest.IsolatedAsyncioTestCase):
+    async def test_uncollected_calls_are_forgotten(self):
+        async with ToolExecutor([SleepTool("fast", 0)], keep_submitted=0.05) as executor:
+            first, second = calls("fast", "fast")
+            task = executor.submit(first)
+            self.assertIs(executor.submit(first), task)
+            await task
+            await asyncio.sleep(0.01)
+            self.assertIn(first.id, executor._submitted)
+
+            await asyncio.sleep(0.1)  # never collected by run, e.g. the stream failed
+            self.assertEqual(executor._submitted, {})
+
+            # a collected call is dropped at once and its timer is a no-op
+            await executor.run([second])
+            self.assertEqual(executor._submitted, {})